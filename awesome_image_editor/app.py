@@ -7,6 +7,8 @@ from PyQt6.QtCore import QCoreApplication
 from PyQt6.QtGui import QColor, QIcon, QPalette
 from PyQt6.QtWidgets import QApplication
 
+from .model_view.graphics_view import DEFAULT_ITEM_CACHE_BUDGET, set_item_cache_budget
+
 __all__ = ("Application",)
 
 
@@ -23,6 +25,8 @@ class Application(QApplication):
         QCoreApplication.setOrganizationName("Iyad Ahmed")
         QCoreApplication.setApplicationVersion("0.0.1")
 
+        set_item_cache_budget(DEFAULT_ITEM_CACHE_BUDGET)
+
         self.setWindowIcon(
             QIcon((PurePath(__file__).parent / "icons" / "app2.svg").as_posix())
         )
@@ -8,6 +8,12 @@ def read_uint32_le(reader: BufferedReader):
     return int.from_bytes(data, "little", signed=False)
 
 
+def read_uint64_le(reader: BufferedReader):
+    data = reader.read(8)
+    assert len(data) == 8
+    return int.from_bytes(data, "little", signed=False)
+
+
 def read_pascal_string(reader: BufferedReader):
     length = read_uint32_le(reader)
     string = reader.read(length)
@@ -26,3 +32,47 @@ def read_float_le(reader: BufferedReader):
     data = reader.read(4)
     assert len(data) == 4  # struct should already error out, assert for consistency
     return struct.unpack("<f", data)[0]
+
+
+UINT32_LE = struct.Struct("<I")
+UINT64_LE = struct.Struct("<Q")
+FLOAT_LE = struct.Struct("<f")
+
+
+class BinaryReader:
+    """Reads little-endian values straight from a buffer (e.g. a memory-mapped file),
+    byte strings are returned as zero-copy slices of the buffer"""
+
+    def __init__(self, buffer, offset: int = 0):
+        self._view = memoryview(buffer)
+        self.offset = offset
+
+    def __len__(self):
+        return len(self._view)
+
+    def read_struct(self, record: struct.Struct):
+        # NOTE: unpack_from raises struct.error when the buffer is too short
+        values = record.unpack_from(self._view, self.offset)
+        self.offset += record.size
+        return values
+
+    def read_uint32_le(self) -> int:
+        return self.read_struct(UINT32_LE)[0]
+
+    def read_uint64_le(self) -> int:
+        return self.read_struct(UINT64_LE)[0]
+
+    def read_float_le(self) -> float:
+        return self.read_struct(FLOAT_LE)[0]
+
+    def read_bytes(self, length: int) -> memoryview:
+        data = self._view[self.offset : self.offset + length]
+        assert len(data) == length
+        self.offset += length
+        return data
+
+    def read_pascal_string(self) -> bytes:
+        return bytes(self.read_bytes(self.read_uint32_le()))
+
+    def read_unicode_string(self) -> str:
+        return str(self.read_bytes(self.read_uint32_le()), "utf-8")
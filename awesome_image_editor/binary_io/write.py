@@ -7,6 +7,11 @@ def write_uint32_le(value: int, writer: BufferedWriter):
     writer.write(data)
 
 
+def write_uint64_le(value: int, writer: BufferedWriter):
+    data = value.to_bytes(8, "little", signed=False)
+    writer.write(data)
+
+
 def write_float_le(value: float, writer: BufferedWriter):
     writer.write(struct.pack("<f", value))
 
@@ -20,3 +25,56 @@ def write_unicode_string(string: str, writer: BufferedWriter):
     data = string.encode("utf-8")
     write_uint32_le(len(data), writer)
     writer.write(data)
+
+
+UINT32_LE = struct.Struct("<I")
+UINT64_LE = struct.Struct("<Q")
+FLOAT_LE = struct.Struct("<f")
+
+
+class BinaryWriter:
+    """Appends little-endian values into a preallocated bytearray, that grows as needed"""
+
+    def __init__(self, capacity: int = 4096):
+        self._buffer = bytearray(capacity)
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    def _reserve(self, size: int):
+        required_size = self._size + size
+        if required_size > len(self._buffer):
+            self._buffer.extend(
+                bytes(max(required_size, 2 * len(self._buffer)) - len(self._buffer))
+            )
+
+    def getbuffer(self) -> memoryview:
+        return memoryview(self._buffer)[: self._size]
+
+    def write_struct(self, record: struct.Struct, *values):
+        self._reserve(record.size)
+        record.pack_into(self._buffer, self._size, *values)
+        self._size += record.size
+
+    def write_bytes(self, data):
+        size = memoryview(data).nbytes
+        self._reserve(size)
+        self._buffer[self._size : self._size + size] = memoryview(data).cast("B")
+        self._size += size
+
+    def write_uint32_le(self, value: int):
+        self.write_struct(UINT32_LE, value)
+
+    def write_uint64_le(self, value: int):
+        self.write_struct(UINT64_LE, value)
+
+    def write_float_le(self, value: float):
+        self.write_struct(FLOAT_LE, value)
+
+    def write_pascal_string(self, string: bytes):
+        self.write_uint32_le(len(string))
+        self.write_bytes(string)
+
+    def write_unicode_string(self, string: str):
+        self.write_pascal_string(string.encode("utf-8"))
@@ -0,0 +1,323 @@
+"""Headless batch rendering of projects and PSD files to flat images
+
+Usage: python -m awesome_image_editor.cli INPUT... --output-dir DIR [--format png|jpg] [--jobs N] [--layer-cache]
+       [--profile] [--profile-output report.json] [--stream [--memory-budget MB]] [--scale S] [--max-size PX]
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import time
+import traceback
+from collections import Counter
+from concurrent.futures import Executor, ProcessPoolExecutor, as_completed
+from pathlib import Path
+from typing import List, NamedTuple, Optional
+
+__all__ = ("main",)
+
+# Suffixes of files imported as PSD files, PSB is the large document format
+PSD_SUFFIXES = (".psd", ".psb")
+
+# DEFAULT_STREAM_MEMORY_BUDGET, in megabytes
+# NOTE: not imported, PSD modules import Qt, which must only be imported once the Qt platform is selected
+DEFAULT_STREAM_MEMORY_BUDGET_MB = 1024
+
+_app = None
+
+
+class RenderResult(NamedTuple):
+    input_path: str
+    output_path: str
+    seconds: float
+    error: Optional[str]
+    # Import profile of PSD files, see PSDImportProfiler.to_dict
+    profile: Optional[dict] = None
+
+
+def _init_worker():
+    global _app
+
+    # NOTE: Qt must be imported after the platform is selected, and a QApplication must exist before creating
+    # a project, as projects own widgets (graphics view, layers widget) even when nothing is shown
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    from PyQt6.QtWidgets import QApplication
+
+    if QApplication.instance() is None:
+        _app = QApplication([sys.argv[0]])
+
+
+def load_project(
+    filepath: str,
+    max_workers: Optional[int] = None,
+    use_layer_cache: bool = False,
+    profiler=None,
+    stream_memory_budget: Optional[int] = None,
+):
+    """Load a project or PSD file, PSD files are streamed within stream_memory_budget bytes if given"""
+    from .file_format import AIEProject
+    from .psd_read import load_psd_as_project
+
+    if Path(filepath).suffix.lower() in PSD_SUFFIXES:
+        if stream_memory_budget is not None:
+            return load_psd_as_project(
+                filepath,
+                profiler=profiler,
+                stream=True,
+                memory_budget=stream_memory_budget,
+            )
+        return load_psd_as_project(
+            filepath, max_workers, use_layer_cache, profiler=profiler
+        )
+    return AIEProject.load(filepath)
+
+
+def render_file(
+    input_path: str,
+    output_path: str,
+    max_workers: Optional[int] = None,
+    use_layer_cache: bool = False,
+    profile: bool = False,
+    stream_memory_budget: Optional[int] = None,
+    scale: Optional[float] = None,
+    max_size: Optional[int] = None,
+):
+    from .psd_read.profile import PSDImportProfiler
+
+    start_time = time.perf_counter()
+    profiler = PSDImportProfiler() if profile else None
+    try:
+        _init_worker()
+        project = load_project(
+            input_path, max_workers, use_layer_cache, profiler, stream_memory_budget
+        )
+        is_scaled = scale is not None or max_size is not None
+        if Path(output_path).suffix.lower() == ".png" and not is_scaled:
+            # NOTE: written strip by strip, the whole image is never held in memory
+            project.export_png(output_path, max_workers=max_workers)
+        else:
+            image = project.render(
+                max_workers=max_workers, scale=scale, max_size=max_size
+            )
+            if not image.save(output_path):
+                raise IOError(f"Could not write {output_path}")
+        error = None
+    except Exception:
+        error = traceback.format_exc()
+
+    # NOTE: only PSD imports are profiled
+    is_profiled = (
+        profiler is not None and Path(input_path).suffix.lower() in PSD_SUFFIXES
+    )
+    return RenderResult(
+        input_path,
+        output_path,
+        time.perf_counter() - start_time,
+        error,
+        profiler.to_dict() if is_profiled else None,
+    )
+
+
+def get_output_paths(input_paths: List[str], output_dir: str, image_format: str):
+    """Path in output_dir of the image rendered from each input, named after the input
+
+    Inputs with the same name (e.g. a.aie and a.psd, or files from different directories) get their suffix
+    appended to their name, then a counter, so that no output overwrites another.
+    """
+    # NOTE: case insensitive, as output_dir may be on a case insensitive file system
+    stem_counts = Counter(Path(input_path).stem.lower() for input_path in input_paths)
+    used_names = set()
+    output_paths = []
+    for input_path in input_paths:
+        path = Path(input_path)
+        name = path.stem
+        if stem_counts[name.lower()] > 1 and path.suffix:
+            name = f"{name}_{path.suffix[1:]}"
+        unique_name = name
+        counter = 2
+        while unique_name.lower() in used_names:
+            unique_name = f"{name}_{counter}"
+            counter += 1
+        used_names.add(unique_name.lower())
+        output_paths.append(str(Path(output_dir) / f"{unique_name}.{image_format}"))
+    return output_paths
+
+
+def render_files(
+    input_paths: List[str],
+    output_dir: str,
+    image_format: str,
+    jobs: int,
+    use_layer_cache: bool = False,
+    profile: bool = False,
+    stream_memory_budget: Optional[int] = None,
+    scale: Optional[float] = None,
+    max_size: Optional[int] = None,
+):
+    """Render each input to output_dir, spreading them over jobs worker processes, and yield results as they finish"""
+    output_paths = get_output_paths(input_paths, output_dir, image_format)
+
+    if jobs == 1:
+        for input_path, output_path in zip(input_paths, output_paths):
+            yield render_file(
+                input_path,
+                output_path,
+                None,
+                use_layer_cache,
+                profile,
+                stream_memory_budget,
+                scale,
+                max_size,
+            )
+        return
+
+    # NOTE: spawn worker processes instead of forking, Qt does not support being used across a fork
+    executor: Executor = ProcessPoolExecutor(
+        max_workers=jobs,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_worker,
+    )
+    start_time = time.perf_counter()
+    with executor:
+        # NOTE: files are already rendered in parallel, each of them is decoded by a single process
+        # and rendered by a single thread
+        futures = {
+            executor.submit(
+                render_file,
+                input_path,
+                output_path,
+                1,
+                use_layer_cache,
+                profile,
+                stream_memory_budget,
+                scale,
+                max_size,
+            ): (input_path, output_path)
+            for input_path, output_path in zip(input_paths, output_paths)
+        }
+        for future in as_completed(futures):
+            try:
+                result = future.result()
+            except Exception:
+                # NOTE: render_file reports its own errors, this is the worker failing, e.g. BrokenProcessPool
+                # when a worker process died (out of memory...), which fails every file not rendered yet
+                input_path, output_path = futures[future]
+                result = RenderResult(
+                    input_path,
+                    output_path,
+                    time.perf_counter() - start_time,
+                    traceback.format_exc(),
+                )
+            yield result
+
+
+def parse_args(argv: List[str]):
+    parser = argparse.ArgumentParser(
+        prog="python -m awesome_image_editor.cli",
+        description="Render .aie projects and .psd files to flat images, without a display",
+    )
+    parser.add_argument("inputs", nargs="+", help=".aie, .psd or .psb files to render")
+    parser.add_argument(
+        "-o", "--output-dir", required=True, help="directory to write images to"
+    )
+    parser.add_argument(
+        "-f", "--format", default="png", choices=("png", "jpg"), help="output format"
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="number of worker processes (default: number of CPUs)",
+    )
+    parser.add_argument(
+        "--layer-cache",
+        dest="use_layer_cache",
+        action="store_true",
+        help="keep decoded PSD layers in the layer cache, so that rendering the same files again does not decode them",
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="print the time and memory spent on each kind of PSD layer, and the slowest layers",
+    )
+    parser.add_argument(
+        "--profile-output",
+        metavar="FILE",
+        help="write the import profile of each PSD file to this JSON file",
+    )
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="map PSD files instead of reading them, and decode layers as they are rendered (for files too large for memory)",
+    )
+    parser.add_argument(
+        "--memory-budget",
+        type=int,
+        default=DEFAULT_STREAM_MEMORY_BUDGET_MB,
+        metavar="MB",
+        help="memory kept for the decoded layers of each streamed PSD file",
+    )
+    parser.add_argument(
+        "--scale", type=float, help="scale of the rendered images (default: 1)"
+    )
+    parser.add_argument(
+        "--max-size",
+        type=int,
+        metavar="PX",
+        help="scale rendered images down to fit in PX x PX pixels, e.g. for previews",
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None):
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+    os.makedirs(args.output_dir, exist_ok=True)
+    # NOTE: set before spawning workers, so they inherit it
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+    from .psd_read.profile import format_profile_summary
+
+    profiles = {}
+    num_failures = 0
+    start_time = time.perf_counter()
+    for result in render_files(
+        args.inputs,
+        args.output_dir,
+        args.format,
+        max(1, args.jobs),
+        args.use_layer_cache,
+        args.profile or args.profile_output is not None,
+        args.memory_budget * 1024 * 1024 if args.stream else None,
+        args.scale,
+        args.max_size,
+    ):
+        if result.error is None:
+            print(
+                f"ok      {result.seconds:8.2f}s  {result.input_path} -> {result.output_path}"
+            )
+        else:
+            num_failures += 1
+            print(f"FAILED  {result.seconds:8.2f}s  {result.input_path}")
+            print(result.error, file=sys.stderr)
+
+        if result.profile is not None:
+            profiles[result.input_path] = result.profile
+            if args.profile:
+                print(format_profile_summary(result.profile))
+
+    if args.profile_output is not None:
+        with open(args.profile_output, "w") as file:
+            json.dump(profiles, file, indent=2)
+
+    print(
+        f"{len(args.inputs) - num_failures} rendered, {num_failures} failed"
+        f" in {time.perf_counter() - start_time:.2f}s"
+    )
+    return 1 if num_failures > 0 else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
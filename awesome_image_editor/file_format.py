@@ -1,32 +1,568 @@
-from io import BufferedReader, BufferedWriter
+import hashlib
+import math
+import mmap
+import os
+import struct
+import weakref
+import zlib
+from concurrent.futures import Executor
+from contextlib import suppress
+from enum import Enum
+from io import BufferedReader, BufferedWriter, UnsupportedOperation
+from typing import Dict, Iterator, List, NamedTuple, Optional, Sequence, Tuple, Union
 
-from PyQt6.QtCore import QBuffer, QByteArray, QIODevice, Qt
+from PyQt6.QtCore import QBuffer, QByteArray, QIODevice, QRectF, QSize, Qt
 from PyQt6.QtGui import QImage, QPainter
 from PyQt6.QtWidgets import QGraphicsView
 
 from .model_view.graphics_scene import AIEGraphicsScene
 from .model_view.graphics_view import AIEGraphicsView
-from .model_view.items.image import AIEImageItem
+from .model_view.items.image import AIEImageItem, DirtyFlag
+from .model_view.items.tiled_image import AIETiledImageItem
 from .model_view.tree_model import TreeModel
 from .widgets.layers import LayersWidget
-from .binary_io.write import (
-    write_pascal_string,
-    write_uint32_le,
-    write_unicode_string,
-    write_float_le,
-)
-from .binary_io.read import (
-    read_float_le,
-    read_uint32_le,
-    read_pascal_string,
-    read_unicode_string,
+from .thread_pool import map_ordered
+from .png_stream import DEFAULT_PNG_COMPRESSION_LEVEL, PNGStreamWriter
+from .render import (
+    DEFAULT_RENDER_STRIP_HEIGHT,
+    DEFAULT_RENDER_TILE_SIZE,
+    get_render_size,
+    get_unscaled_render_source,
+    iter_render_scene_strips,
+    render_scene,
 )
+from .binary_io.write import BinaryWriter
+from .binary_io.read import UINT32_LE, BinaryReader
 
 MAGIC_BYTES = b"\x89AIE\r\n\x1a\n"  # Similar to PNG magic bytes
 
+# Version 0 files have no version chunk, their layers chunk directly follows the magic bytes
+# Version 2 adds the digest of layer pixels to index entries
+FORMAT_VERSION = 2
+
 # Chunk Types
+VERSION_CHUNK_TYPE = b"VERSION"
 LAYERS_CHUNK_TYPE = b"LAYERS"
 IMAGE_CHUNK_TYPE = b"IMAGE"
+RAW_IMAGE_CHUNK_TYPE = b"RAWIMAGE"
+TILED_IMAGE_CHUNK_TYPE = b"TILEDIMAGE"
+INDEX_CHUNK_TYPE = b"INDEX"
+
+# Chunks may be preceded by zero padding so that their payloads start at a multiple of this,
+# which keeps raw pixel data suitably aligned to be used in place from a memory-mapped file
+CHUNK_PAYLOAD_ALIGNMENT = 16
+
+# Incrementally saved files are compacted once referenced chunks make up less than this part of the file
+COMPACTION_MIN_LIVE_RATIO = 0.5
+
+# Raw image payload header: width, height, bytes per line, compression
+# NOTE: header size is a multiple of CHUNK_PAYLOAD_ALIGNMENT so pixel data stays aligned
+RAW_IMAGE_HEADER = struct.Struct("<4I")
+RAW_IMAGE_FORMAT = QImage.Format.Format_ARGB32_Premultiplied
+RAW_IMAGE_COMPRESSION_NONE = 0
+RAW_IMAGE_COMPRESSION_ZLIB = 1
+
+# Tiled image payload header: width, height, tile size, compression (same values as raw images),
+# followed by a record for each tile in row-major order, then the raw pixels of each tile
+TILED_IMAGE_HEADER = struct.Struct("<4I")
+# Tile record: offset of the tile pixels relative to the payload, length
+TILED_IMAGE_TILE_RECORD = struct.Struct("<2Q")
+DEFAULT_TILE_SIZE = 256
+# Layers at least this large in any dimension are always saved tiled,
+# so that painting part of them does not require decoding all of them
+TILED_IMAGE_MIN_SIZE = 4096
+
+# The footer closes every file (version >= 1) and points at the index chunk,
+# so the index can be found without walking the whole file
+INDEX_FOOTER_MAGIC = b"AIEINDEX"
+INDEX_FOOTER_SIZE = 8 + len(INDEX_FOOTER_MAGIC)
+
+# Fixed size part of index entries, following the chunk type and name strings: x, y, width, height, offset, length
+# NOTE: in version >= 2, it is followed by the digest of the layer pixels (empty if unknown)
+INDEX_ENTRY_RECORD = struct.Struct("<2f2I2Q")
+
+# Layers with identical pixels (same digest) reference a single chunk
+IMAGE_DIGEST_SIZE = 16
+# Hashed before the pixels: width, height, bytes per line, format
+IMAGE_DIGEST_HEADER = struct.Struct("<4I")
+
+
+class ImageEncoding(Enum):
+    PNG = "png"
+    # Raw ARGB32 premultiplied pixels, much faster to save and load than PNG at the cost of file size
+    RAW = "raw"
+    ZLIB = "zlib"
+    # Independently zlib compressed raw tiles, see TILED_IMAGE_MIN_SIZE
+    TILED = "tiled"
+
+
+ENCODING_CHUNK_TYPES = {
+    ImageEncoding.PNG: IMAGE_CHUNK_TYPE,
+    ImageEncoding.RAW: RAW_IMAGE_CHUNK_TYPE,
+    ImageEncoding.ZLIB: RAW_IMAGE_CHUNK_TYPE,
+    ImageEncoding.TILED: TILED_IMAGE_CHUNK_TYPE,
+}
+
+
+class LayerIndexEntry(NamedTuple):
+    chunk_type: bytes
+    name: str
+    x: float
+    y: float
+    width: int
+    height: int
+    # Location of the chunk payload, relative to the start of the file
+    offset: int
+    length: int
+    # See compute_image_digest, empty if unknown (e.g. read from a version 1 file)
+    digest: bytes = b""
+
+
+class ChunkImageLoader:
+    """Decodes the pixels of a layer from its chunk in a memory-mapped project file"""
+
+    def __init__(self, mapping: Union[mmap.mmap, bytes], entry: LayerIndexEntry):
+        self._mapping: Optional[Union[mmap.mmap, bytes]] = mapping
+        self.entry = entry
+        # NOTE: layers sharing a chunk share its loader, the image stays shared for as long as any of them uses it
+        self._image_ref: Optional[weakref.ref] = None
+
+    def payload(self):
+        return memoryview(self._mapping)[
+            self.entry.offset : self.entry.offset + self.entry.length
+        ]
+
+    def is_zero_copy(self):
+        """Whether decoded images read their pixels straight from the mapping, see decode_raw_pixels"""
+        return (
+            self.entry.chunk_type == RAW_IMAGE_CHUNK_TYPE
+            and RAW_IMAGE_HEADER.unpack_from(self._mapping, self.entry.offset)[3]
+            == RAW_IMAGE_COMPRESSION_NONE
+        )
+
+    def release(self):
+        """Stop reading the mapping (see remap) and return it"""
+        mapping, self._mapping = self._mapping, None
+        self._image_ref = None
+        return mapping
+
+    def remap(self, mapping: Union[mmap.mmap, bytes], entry: LayerIndexEntry):
+        """Read the chunk at entry in mapping instead, which must hold the same pixels"""
+        self._mapping = mapping
+        self.entry = entry
+        self._image_ref = None
+
+    def __call__(self):
+        image = self._image_ref() if self._image_ref is not None else None
+        if image is None:
+            image = decode_image_payload(self.entry.chunk_type, self.payload())
+            self._image_ref = weakref.ref(image)
+        return image
+
+
+def compute_image_digest(image: QImage):
+    """Hash the pixels of an image, layers with the same digest are stored once"""
+    digest = hashlib.blake2b(digest_size=IMAGE_DIGEST_SIZE)
+    digest.update(
+        IMAGE_DIGEST_HEADER.pack(
+            image.width(), image.height(), image.bytesPerLine(), image.format().value
+        )
+    )
+    if not image.isNull():
+        bits = image.constBits()
+        bits.setsize(image.sizeInBytes())
+        # NOTE: hashlib releases the GIL for large buffers, so images are hashed in parallel
+        digest.update(bits)
+    return digest.digest()
+
+
+def encode_image_payload(
+    image: QImage, encoding: ImageEncoding = ImageEncoding.PNG, zlib_level: int = 1
+):
+    """Encode an image into a chunk type and a list of byte buffers making up its payload"""
+    if (
+        encoding == ImageEncoding.TILED
+        or max(image.width(), image.height()) >= TILED_IMAGE_MIN_SIZE
+    ):
+        if encoding == ImageEncoding.RAW:
+            compression = RAW_IMAGE_COMPRESSION_NONE
+        else:
+            compression = RAW_IMAGE_COMPRESSION_ZLIB
+        return encode_tiled_image_payload(
+            image, DEFAULT_TILE_SIZE, compression, zlib_level
+        )
+
+    if encoding == ImageEncoding.PNG:
+        byte_array = QByteArray()
+        buffer = QBuffer(byte_array)
+        buffer.open(QIODevice.OpenModeFlag.WriteOnly)
+        image.save(buffer, "PNG")
+        return IMAGE_CHUNK_TYPE, [byte_array.data()]
+
+    if image.format() != RAW_IMAGE_FORMAT:
+        image = image.convertedTo(RAW_IMAGE_FORMAT)
+
+    # NOTE: the buffer references the image memory directly, keep the image alive while the buffer is in use
+    bits = image.constBits()
+    bits.setsize(image.sizeInBytes())
+
+    if encoding == ImageEncoding.ZLIB:
+        compression = RAW_IMAGE_COMPRESSION_ZLIB
+        pixel_data = zlib.compress(bits, zlib_level)
+    else:
+        compression = RAW_IMAGE_COMPRESSION_NONE
+        pixel_data = bits
+
+    header = RAW_IMAGE_HEADER.pack(
+        image.width(), image.height(), image.bytesPerLine(), compression
+    )
+    return RAW_IMAGE_CHUNK_TYPE, [header, pixel_data]
+
+
+def encode_tiled_image_payload(
+    image: QImage, tile_size: int, compression: int, zlib_level: int = 1
+):
+    if image.format() != RAW_IMAGE_FORMAT:
+        image = image.convertedTo(RAW_IMAGE_FORMAT)
+
+    tiles = []
+    for y in range(0, image.height(), tile_size):
+        for x in range(0, image.width(), tile_size):
+            tile = image.copy(
+                x,
+                y,
+                min(tile_size, image.width() - x),
+                min(tile_size, image.height() - y),
+            )
+            bits = tile.constBits()
+            bits.setsize(tile.sizeInBytes())
+
+            if compression == RAW_IMAGE_COMPRESSION_ZLIB:
+                tiles.append(zlib.compress(bits, zlib_level))
+            else:
+                tiles.append(bits.asstring())
+
+    header = BinaryWriter(
+        TILED_IMAGE_HEADER.size + len(tiles) * TILED_IMAGE_TILE_RECORD.size
+    )
+    header.write_struct(
+        TILED_IMAGE_HEADER, image.width(), image.height(), tile_size, compression
+    )
+
+    offset = len(header) + len(tiles) * TILED_IMAGE_TILE_RECORD.size
+    for tile_data in tiles:
+        header.write_struct(TILED_IMAGE_TILE_RECORD, offset, len(tile_data))
+        offset += len(tile_data)
+
+    return TILED_IMAGE_CHUNK_TYPE, [header.getbuffer(), *tiles]
+
+
+def decode_raw_pixels(
+    pixel_data: memoryview,
+    width: int,
+    height: int,
+    bytes_per_line: int,
+    compression: int,
+):
+    if compression == RAW_IMAGE_COMPRESSION_NONE:
+        assert len(pixel_data) == bytes_per_line * height
+        # NOTE: no copy, the image reads straight from the payload buffer (e.g. a memory-mapped file),
+        # PyQt keeps a reference to the buffer for as long as the image lives, and Qt
+        # treats it as read-only, detaching to a private copy if the image is ever modified
+        return QImage(pixel_data, width, height, bytes_per_line, RAW_IMAGE_FORMAT)
+
+    assert compression == RAW_IMAGE_COMPRESSION_ZLIB
+    image = QImage(width, height, RAW_IMAGE_FORMAT)
+    assert image.bytesPerLine() == bytes_per_line
+    bits = image.bits()
+    bits.setsize(image.sizeInBytes())
+    memoryview(bits)[:] = zlib.decompress(pixel_data, bufsize=image.sizeInBytes())
+    return image
+
+
+class TiledImageSource:
+    """Decodes the tiles of a tiled image payload independently of each other"""
+
+    def __init__(self, payload: memoryview):
+        self._payload = payload
+        (
+            width,
+            height,
+            self._tile_size,
+            self._compression,
+        ) = TILED_IMAGE_HEADER.unpack_from(payload)
+        self._image_size = QSize(width, height)
+        self._num_columns = math.ceil(width / self._tile_size)
+        # NOTE: layers sharing a chunk share its source, see ChunkImageLoader
+        self._image_ref: Optional[weakref.ref] = None
+
+    def is_zero_copy(self):
+        """Whether decoded tiles read their pixels straight from the payload buffer, see decode_raw_pixels"""
+        return self._compression == RAW_IMAGE_COMPRESSION_NONE
+
+    def release(self):
+        """Stop reading the payload (see remap) and return the buffer it was read from"""
+        payload, self._payload = self._payload, None
+        self._image_ref = None
+        return payload.obj
+
+    def remap(self, payload: memoryview):
+        """Read the tiles from payload instead, which must be a copy of the previous one"""
+        self._payload = payload
+        self._image_ref = None
+
+    def get_image_size(self):
+        return QSize(self._image_size)
+
+    def get_tile_size(self):
+        return self._tile_size
+
+    def decode_tile(self, column: int, row: int):
+        offset, length = TILED_IMAGE_TILE_RECORD.unpack_from(
+            self._payload,
+            TILED_IMAGE_HEADER.size
+            + (row * self._num_columns + column) * TILED_IMAGE_TILE_RECORD.size,
+        )
+        x = column * self._tile_size
+        y = row * self._tile_size
+        width = min(self._tile_size, self._image_size.width() - x)
+        height = min(self._tile_size, self._image_size.height() - y)
+        return decode_raw_pixels(
+            self._payload[offset : offset + length],
+            width,
+            height,
+            width * 4,
+            self._compression,
+        )
+
+    def decode_image(self):
+        image = self._image_ref() if self._image_ref is not None else None
+        if image is not None:
+            return image
+
+        image = QImage(self._image_size, RAW_IMAGE_FORMAT)
+        painter = QPainter(image)
+        painter.setCompositionMode(QPainter.CompositionMode.CompositionMode_Source)
+        for y in range(0, self._image_size.height(), self._tile_size):
+            for x in range(0, self._image_size.width(), self._tile_size):
+                painter.drawImage(
+                    x, y, self.decode_tile(x // self._tile_size, y // self._tile_size)
+                )
+        painter.end()
+        self._image_ref = weakref.ref(image)
+        return image
+
+
+def decode_image_payload(chunk_type: bytes, payload: Union[bytes, memoryview]):
+    if chunk_type == IMAGE_CHUNK_TYPE:
+        return QImage.fromData(payload, "PNG")
+
+    if chunk_type == TILED_IMAGE_CHUNK_TYPE:
+        return TiledImageSource(memoryview(payload)).decode_image()
+
+    assert chunk_type == RAW_IMAGE_CHUNK_TYPE
+    width, height, bytes_per_line, compression = RAW_IMAGE_HEADER.unpack_from(payload)
+    pixel_data = memoryview(payload)[RAW_IMAGE_HEADER.size :]
+    return decode_raw_pixels(pixel_data, width, height, bytes_per_line, compression)
+
+
+def decode_layer_image(mapping: mmap.mmap, entry: LayerIndexEntry):
+    """Decode the pixels of a layer, except for tiled layers which are never decoded upfront"""
+    if entry.chunk_type == TILED_IMAGE_CHUNK_TYPE:
+        return None
+    loader = ChunkImageLoader(mapping, entry)
+    # NOTE: layers decoded upfront hold their image, which must not keep the mapping open (see AIEProject.save)
+    image = loader()
+    return image.copy() if loader.is_zero_copy() else image
+
+
+def decode_layer_images(
+    mapping: mmap.mmap,
+    entries: Sequence[LayerIndexEntry],
+    executor: Optional[Executor] = None,
+) -> Iterator[Optional[QImage]]:
+    """Decode the pixels of layers in parallel (see decode_layer_image), layers sharing a chunk share one image"""
+    # NOTE: first entry of each chunk, in order of appearance
+    unique_entries: Dict[int, LayerIndexEntry] = {}
+    for entry in entries:
+        unique_entries.setdefault(entry.offset, entry)
+    images = map_ordered(
+        lambda entry: decode_layer_image(mapping, entry),
+        unique_entries.values(),
+        executor,
+    )
+
+    decoded_images: Dict[int, Optional[QImage]] = {}
+    for entry in entries:
+        if entry.offset not in decoded_images:
+            decoded_images[entry.offset] = next(images)
+        yield decoded_images[entry.offset]
+
+
+# Decoders of the chunks of a project file by offset, see create_image_item
+ChunkSources = Dict[int, Union[ChunkImageLoader, TiledImageSource]]
+
+
+def get_chunk_source(item: AIEImageItem):
+    """Return what a lazy layer decodes its pixels from if it reads them from a project file"""
+    if isinstance(item, AIETiledImageItem) and not item.is_image_loaded():
+        tile_source = item.get_tile_source()
+        return tile_source if isinstance(tile_source, TiledImageSource) else None
+
+    image_loader = item.get_image_loader()
+    return image_loader if isinstance(image_loader, ChunkImageLoader) else None
+
+
+def create_image_item(
+    mapping: mmap.mmap,
+    entry: LayerIndexEntry,
+    image: Optional[QImage] = None,
+    chunk_sources: Optional[ChunkSources] = None,
+):
+    """Create the item of a layer, layers without a decoded image load their pixels when first needed
+
+    Layers created with the same chunk_sources that reference the same chunk share their decoded pixels.
+    """
+    chunk_sources = {} if chunk_sources is None else chunk_sources
+    chunk_source = chunk_sources.get(entry.offset)
+
+    if entry.chunk_type == TILED_IMAGE_CHUNK_TYPE:
+        if chunk_source is None:
+            payload = ChunkImageLoader(mapping, entry).payload()
+            chunk_source = chunk_sources[entry.offset] = TiledImageSource(payload)
+        item = AIETiledImageItem(chunk_source, entry.name)
+    elif image is None:
+        if chunk_source is None:
+            chunk_source = chunk_sources[entry.offset] = ChunkImageLoader(
+                mapping, entry
+            )
+        item = AIEImageItem.create_lazy(
+            QSize(entry.width, entry.height), entry.name, chunk_source
+        )
+    else:
+        item = AIEImageItem(image, entry.name)
+
+    item.setPos(entry.x, entry.y)
+    return item
+
+
+def write_chunk(chunk_type: bytes, payload: Sequence, writer: BufferedWriter):
+    """Write a chunk from a list of byte buffers and return its payload offset and length"""
+    header = BinaryWriter(CHUNK_PAYLOAD_ALIGNMENT + 4 + len(chunk_type) + 8)
+    padding = -(writer.tell() + 4 + len(chunk_type) + 8) % CHUNK_PAYLOAD_ALIGNMENT
+    header.write_bytes(bytes(padding))
+
+    length = sum(memoryview(part).nbytes for part in payload)
+    header.write_pascal_string(chunk_type)
+    header.write_uint64_le(length)
+    writer.write(header.getbuffer())
+
+    offset = writer.tell()
+    for part in payload:
+        writer.write(part)
+
+    return offset, length
+
+
+def write_layer_index(entries: List[LayerIndexEntry], writer: BufferedWriter):
+    index_offset = writer.tell()
+
+    index = BinaryWriter()
+    index.write_pascal_string(INDEX_CHUNK_TYPE)
+    index.write_uint32_le(len(entries))
+
+    for entry in entries:
+        index.write_pascal_string(entry.chunk_type)
+        index.write_unicode_string(entry.name)
+        index.write_struct(
+            INDEX_ENTRY_RECORD,
+            entry.x,
+            entry.y,
+            entry.width,
+            entry.height,
+            entry.offset,
+            entry.length,
+        )
+        index.write_pascal_string(entry.digest)
+
+    index.write_uint64_le(index_offset)
+    index.write_bytes(INDEX_FOOTER_MAGIC)
+    writer.write(index.getbuffer())
+
+
+def read_layer_index(mapping: mmap.mmap, version: int = FORMAT_VERSION):
+    """Read the index that the footer points at, raise ValueError if the file is truncated or its footer is corrupt"""
+    footer_offset = len(mapping) - INDEX_FOOTER_SIZE
+    if (
+        footer_offset < len(MAGIC_BYTES)
+        or mapping[-len(INDEX_FOOTER_MAGIC) :] != INDEX_FOOTER_MAGIC
+    ):
+        raise ValueError("Project file has no index footer, it may be truncated")
+
+    reader = BinaryReader(mapping, footer_offset)
+    index_offset = reader.read_uint64_le()
+    # NOTE: checked before reading anything, a corrupt offset would read a string length from anywhere in the file
+    index_chunk_header = UINT32_LE.pack(len(INDEX_CHUNK_TYPE)) + INDEX_CHUNK_TYPE
+    if (
+        not len(MAGIC_BYTES) <= index_offset < footer_offset
+        or mapping[index_offset : index_offset + len(index_chunk_header)]
+        != index_chunk_header
+    ):
+        raise ValueError(f"Index footer points at no index (offset {index_offset})")
+    reader.offset = index_offset + len(index_chunk_header)
+
+    entries: List[LayerIndexEntry] = []
+    for i in range(reader.read_uint32_le()):
+        chunk_type = reader.read_pascal_string()
+        name = reader.read_unicode_string()
+        record = reader.read_struct(INDEX_ENTRY_RECORD)
+        digest = reader.read_pascal_string() if version >= 2 else b""
+        entry = LayerIndexEntry(chunk_type, name, *record, digest)
+        if entry.offset + entry.length > index_offset:
+            raise ValueError(f"Layer {name!r} is out of the project file")
+        entries.append(entry)
+
+    return entries
+
+
+def write_project_header(writer: BufferedWriter):
+    header = BinaryWriter()
+    header.write_bytes(MAGIC_BYTES)
+    header.write_pascal_string(VERSION_CHUNK_TYPE)
+    header.write_uint32_le(FORMAT_VERSION)
+    writer.write(header.getbuffer())
+
+
+def read_project_header(reader: BinaryReader):
+    """Read the file header and return the format version"""
+    assert reader.read_bytes(len(MAGIC_BYTES)) == MAGIC_BYTES
+
+    chunk_type = reader.read_pascal_string()
+    if chunk_type == LAYERS_CHUNK_TYPE:
+        return 0
+
+    assert chunk_type == VERSION_CHUNK_TYPE
+    version = reader.read_uint32_le()
+    assert version <= FORMAT_VERSION
+    return version
+
+
+def read_version_0_layers(reader: BinaryReader):
+    """Yield the name, position and image of each layer of a version 0 file, layers are stored sequentially"""
+    num_layers = reader.read_uint32_le()
+
+    for i in range(num_layers):
+        chunk_type = reader.read_pascal_string()
+
+        if chunk_type == IMAGE_CHUNK_TYPE:
+            layer_name = reader.read_unicode_string()
+            x = reader.read_float_le()
+            y = reader.read_float_le()
+
+            image_data = reader.read_bytes(reader.read_uint32_le())
+            image = QImage.fromData(image_data, "PNG")
+
+            yield layer_name, x, y, image
 
 
 class AIEProject:
@@ -37,6 +573,17 @@ class AIEProject:
         self._graphics_scene_model = TreeModel(self._graphics_scene)
         self._layers_widget = LayersWidget(self._graphics_scene_model)
 
+        # File the project was loaded from or last saved to
+        self._filepath: Optional[str] = None
+        self._file_stat: Optional[os.stat_result] = None
+        # Keeps the project file mapped while layers still reference it
+        # (lazy layers, whose raw images read their pixels straight from the mapping)
+        self._file_mapping: Optional[Union[mmap.mmap, bytes]] = None
+        # Where the pixels of each layer are in the mapped project file
+        self._saved_entries: Dict[AIEImageItem, LayerIndexEntry] = {}
+        # Chunks of the mapped project file by digest, including those of layers removed since it was saved
+        self._saved_entries_by_digest: Dict[bytes, LayerIndexEntry] = {}
+
     def add_image_layer(self, image: QImage, layer_name: str):
         self._graphics_scene.addItem(AIEImageItem(image, layer_name))
 
@@ -49,74 +596,457 @@ class AIEProject:
     def get_graphics_scene(self):
         return self._graphics_scene
 
-    def render(self):
+    def render(
+        self,
+        tile_size: int = DEFAULT_RENDER_TILE_SIZE,
+        max_workers: Optional[int] = None,
+        scale: Optional[float] = None,
+        max_size: Optional[int] = None,
+        source_rect: Optional[QRectF] = None,
+    ):
+        """Render all layers, in tiles of tile_size pixels painted by up to max_workers threads (see render_scene)
+
+        Only source_rect is rendered if given, in scene coordinates (the bounding rect of all layers by default).
+        It is scaled by scale and fitted in max_size x max_size pixels if given, e.g. for previews,
+        without rendering the full resolution image first.
+        """
         scene = self._graphics_scene
         # Fit scene to items
         scene.setSceneRect(scene.itemsBoundingRect())
+        source = scene.sceneRect() if source_rect is None else QRectF(source_rect)
+        is_scaled = scale is not None or max_size is not None
+        if not is_scaled:
+            source = get_unscaled_render_source(source)
 
         # Create new empty image to render the scene into
         image = QImage(
-            scene.sceneRect().size().toSize(),
+            get_render_size(source, scale, max_size),
             QImage.Format.Format_ARGB32_Premultiplied,
         )
         assert image is not None  # In case creation of image fails
         image.fill(Qt.GlobalColor.transparent)
 
-        painter = QPainter(image)
-        scene.render(painter)
-        # NOTE: End painter explicitly to fix "QPaintDevice: Cannot destroy paint device that is being painted"
-        painter.end()
-
+        render_scene(scene, image, source, tile_size, max_workers, is_scaled)
         return image
 
-    def serialize(self, writer: BufferedWriter):
-        writer.write(MAGIC_BYTES)
-        write_pascal_string(LAYERS_CHUNK_TYPE, writer)
-        num_layers = len(self._graphics_scene.items())
-        write_uint32_le(num_layers, writer)
+    def export_png(
+        self,
+        filepath: str,
+        strip_height: int = DEFAULT_RENDER_STRIP_HEIGHT,
+        tile_size: int = DEFAULT_RENDER_TILE_SIZE,
+        max_workers: Optional[int] = None,
+        compression_level: int = DEFAULT_PNG_COMPRESSION_LEVEL,
+    ):
+        """Render all layers to a PNG file, strip by strip, without holding the whole image in memory
+
+        Each strip of strip_height rows is rendered (see iter_render_scene_strips) then compressed into the file
+        before the next one, so only a few strips are in memory at once, whatever the size of the image.
+        The image has the size and pixels of the one rendered by render, except for thin strokes crossing
+        from a strip to the next (see iter_render_scene_strips).
+        """
+        scene = self._graphics_scene
+        # Fit scene to items
+        scene.setSceneRect(scene.itemsBoundingRect())
+        # NOTE: the same source as render, rendering in strips requires the source to be unscaled
+        source = get_unscaled_render_source(scene.sceneRect())
+        size = source.size().toSize()
+        if size.isEmpty():
+            raise ValueError("Cannot export a project without visible layers to PNG")
+
+        # NOTE: written to a new file then moved over the target, which is left untouched if rendering fails
+        temp_filepath = filepath + ".tmp"
+        try:
+            with open(temp_filepath, "wb") as writer:
+                png_writer = PNGStreamWriter(
+                    writer, size.width(), size.height(), compression_level
+                )
+                for strip in iter_render_scene_strips(
+                    scene, source, size, strip_height, tile_size, max_workers
+                ):
+                    png_writer.write_rows(strip)
+                png_writer.close()
+            os.replace(temp_filepath, filepath)
+        except BaseException:
+            with suppress(OSError):
+                os.remove(temp_filepath)
+            raise
+
+    def _get_saved_entry(self, item: AIEImageItem, encoding: ImageEncoding):
+        """Return the index entry of the item's pixels in the project file if they did not change since"""
+        if DirtyFlag.PIXELS in item.get_dirty_flags():
+            return None
+
+        entry = self._saved_entries.get(item)
+        if entry is None or not self._is_chunk_reusable(entry, encoding):
+            return None
 
+        return entry
+
+    @staticmethod
+    def _is_chunk_reusable(entry: LayerIndexEntry, encoding: ImageEncoding):
+        # NOTE: tiled layers are always kept tiled, re-encoding them would require decoding all of their tiles
+        return entry.chunk_type in (
+            ENCODING_CHUNK_TYPES[encoding],
+            TILED_IMAGE_CHUNK_TYPE,
+        )
+
+    def set_saved_file(
+        self,
+        filepath: Optional[str],
+        mapping: Union[mmap.mmap, bytes],
+        items: List[AIEImageItem],
+        entries: List[LayerIndexEntry],
+    ):
+        """Record that the pixels of items are stored in the mapped project file as described by entries"""
+        self._filepath = filepath
+        self._file_mapping = mapping
+        self._file_stat = os.stat(filepath) if filepath is not None else None
+        self._saved_entries = dict(zip(items, entries))
+        self._saved_entries_by_digest = {
+            entry.digest: entry for entry in entries if entry.digest
+        }
+        for item in items:
+            item.clear_dirty_flags()
+
+    def _write_layers(
+        self,
+        writer: BufferedWriter,
+        encoding: ImageEncoding,
+        zlib_level: int,
+        executor: Optional[Executor],
+        reuse_in_place: bool,
+    ):
+        # NOTE: with reuse_in_place, writer must be appending to the project file, unchanged layers are not written again
         # NOTE: save in back-to-front (AscendingOrder) order to preserve same layer order when importing back
-        # TODO: order independent file format? (e.g. save layer index in file?)
-        for item in self._graphics_scene.items(Qt.SortOrder.AscendingOrder):
-            if isinstance(item, AIEImageItem):
-                write_pascal_string(IMAGE_CHUNK_TYPE, writer)
-                write_unicode_string(item.name, writer)
+        image_items = [
+            item
+            for item in self._graphics_scene.items(Qt.SortOrder.AscendingOrder)
+            if isinstance(item, AIEImageItem)
+        ]
+        # NOTE: removed layers are not kept alive until the save succeeds, their chunks can still be reused by digest
+        self._saved_entries = {
+            item: self._saved_entries[item]
+            for item in image_items
+            if item in self._saved_entries
+        }
+        saved_entries = [self._get_saved_entry(item, encoding) for item in image_items]
+
+        # Saved chunks that changed layers can reuse if their pixels are identical
+        saved_entries_by_digest = {
+            digest: entry
+            for digest, entry in self._saved_entries_by_digest.items()
+            if self._is_chunk_reusable(entry, encoding)
+        }
+
+        # Changed layers are hashed and encoded concurrently, but written in order,
+        # so the output is the same as processing them sequentially
+        # NOTE: images are read on the calling thread as tasks are submitted, workers never touch the graphics items,
+        # and only the images of pending tasks are held at once
+        changed_digests = map_ordered(
+            lambda image: (compute_image_digest(image), image),
+            (
+                item.image
+                for item, saved_entry in zip(image_items, saved_entries)
+                if saved_entry is None
+            ),
+            executor,
+        )
+
+        def iter_layers():
+            """Yield the digest and saved entry (if any) of each layer, with its image if it must be encoded"""
+            encoded_digests = set()
+            for saved_entry in saved_entries:
+                if saved_entry is not None:
+                    yield saved_entry.digest, saved_entry, None
+                    continue
+
+                # NOTE: only the first layer with some new pixels is encoded
+                digest, image = next(changed_digests)
+                saved_entry = saved_entries_by_digest.get(digest)
+                if saved_entry is None and digest not in encoded_digests:
+                    encoded_digests.add(digest)
+                    yield digest, None, image
+                else:
+                    yield digest, saved_entry, None
+
+        def encode_layer(
+            layer: Tuple[bytes, Optional[LayerIndexEntry], Optional[QImage]],
+        ):
+            digest, saved_entry, image = layer
+            if image is None:
+                return digest, saved_entry, None
+            return (
+                digest,
+                saved_entry,
+                encode_image_payload(image, encoding, zlib_level),
+            )
+
+        layers = map_ordered(encode_layer, iter_layers(), executor)
+
+        # Chunks written (or kept in place) by this save, by digest (or saved offset if the digest is unknown)
+        chunks: Dict[Union[bytes, int], Tuple[bytes, int, int]] = {}
+        entries: List[LayerIndexEntry] = []
+        for item, (digest, saved_entry, encoded_chunk) in zip(image_items, layers):
+            key = digest or saved_entry.offset
+            if key not in chunks:
+                if saved_entry is None:
+                    chunk_type, payload = encoded_chunk
+                    offset, length = write_chunk(chunk_type, payload, writer)
+                elif reuse_in_place:
+                    chunk_type = saved_entry.chunk_type
+                    offset, length = saved_entry.offset, saved_entry.length
+                else:
+                    # Copy unchanged pixels as-is from the project file instead of decoding and re-encoding them
+                    chunk_type = saved_entry.chunk_type
+                    payload = memoryview(self._file_mapping)[
+                        saved_entry.offset : saved_entry.offset + saved_entry.length
+                    ]
+                    offset, length = write_chunk(chunk_type, [payload], writer)
+                chunks[key] = chunk_type, offset, length
+
+            chunk_type, offset, length = chunks[key]
+            rect = item.boundingRect()
+            entries.append(
+                LayerIndexEntry(
+                    chunk_type=chunk_type,
+                    name=item.name,
+                    x=item.pos().x(),
+                    y=item.pos().y(),
+                    width=int(rect.width()),
+                    height=int(rect.height()),
+                    offset=offset,
+                    length=length,
+                    digest=digest,
+                )
+            )
+
+        write_layer_index(entries, writer)
+        return image_items, entries
+
+    def serialize(
+        self,
+        writer: BufferedWriter,
+        encoding: ImageEncoding = ImageEncoding.PNG,
+        zlib_level: int = 1,
+        executor: Optional[Executor] = None,
+    ):
+        """Write the project, layers are encoded in parallel on executor (the shared thread pool by default)"""
+        write_project_header(writer)
+        return self._write_layers(writer, encoding, zlib_level, executor, False)
+
+    def _has_reusable_chunks(self, encoding: ImageEncoding):
+        """Whether appending to the saved file would reuse any of its chunks, otherwise it is rewritten directly
+
+        e.g. after changing encoding, every layer would be appended then written again by compaction.
+        """
+        return any(
+            item.scene() is self._graphics_scene
+            and self._get_saved_entry(item, encoding) is not None
+            for item in self._saved_entries
+        )
+
+    def _can_append_to(self, filepath: str):
+        if self._filepath is None or not os.path.exists(filepath):
+            return False
 
-                write_float_le(item.pos().x(), writer)
-                write_float_le(item.pos().y(), writer)
+        # NOTE: the appended index must be in the format of the file header, older files are rewritten instead
+        if read_project_header(BinaryReader(self._file_mapping)) != FORMAT_VERSION:
+            return False
 
-                byte_array = QByteArray()
-                buffer = QBuffer(byte_array)
-                buffer.open(QIODevice.OpenModeFlag.WriteOnly)
-                item.image.save(buffer, "PNG")
+        # Make sure the file was not replaced or modified by someone else since
+        stat = os.stat(filepath)
+        return os.path.samefile(filepath, self._filepath) and (
+            stat.st_size,
+            stat.st_mtime_ns,
+        ) == (self._file_stat.st_size, self._file_stat.st_mtime_ns)
 
-                write_uint32_le(len(byte_array), writer)
-                writer.write(byte_array.data())
+    def _append_to_saved_file(
+        self, encoding: ImageEncoding, zlib_level: int, executor: Optional[Executor]
+    ):
+        with open(self._filepath, "r+b") as file:
+            file.seek(0, os.SEEK_END)
+            try:
+                items, entries = self._write_layers(
+                    file, encoding, zlib_level, executor, True
+                )
+            except BaseException:
+                # NOTE: the file is not truncated, its mapped pages must stay valid (and mapped files cannot be
+                # resized on Windows), the previous footer is appended instead so its index ends the file again,
+                # what was appended is left unreferenced until the file is compacted
+                file.seek(0, os.SEEK_END)
+                file.write(self._file_mapping[-INDEX_FOOTER_SIZE:])
+                file.flush()
+                # Saved entries still describe the file, later saves can keep appending to it
+                self._file_stat = os.stat(self._filepath)
+                raise
+
+            file_size = file.tell()
+            file.flush()
+            mapping = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        # NOTE: chunks of layers removed before this save are still in the file, and can still be reused
+        saved_entries_by_digest = self._saved_entries_by_digest
+        self.set_saved_file(self._filepath, mapping, items, entries)
+        self._saved_entries_by_digest = {
+            **saved_entries_by_digest,
+            **self._saved_entries_by_digest,
+        }
+        return file_size
+
+    def save(
+        self,
+        filepath: str,
+        encoding: ImageEncoding = ImageEncoding.PNG,
+        zlib_level: int = 1,
+        executor: Optional[Executor] = None,
+        incremental: bool = True,
+    ):
+        """Save the project to filepath.
+
+        When saving to the file the project was loaded from or last saved to, only changed layers are appended
+        to it, followed by a new index. Unchanged layers are never rewritten, so a save costs about as much as the
+        changes. The file is compacted (rewritten in full) once unreferenced chunks take up most of it.
+        """
+        if (
+            incremental
+            and self._can_append_to(filepath)
+            and self._has_reusable_chunks(encoding)
+        ):
+            file_size = self._append_to_saved_file(encoding, zlib_level, executor)
+            # NOTE: layers with the same pixels share their chunk
+            live_size = sum(
+                length
+                for _, length in {
+                    (entry.offset, entry.length)
+                    for entry in self._saved_entries.values()
+                }
+            )
+            if live_size >= COMPACTION_MIN_LIVE_RATIO * file_size:
+                return
+
+        # NOTE: always write a new file then replace the target, layers may still be mapped from the file being
+        # overwritten, which is never modified
+        temp_filepath = filepath + ".tmp"
+        try:
+            with open(temp_filepath, "wb") as file:
+                items, entries = self.serialize(file, encoding, zlib_level, executor)
+        except BaseException:
+            with suppress(OSError):
+                os.remove(temp_filepath)
+            raise
+
+        # NOTE: mapped files cannot be replaced on Windows, layers stop reading the previous file so it can be
+        # unmapped, then read the new one once it replaced the target
+        self._release_saved_file(items)
+        try:
+            os.replace(temp_filepath, filepath)
+        except BaseException:
+            # The new file is complete, layers read it where it was written, the next save rewrites it in full
+            self._map_saved_file(temp_filepath, items, entries)
+            self._filepath = self._file_stat = None
+            raise
+        self._map_saved_file(filepath, items, entries)
+
+    def _release_saved_file(self, items: List[AIEImageItem]):
+        """Stop lazy layers reading project files, and unmap them, until _map_saved_file"""
+        mappings = [self._file_mapping]
+        released_sources = set()
+        for item in items:
+            chunk_source = get_chunk_source(item)
+            # NOTE: layers sharing a chunk share its source, which is only released once
+            if chunk_source is None or chunk_source in released_sources:
+                continue
+            released_sources.add(chunk_source)
+            if chunk_source.is_zero_copy():
+                item.discard_cached_image()
+            mappings.append(chunk_source.release())
+
+        self._file_mapping = None
+        for mapping in mappings:
+            # NOTE: images still referenced elsewhere keep their mapping open, it is then unmapped once unused
+            if isinstance(mapping, mmap.mmap):
+                with suppress(BufferError):
+                    mapping.close()
+
+    def _map_saved_file(
+        self,
+        filepath: str,
+        items: List[AIEImageItem],
+        entries: List[LayerIndexEntry],
+    ):
+        with open(filepath, "rb") as file:
+            mapping = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        for item, entry in zip(items, entries):
+            chunk_source = get_chunk_source(item)
+            if isinstance(chunk_source, TiledImageSource):
+                # NOTE: tiled chunks are copied as is, the tiles are where they were in the payload
+                chunk_source.remap(ChunkImageLoader(mapping, entry).payload())
+            elif chunk_source is not None:
+                chunk_source.remap(mapping, entry)
+
+        self.set_saved_file(filepath, mapping, items, entries)
+
+    def get_filepath(self):
+        return self._filepath
 
     @staticmethod
-    def deserialize(reader: BufferedReader):
-        assert reader.read(len(MAGIC_BYTES)) == MAGIC_BYTES
+    def load(filepath: str, *, lazy: bool = True):
+        with open(filepath, "rb") as file:
+            return AIEProject.deserialize(file, lazy=lazy)
 
-        # Expecting layers chunk
-        chunk_type = read_pascal_string(reader)
-        assert chunk_type == LAYERS_CHUNK_TYPE
+    @staticmethod
+    def deserialize(
+        reader: BufferedReader,
+        *,
+        lazy: bool = True,
+        executor: Optional[Executor] = None,
+    ):
+        """Read a project, lazy layers are only decoded when first needed, others are decoded in parallel on executor"""
+        try:
+            fileno = reader.fileno()
+        except (AttributeError, UnsupportedOperation):
+            # NOTE: in-memory readers (e.g. BytesIO) have no file to map, layers read their pixels from a copy
+            mapping = reader.read()
+        else:
+            # NOTE: the mapping stays valid after the reader is closed, and is kept by the project
+            mapping = mmap.mmap(fileno, 0, access=mmap.ACCESS_READ)
+
+        header_reader = BinaryReader(mapping)
+        version = read_project_header(header_reader)
+        if version == 0:
+            return AIEProject._deserialize_version_0(header_reader)
 
         project = AIEProject()
         scene = project.get_graphics_scene()
-        num_layers = read_uint32_le(reader)
 
-        for i in range(num_layers):
-            chunk_type = read_pascal_string(reader)
+        entries = read_layer_index(mapping, version)
+        if lazy:
+            images = [None] * len(entries)
+        else:
+            images = decode_layer_images(mapping, entries, executor)
+
+        items = []
+        chunk_sources: ChunkSources = {}
+        with scene.inserting_items():
+            for entry, image in zip(entries, images):
+                item = create_image_item(mapping, entry, image, chunk_sources)
+                scene.addItem(item)
+                items.append(item)
 
-            if chunk_type == IMAGE_CHUNK_TYPE:
-                layer_name = read_unicode_string(reader)
-                x = read_float_le(reader)
-                y = read_float_le(reader)
+        filepath = getattr(reader, "name", None)
+        if not isinstance(filepath, str):
+            filepath = None
+        project.set_saved_file(filepath, mapping, items, entries)
+        return project
 
-                image_data_length = read_uint32_le(reader)
-                image_data = reader.read(image_data_length)
-                image = QImage.fromData(image_data, "PNG")
+    @staticmethod
+    def _deserialize_version_0(reader: BinaryReader):
+        project = AIEProject()
+        scene = project.get_graphics_scene()
 
+        with scene.inserting_items():
+            for layer_name, x, y, image in read_version_0_layers(reader):
                 item = AIEImageItem(image, layer_name)
                 item.setPos(x, y)
                 scene.addItem(item)
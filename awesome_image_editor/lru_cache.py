@@ -0,0 +1,63 @@
+import threading
+from collections import OrderedDict
+from typing import Callable, Generic, Hashable, Optional, TypeVar
+
+__all__ = ("LRUCache",)
+
+V = TypeVar("V")
+
+
+class LRUCache(Generic[V]):
+    """A thread-safe cache bounded by the total size of its values, evicting the least recently used ones first"""
+
+    def __init__(self, max_size: int, get_size: Callable[[V], int]):
+        self._max_size = max_size
+        self._get_size = get_size
+        self._size = 0
+        self._values: "OrderedDict[Hashable, V]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_max_size(self):
+        return self._max_size
+
+    def set_max_size(self, max_size: int):
+        with self._lock:
+            self._max_size = max_size
+            self._evict()
+
+    def get_size(self):
+        return self._size
+
+    def get(self, key: Hashable) -> Optional[V]:
+        with self._lock:
+            value = self._values.get(key)
+            if value is not None:
+                self._values.move_to_end(key)
+            return value
+
+    def put(self, key: Hashable, value: V):
+        with self._lock:
+            self._discard(key)
+            self._values[key] = value
+            self._size += self._get_size(value)
+            self._evict()
+
+    def discard(self, key: Hashable):
+        with self._lock:
+            self._discard(key)
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+            self._size = 0
+
+    def _discard(self, key: Hashable):
+        value = self._values.pop(key, None)
+        if value is not None:
+            self._size -= self._get_size(value)
+
+    def _evict(self):
+        # NOTE: a value larger than the whole cache is evicted right away, it is still returned to whoever created it
+        while self._size > self._max_size and len(self._values) > 0:
+            key, value = self._values.popitem(last=False)
+            self._size -= self._get_size(value)
@@ -1,21 +1,24 @@
 import traceback
 from pathlib import Path
+from typing import Optional
 
 from PyQt6.QtCore import QStandardPaths, Qt
-from PyQt6.QtGui import QFont, QImage
+from PyQt6.QtGui import QCloseEvent, QFont, QImage, QKeySequence
 from PyQt6.QtWidgets import (
     QDockWidget,
     QGraphicsBlurEffect,
     QMainWindow,
     QMenu,
     QMessageBox,
+    QProgressDialog,
     QToolBar,
 )
 
 from .dialogs.gaussian_blur import GaussianBlurDialog
 from .file_dialog import create_open_file_dialog, create_save_file_dialog
-from .file_format import AIEProject
-from .psd_read import load_psd_as_project
+from .file_format import AIEProject, ImageEncoding
+from .project_loader import AIEBaseLoader, AIEProjectLoader
+from .psd_read.loader import AIEPSDLoader
 
 __all__ = ("MainWindow",)
 
@@ -24,6 +27,8 @@ class MainWindow(QMainWindow):
     def __init__(self):
         super().__init__()
         self.setWindowTitle("Awesome Image Editor")
+        # Save layers as raw pixels instead of PNG, much faster but produces larger files
+        self._is_fast_save_enabled = False
         self.setup_file_menu()
         self.setup_filters_menu()
 
@@ -35,6 +40,7 @@ class MainWindow(QMainWindow):
         )
 
         self._project = AIEProject()
+        self._project_loader: Optional[AIEBaseLoader] = None
         self.setCentralWidget(self._project.get_graphics_view())
         self.layers_dock_widget.setWidget(self._project.get_layers_widget())
 
@@ -67,8 +73,53 @@ class MainWindow(QMainWindow):
 
         if dlg.exec():
             filepath = dlg.selectedFiles()[0]
-            with open(filepath, "rb") as file:
-                self.set_project(AIEProject.deserialize(file))
+            self.load_project(filepath)
+
+    def load_project(self, filepath: str):
+        """Open a project in the background, its layers are shown as soon as they are loaded"""
+        self._start_loader(AIEProjectLoader(filepath), "Opening project...")
+
+    def _stop_loader(self):
+        if self._project_loader is not None:
+            # NOTE: wait for the loader, a QThread must not be destroyed while running
+            self._project_loader.cancel()
+            self._project_loader.wait()
+
+    def _start_loader(self, loader: AIEBaseLoader, label_text: str):
+        self._stop_loader()
+        self._project_loader = loader
+        self.set_project(loader.get_project())
+
+        progress_dialog = QProgressDialog(label_text, "Cancel", 0, 0, self)
+        progress_dialog.setWindowModality(Qt.WindowModality.NonModal)
+        progress_dialog.setMinimumDuration(500)
+        progress_dialog.canceled.connect(loader.cancel)
+
+        def on_progress_changed(value: int, maximum: int):
+            progress_dialog.setMaximum(maximum)
+            progress_dialog.setValue(value)
+
+        loader.progressChanged.connect(on_progress_changed)
+        loader.loadFailed.connect(
+            lambda error: QMessageBox.critical(self, "Error", error)
+        )
+        # NOTE: reset hides the dialog without emitting canceled, unlike close. Cancelled loaders finish too,
+        # so each dialog is deleted along with its loader, instead of piling up as children of the window
+        loader.finished.connect(progress_dialog.reset)
+        loader.finished.connect(progress_dialog.deleteLater)
+        loader.start()
+
+    def closeEvent(self, event: QCloseEvent) -> None:
+        # NOTE: the application quits once its last window is closed, a project may still be loading
+        self._stop_loader()
+        super().closeEvent(event)
+
+    def save_project(self):
+        filepath = self._project.get_filepath()
+        if filepath is None:
+            self.save_as_project()
+        else:
+            self.save_project_to(filepath)
 
     def save_as_project(self):
         if self._project is None:
@@ -83,8 +134,16 @@ class MainWindow(QMainWindow):
 
         if dlg.exec():
             filepath = dlg.selectedFiles()[0]
-            with open(filepath, "wb") as file:
-                self._project.serialize(file)
+            self.save_project_to(filepath)
+
+    def save_project_to(self, filepath: str):
+        if self._is_fast_save_enabled:
+            self._project.save(filepath, ImageEncoding.RAW)
+        else:
+            self._project.save(filepath)
+
+    def set_fast_save_enabled(self, value: bool):
+        self._is_fast_save_enabled = value
 
     def open_image(self):
         default_dir = QStandardPaths.writableLocation(
@@ -110,8 +169,12 @@ class MainWindow(QMainWindow):
         try:
             if dlg.exec():
                 filepath = dlg.selectedFiles()[0]
-                image = self._project.render()
-                image.save(filepath)
+                if filepath.lower().endswith(".png"):
+                    # NOTE: rendered and written strip by strip, large images never fully fit in memory
+                    self._project.export_png(filepath)
+                else:
+                    image = self._project.render()
+                    image.save(filepath)
         except:
             QMessageBox.critical(self, "Error", traceback.format_exc())
 
@@ -151,7 +214,12 @@ class MainWindow(QMainWindow):
         dlg = create_open_file_dialog(default_dir, "Photoshop Files (*.psd)")
         if dlg.exec():
             filepath = dlg.selectedFiles()[0]
-            self.set_project(load_psd_as_project(filepath))
+            # NOTE: the composite image embedded in the file is shown while its layers are read, pixel layers
+            # are decoded when first painted, or mapped from the layer cache when the file is opened again
+            self._start_loader(
+                AIEPSDLoader(filepath, use_layer_cache=True, lazy=True),
+                "Importing PSD...",
+            )
 
     def setup_file_menu(self):
         menu = QMenu("File", self)
@@ -159,7 +227,12 @@ class MainWindow(QMainWindow):
         menu.addAction("Open PSD", self.read_psd_as_project)
         menu.addAction("Open Image", self.open_image)
         menu.addSeparator()
+        save_action = menu.addAction("Save", self.save_project)
+        save_action.setShortcut(QKeySequence.StandardKey.Save)
         menu.addAction("Save as", self.save_as_project)
+        fast_save_action = menu.addAction("Fast Save (Larger Files)")
+        fast_save_action.setCheckable(True)
+        fast_save_action.toggled.connect(self.set_fast_save_enabled)
         menu.addSeparator()
         menu.addAction("Save Image", self.save_image)
         self.menuBar().addMenu(menu)
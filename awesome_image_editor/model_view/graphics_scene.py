@@ -1,3 +1,5 @@
+from contextlib import contextmanager
+
 from PyQt6.QtCore import QRectF, pyqtSignal
 from PyQt6.QtGui import QColor, QPainter
 from PyQt6.QtWidgets import QGraphicsItem, QGraphicsScene
@@ -5,19 +7,51 @@ from PyQt6.QtWidgets import QGraphicsItem, QGraphicsScene
 
 class AIEGraphicsScene(QGraphicsScene):
     itemAboutToBeAppended = pyqtSignal(int)
-    itemAppended = pyqtSignal()
+    itemAppended = pyqtSignal(QGraphicsItem)
+    # Emitted around batch insertions instead of the signals above, see inserting_items
+    itemsAboutToBeReset = pyqtSignal()
+    itemsReset = pyqtSignal()
 
     def __init__(self):
         super().__init__()
         self.changed.connect(self._invalidate_foreground)
+        # Number of nested inserting_items contexts
+        self._batch_insertion_depth = 0
 
     def _invalidate_foreground(self):
         self.invalidate(self.sceneRect(), QGraphicsScene.SceneLayer.ForegroundLayer)
 
+    def is_inserting_items(self):
+        return self._batch_insertion_depth > 0
+
+    @contextmanager
+    def inserting_items(self):
+        """Add many items at once, models are reset once at the end instead of being notified of every item"""
+        if self._batch_insertion_depth == 0:
+            self.itemsAboutToBeReset.emit()
+        self._batch_insertion_depth += 1
+        try:
+            yield
+        finally:
+            self._batch_insertion_depth -= 1
+            if self._batch_insertion_depth == 0:
+                self.itemsReset.emit()
+
     def addItem(self, item: QGraphicsItem) -> None:
-        self.itemAboutToBeAppended.emit(len(self.items()))
+        if self._batch_insertion_depth > 0:
+            super().addItem(item)
+            return
+
+        # NOTE: models only insert top level items, and cache them until they are reset, items with a parent
+        # must be added (or reparented) inside inserting_items
+        assert (
+            item.parentItem() is None
+        ), "Child items must be added inside inserting_items"
+
+        # NOTE: items are listed from the top of the stack, and new items are added on top of the others
+        self.itemAboutToBeAppended.emit(0)
         super().addItem(item)
-        self.itemAppended.emit()
+        self.itemAppended.emit(item)
 
     def _calc_selected_items_bounding_box(self):
         rect = QRectF()
@@ -1,8 +1,17 @@
 from typing import Optional
 from PyQt6.QtWidgets import QGraphicsView, QGraphicsScene, QRubberBand
-from PyQt6.QtGui import QPainter, QMouseEvent
+from PyQt6.QtGui import QImage, QPainter, QMouseEvent, QPixmapCache
 from PyQt6.QtCore import QRectF, QPoint, QRect, QSize, Qt
 
+# Memory kept for the rasters of items cached between repaints of views (see CACHE_MODE of items), in bytes
+# NOTE: Qt keeps them in the global QPixmapCache, which evicts the least recently used pixmaps past its limit
+DEFAULT_ITEM_CACHE_BUDGET = 256 * 1024 * 1024
+
+
+def set_item_cache_budget(budget: int):
+    """Set the memory kept for the cached rasters of items in all views, in bytes"""
+    QPixmapCache.setCacheLimit(budget // 1024)
+
 
 class AIEGraphicsView(QGraphicsView):
     def __init__(self, scene: QGraphicsScene):
@@ -13,6 +22,30 @@ class AIEGraphicsView(QGraphicsView):
         self._rubberband_selection_origin: Optional[QPoint] = None
         self._rubberband: Optional[QRubberBand] = None
 
+        # Image drawn behind the scene, e.g. a preview of a file whose layers are still loading
+        self._backdrop: Optional[QImage] = None
+
+    def get_backdrop(self):
+        return self._backdrop
+
+    def set_backdrop(self, image: Optional[QImage]):
+        """Show an image behind the scene items, at the scene origin, or stop showing it with None"""
+        self._backdrop = image
+        if image is None:
+            # NOTE: a null rect makes the view follow the scene rect again
+            self.setSceneRect(QRectF())
+        else:
+            # NOTE: the scene rect only grows with items, the backdrop must be reachable before they are loaded
+            backdrop_rect = QRectF(0, 0, image.width(), image.height())
+            self.setSceneRect(self.scene().sceneRect().united(backdrop_rect))
+        self.resetCachedContent()
+        self.viewport().update()
+
+    def drawBackground(self, painter: QPainter, rect: QRectF) -> None:
+        super().drawBackground(painter, rect)
+        if self._backdrop is not None:
+            painter.drawImage(QPoint(0, 0), self._backdrop)
+
     def mousePressEvent(self, event: QMouseEvent) -> None:
         super().mousePressEvent(event)
 
@@ -1,32 +1,164 @@
-from typing import Optional
+import math
+import threading
+from enum import Flag, auto
+from typing import Any, Callable, List, Optional
 
-from PyQt6.QtCore import QRectF, QSize, Qt
+from PyQt6.QtCore import QPointF, QRectF, QSize, QSizeF, Qt
 from PyQt6.QtGui import QImage, QPainter
 from PyQt6.QtWidgets import QGraphicsItem, QStyleOptionGraphicsItem, QWidget
 
+from ...lru_cache import LRUCache
+
 THUMBNAIL_SIZE = QSize(32, 32)
 
+# Images are not scaled down further than this many pixels on their largest side to make mip levels
+MIN_MIP_LEVEL_SIZE = 64
+
+ImageLoader = Callable[[], QImage]
+
+# Decoded images (and mip levels) of lazy layers, which are decoded again when painted after being evicted
+IMAGE_CACHE: LRUCache[QImage] = LRUCache(
+    1024 * 1024 * 1024, lambda image: image.sizeInBytes()
+)
+
+
+class DirtyFlag(Flag):
+    """What changed in an item since it was last saved or loaded"""
+
+    NONE = 0
+    PIXELS = auto()
+    NAME = auto()
+    POSITION = auto()
+    ALL = PIXELS | NAME | POSITION
+
 
 class AIEImageItem(QGraphicsItem):
+    # How views cache the item between repaints
+    # NOTE: not cached by default, drawing an image is about as fast as drawing its cached raster,
+    # which would take as much memory again for every image in view
+    CACHE_MODE = QGraphicsItem.CacheMode.NoCache
+
     def __init__(self, image: QImage, name: str):
         super().__init__()
-        self.name = name
-        self.image = image
+        # NOTE: new items were never saved, so everything is dirty
+        self._dirty_flags = DirtyFlag.ALL
+        self._name = name
+        self._image = image
+        self._image_size = image.size()
+        self._image_loader: Optional[ImageLoader] = None
+        self._image_cache = IMAGE_CACHE
+        # NOTE: images can be loaded while painting, by several render threads at once
+        self._image_load_lock = threading.Lock()
+        # Image scaled down by 2, 4, 8... made as the item is painted smaller, see _get_mip_level
+        self._mip_levels: List[QImage] = []
+        self._mip_levels_lock = threading.Lock()
+        # NOTE: only kept for lazy items, so the layers panel does not load their pixels every time it is painted
+        self._thumbnail: Optional[QImage] = None
         self.setFlag(QGraphicsItem.GraphicsItemFlag.ItemIsSelectable, True)
         self.setFlag(QGraphicsItem.GraphicsItemFlag.ItemIsMovable, True)
+        # Needed to be notified about position changes in itemChange
+        self.setFlag(QGraphicsItem.GraphicsItemFlag.ItemSendsGeometryChanges, True)
+        self.setCacheMode(self.CACHE_MODE)
+
+    @classmethod
+    def create_lazy(
+        cls,
+        image_size: QSize,
+        name: str,
+        image_loader: ImageLoader,
+        image_cache: LRUCache[QImage] = IMAGE_CACHE,
+    ):
+        """Create an item whose pixels are only loaded when the image is accessed, and kept in image_cache"""
+        item = cls(QImage(), name)
+        item._image_size = QSize(image_size)
+        item._image_loader = image_loader
+        item._image_cache = image_cache
+        return item
+
+    @property
+    def name(self) -> str:
+        return self._name
+
+    @name.setter
+    def name(self, name: str):
+        self._name = name
+        self._dirty_flags |= DirtyFlag.NAME
+
+    @property
+    def image(self) -> QImage:
+        """The pixels of the layer, edited pixels must be set back, as lazy items do not keep their image"""
+        image_loader = self._image_loader
+        if image_loader is None:
+            return self._image
+
+        # NOTE: keyed by the loader, the cache would keep the item itself alive after it is removed from the scene
+        image = self._image_cache.get(image_loader)
+        if image is None:
+            with self._image_load_lock:
+                image = self._image_cache.get(image_loader)
+                if image is None:
+                    image = image_loader()
+                    self._image_cache.put(image_loader, image)
+        return image
+
+    @image.setter
+    def image(self, image: QImage):
+        self.prepareGeometryChange()
+        self._image = image
+        self._image_size = image.size()
+        self._image_loader = None
+        self._mip_levels = []
+        self._thumbnail = None
+        self._dirty_flags |= DirtyFlag.PIXELS
+        self.update()
+
+    def get_dirty_flags(self):
+        return self._dirty_flags
+
+    def clear_dirty_flags(self):
+        self._dirty_flags = DirtyFlag.NONE
+
+    def itemChange(self, change: QGraphicsItem.GraphicsItemChange, value: Any) -> Any:
+        if change == QGraphicsItem.GraphicsItemChange.ItemPositionHasChanged:
+            self._dirty_flags |= DirtyFlag.POSITION
+        return super().itemChange(change, value)
+
+    def is_image_loaded(self):
+        """Whether the item holds its image, instead of loading it into the image cache when needed"""
+        return self._image_loader is None
+
+    def get_image_loader(self):
+        return self._image_loader
+
+    def discard_cached_image(self):
+        """Drop the image of a lazy item from the image cache, it is loaded again when next needed"""
+        if self._image_loader is not None:
+            self._image_cache.discard(self._image_loader)
 
     def get_thumbnail(self):
-        return self.image.scaled(
+        if self._thumbnail is not None and not self.is_image_loaded():
+            return self._thumbnail
+
+        thumbnail = self.image.scaled(
             THUMBNAIL_SIZE,
             Qt.AspectRatioMode.KeepAspectRatio,
             Qt.TransformationMode.SmoothTransformation,
         )
+        if not self.is_image_loaded():
+            self._thumbnail = thumbnail
+        return thumbnail
+
+    def get_cached_thumbnail(self) -> Optional[QImage]:
+        """Return the thumbnail if it was already made and is kept, without making it"""
+        # NOTE: the thumbnail is only kept until an image is set, which may then be edited
+        return None if self.is_image_loaded() else self._thumbnail
 
     def get_size_hint(self):
         return THUMBNAIL_SIZE
 
     def boundingRect(self) -> QRectF:
-        return QRectF(self.image.rect())
+        # NOTE: use the stored size so lazy items do not load their pixels just to report their bounds
+        return QRectF(QPointF(0, 0), QSizeF(self._image_size))
 
     def paint(
         self,
@@ -34,4 +166,76 @@ class AIEImageItem(QGraphicsItem):
         option: QStyleOptionGraphicsItem,
         widget: Optional[QWidget] = ...,
     ) -> None:
-        painter.drawImage(self.boundingRect(), self.image)
+        if self._paint_thumbnail(painter, option):
+            return
+
+        level_of_detail = option.levelOfDetailFromTransform(painter.worldTransform())
+        if level_of_detail <= 0:
+            return
+        painter.drawImage(self.boundingRect(), self._get_mip_level(level_of_detail))
+
+    def _get_mip_level(self, level_of_detail: float):
+        """Return the smallest level of the mip pyramid of the image that is at least as detailed as level_of_detail
+
+        Levels are the image scaled down by 2, 4, 8... each made from the previous one when first needed,
+        so items painted much smaller than their image (e.g. zoomed out) draw far fewer pixels.
+        """
+        level = int(math.log2(1 / level_of_detail)) if level_of_detail < 1 else 0
+        if level == 0:
+            return self.image
+
+        with self._mip_levels_lock:
+            image_loader = self._image_loader
+            if image_loader is None:
+                mip_levels = self._mip_levels
+            else:
+                # NOTE: like their image, lazy items do not keep their mip levels, they are kept in the image cache
+                mip_levels = []
+                while len(mip_levels) < level:
+                    mip_level = self._image_cache.get(
+                        (image_loader, len(mip_levels) + 1)
+                    )
+                    if mip_level is None:
+                        break
+                    mip_levels.append(mip_level)
+
+            while len(mip_levels) < level:
+                previous = mip_levels[-1] if mip_levels else self.image
+                if max(previous.width(), previous.height()) <= MIN_MIP_LEVEL_SIZE:
+                    break
+                # NOTE: smooth scaling by 2 averages each 2x2 block of pixels
+                mip_level = previous.scaled(
+                    max(previous.width() // 2, 1),
+                    max(previous.height() // 2, 1),
+                    Qt.AspectRatioMode.IgnoreAspectRatio,
+                    Qt.TransformationMode.SmoothTransformation,
+                )
+                mip_levels.append(mip_level)
+                if image_loader is not None:
+                    self._image_cache.put((image_loader, len(mip_levels)), mip_level)
+            return (
+                mip_levels[min(level, len(mip_levels)) - 1]
+                if mip_levels
+                else self.image
+            )
+
+    def _paint_thumbnail(self, painter: QPainter, option: QStyleOptionGraphicsItem):
+        """Paint the thumbnail instead of the image if the item is painted no larger, e.g. in scaled down renders"""
+        thumbnail = self.get_cached_thumbnail()
+        # NOTE: thumbnails of layers that fit in THUMBNAIL_SIZE are their image scaled up, never painted instead of it
+        is_larger_than_thumbnail = (
+            self._image_size.width() > THUMBNAIL_SIZE.width()
+            or self._image_size.height() > THUMBNAIL_SIZE.height()
+        )
+        if thumbnail is None or not is_larger_than_thumbnail:
+            return False
+
+        level_of_detail = option.levelOfDetailFromTransform(painter.worldTransform())
+        if (
+            thumbnail.width() < self._image_size.width() * level_of_detail
+            or thumbnail.height() < self._image_size.height() * level_of_detail
+        ):
+            return False
+
+        painter.drawImage(self.boundingRect(), thumbnail)
+        return True
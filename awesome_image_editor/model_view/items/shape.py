@@ -6,13 +6,40 @@ from PyQt6.QtWidgets import QGraphicsItem, QStyleOptionGraphicsItem, QWidget
 
 
 class AIEShapeItem(QGraphicsItem):
+    # How views cache the item between repaints, paths are kept rasterized as they are slow to fill
+    CACHE_MODE = QGraphicsItem.CacheMode.DeviceCoordinateCache
+
     def __init__(self, path: QPainterPath, name: str):
         super().__init__()
         self.name = name
-        self.path = path
-        self.stroke_color = QColor(0, 0, 0)
+        self._path = path
+        # NOTE: computed once, the bounding rect is queried on every paint and scene index update
+        self._bounding_rect = path.boundingRect()
+        self._stroke_color = QColor(0, 0, 0)
         self.setFlag(QGraphicsItem.GraphicsItemFlag.ItemIsSelectable, True)
         self.setFlag(QGraphicsItem.GraphicsItemFlag.ItemIsMovable, True)
+        self.setCacheMode(self.CACHE_MODE)
+
+    @property
+    def path(self) -> QPainterPath:
+        return self._path
+
+    @path.setter
+    def path(self, path: QPainterPath):
+        self.prepareGeometryChange()
+        self._path = path
+        self._bounding_rect = path.boundingRect()
+        self.update()
+
+    @property
+    def stroke_color(self) -> QColor:
+        return self._stroke_color
+
+    @stroke_color.setter
+    def stroke_color(self, color: QColor):
+        self._stroke_color = color
+        # NOTE: also invalidates the cached raster of the item
+        self.update()
 
     def get_thumbnail(self):
         ...
@@ -21,7 +48,7 @@ class AIEShapeItem(QGraphicsItem):
         ...
 
     def boundingRect(self) -> QRectF:
-        return self.path.boundingRect()
+        return self._bounding_rect
 
     def paint(
         self,
@@ -29,5 +56,5 @@ class AIEShapeItem(QGraphicsItem):
         option: QStyleOptionGraphicsItem,
         widget: Optional[QWidget] = ...,
     ) -> None:
-        painter.setPen(self.stroke_color)
-        painter.drawPath(self.path)
+        painter.setPen(self._stroke_color)
+        painter.drawPath(self._path)
@@ -10,11 +10,15 @@ from PyQt6.QtWidgets import (
 
 
 class AIETextItem(QGraphicsTextItem):
+    # How views cache the item between repaints, text is kept rasterized as laying out and drawing glyphs is slow
+    CACHE_MODE = QGraphicsItem.CacheMode.DeviceCoordinateCache
+
     def __init__(self, text: str, name: str):
         super().__init__(text)
         self.name = name
         self.setFlag(QGraphicsItem.GraphicsItemFlag.ItemIsSelectable, True)
         self.setFlag(QGraphicsItem.GraphicsItemFlag.ItemIsMovable, True)
+        self.setCacheMode(self.CACHE_MODE)
         self.setTextInteractionFlags(Qt.TextInteractionFlag.NoTextInteraction)
         self.document().setLayoutEnabled(True)
 
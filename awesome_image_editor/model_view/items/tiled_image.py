@@ -0,0 +1,114 @@
+import math
+from typing import Optional, Protocol
+
+from PyQt6.QtCore import QPoint, QPointF, QRect, QSize, Qt
+from PyQt6.QtGui import QImage, QPainter
+from PyQt6.QtWidgets import QGraphicsItem, QStyleOptionGraphicsItem, QWidget
+
+from ...lru_cache import LRUCache
+from .image import THUMBNAIL_SIZE, AIEImageItem
+
+# Decoded tiles of all tiled layers, so panning back and forth does not decode the same tiles again
+TILE_CACHE: LRUCache[QImage] = LRUCache(
+    512 * 1024 * 1024, lambda image: image.sizeInBytes()
+)
+
+
+class TileSource(Protocol):
+    def get_image_size(self) -> QSize: ...
+
+    def get_tile_size(self) -> int: ...
+
+    def decode_tile(self, column: int, row: int) -> QImage: ...
+
+    def decode_image(self) -> QImage: ...
+
+
+class AIETiledImageItem(AIEImageItem):
+    """An image layer stored as fixed-size tiles, only the tiles that are painted are decoded"""
+
+    def __init__(self, tile_source: TileSource, name: str):
+        super().__init__(QImage(), name)
+        self._tile_source = tile_source
+        self._image_size = tile_source.get_image_size()
+        # NOTE: the whole image is only assembled when explicitly accessed (e.g. to save a modified layer)
+        self._image_loader = tile_source.decode_image
+        # Needed for option.exposedRect to hold the exposed part of the item, instead of its whole bounding rect
+        self.setFlag(QGraphicsItem.GraphicsItemFlag.ItemUsesExtendedStyleOption, True)
+
+    def get_tile_source(self):
+        return self._tile_source
+
+    def discard_cached_image(self):
+        super().discard_cached_image()
+        tile_size = self._tile_source.get_tile_size()
+        for row in range(math.ceil(self._image_size.height() / tile_size)):
+            for column in range(math.ceil(self._image_size.width() / tile_size)):
+                TILE_CACHE.discard((self._tile_source, column, row))
+
+    def _get_tile(self, column: int, row: int, use_cache: bool):
+        key = (self._tile_source, column, row)
+        tile = TILE_CACHE.get(key)
+        if tile is None:
+            tile = self._tile_source.decode_tile(column, row)
+            if use_cache:
+                TILE_CACHE.put(key, tile)
+        return tile
+
+    def _draw_tiles(self, painter: QPainter, rect: QRect, use_cache: bool = True):
+        tile_size = self._tile_source.get_tile_size()
+        rect = rect.intersected(QRect(QPoint(0, 0), self._image_size))
+        if rect.isEmpty():
+            return
+
+        for row in range(rect.top() // tile_size, rect.bottom() // tile_size + 1):
+            for column in range(
+                rect.left() // tile_size, rect.right() // tile_size + 1
+            ):
+                painter.drawImage(
+                    QPointF(column * tile_size, row * tile_size),
+                    self._get_tile(column, row, use_cache),
+                )
+
+    def get_thumbnail(self):
+        if self.is_image_loaded():
+            return super().get_thumbnail()
+
+        if self._thumbnail is None:
+            thumbnail_size = self._image_size.scaled(
+                THUMBNAIL_SIZE, Qt.AspectRatioMode.KeepAspectRatio
+            )
+            thumbnail = QImage(
+                thumbnail_size, QImage.Format.Format_ARGB32_Premultiplied
+            )
+            thumbnail.fill(Qt.GlobalColor.transparent)
+
+            painter = QPainter(thumbnail)
+            painter.setRenderHint(QPainter.RenderHint.SmoothPixmapTransform, True)
+            painter.scale(
+                thumbnail_size.width() / self._image_size.width(),
+                thumbnail_size.height() / self._image_size.height(),
+            )
+            # NOTE: bypass the cache, the whole layer would evict the tiles that are on screen
+            self._draw_tiles(
+                painter, QRect(QPoint(0, 0), self._image_size), use_cache=False
+            )
+            painter.end()
+            self._thumbnail = thumbnail
+
+        return self._thumbnail
+
+    def paint(
+        self,
+        painter: QPainter,
+        option: QStyleOptionGraphicsItem,
+        widget: Optional[QWidget] = ...,
+    ) -> None:
+        if self.is_image_loaded():
+            return super().paint(painter, option, widget)
+
+        if self._paint_thumbnail(painter, option):
+            return
+
+        exposed_rect = option.exposedRect.toAlignedRect()
+        self._draw_tiles(painter, exposed_rect)
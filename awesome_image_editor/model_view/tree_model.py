@@ -1,4 +1,5 @@
 from PyQt6.QtCore import QAbstractItemModel, QModelIndex, Qt
+from PyQt6.QtWidgets import QGraphicsItem
 
 from .graphics_scene import AIEGraphicsScene
 from .roles import ItemSelectionRole
@@ -15,6 +16,9 @@ class RootItem:
     def __init__(self, scene: AIEGraphicsScene):
         self.name = ""
         self._scene = scene
+        # NOTE: listing top level items sorts all items of the scene, the list is kept until they change,
+        # which the scene only allows by appending top level items or inside inserting_items (reset at the end)
+        self._child_items = None
 
     def parentItem(self):
         return RootItemParent
@@ -32,11 +36,20 @@ class RootItem:
         ...
 
     def childItems(self):
-        return [
-            item
-            for item in self._scene.items(order=Qt.SortOrder.DescendingOrder)
-            if item.parentItem() is None
-        ]
+        if self._child_items is None:
+            self._child_items = [
+                item
+                for item in self._scene.items(order=Qt.SortOrder.DescendingOrder)
+                if item.parentItem() is None
+            ]
+        return self._child_items
+
+    def insert_child_item(self, row: int, item):
+        if self._child_items is not None:
+            self._child_items.insert(row, item)
+
+    def invalidate_child_items(self):
+        self._child_items = None
 
     def isVisible(self) -> bool:
         ...
@@ -51,10 +64,22 @@ class TreeModel(QAbstractItemModel):
         self._scene = scene
         self._root_item = RootItem(scene)
 
-        scene.itemAboutToBeAppended.connect(
-            lambda i: self.beginInsertRows(QModelIndex(), i, i)
-        )
-        scene.itemAppended.connect(lambda: self.endInsertRows())
+        # Row of the item being appended
+        self._appended_row = 0
+        scene.itemAboutToBeAppended.connect(self._on_item_about_to_be_appended)
+        scene.itemAppended.connect(self._on_item_appended)
+        scene.itemsAboutToBeReset.connect(self.beginResetModel)
+        scene.itemsReset.connect(self.endResetModel)
+        # NOTE: connected before any view, so that views never see outdated top level items after a reset
+        self.modelReset.connect(self._root_item.invalidate_child_items)
+
+    def _on_item_about_to_be_appended(self, row: int):
+        self._appended_row = row
+        self.beginInsertRows(QModelIndex(), row, row)
+
+    def _on_item_appended(self, item: QGraphicsItem):
+        self._root_item.insert_child_item(self._appended_row, item)
+        self.endInsertRows()
 
     def scene(self):
         return self._scene
@@ -0,0 +1,98 @@
+import struct
+import zlib
+from io import BufferedWriter
+
+import numpy as np
+from PyQt6.QtGui import QImage
+
+__all__ = ("DEFAULT_PNG_COMPRESSION_LEVEL", "PNGStreamWriter")
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+# Width, height, bit depth, color type, compression, filter and interlace methods
+PNG_HEADER = struct.Struct(">IIBBBBB")
+PNG_CHUNK_LENGTH = struct.Struct(">I")
+PNG_CHUNK_CRC = struct.Struct(">I")
+PNG_COLOR_TYPE_RGBA = 6
+# Each byte is stored minus the same byte of the pixel on its left, which compresses much better than raw pixels
+PNG_FILTER_SUB = 1
+
+# zlib level of the image data, same as QImage.save
+DEFAULT_PNG_COMPRESSION_LEVEL = 6
+
+# Compressed image data is written once this many bytes are buffered, as one IDAT chunk
+PNG_IDAT_CHUNK_SIZE = 1024 * 1024
+
+
+class PNGStreamWriter:
+    """Writes a 8-bit RGBA PNG file to a stream, rows are compressed and written as soon as they are added
+
+    Only the rows being added are held in memory, so images larger than memory can be written a few rows at a time.
+    """
+
+    def __init__(
+        self,
+        writer: BufferedWriter,
+        width: int,
+        height: int,
+        compression_level: int = DEFAULT_PNG_COMPRESSION_LEVEL,
+    ):
+        if width <= 0 or height <= 0:
+            raise ValueError(f"Cannot write an empty {width}x{height} PNG image")
+
+        self._writer = writer
+        self._width = width
+        self._height = height
+        self._num_rows = 0
+        self._compressor = zlib.compressobj(compression_level)
+        self._idat = bytearray()
+
+        writer.write(PNG_SIGNATURE)
+        self._write_chunk(
+            b"IHDR", PNG_HEADER.pack(width, height, 8, PNG_COLOR_TYPE_RGBA, 0, 0, 0)
+        )
+
+    def _write_chunk(self, chunk_type: bytes, data: bytes):
+        self._writer.write(PNG_CHUNK_LENGTH.pack(len(data)))
+        self._writer.write(chunk_type)
+        self._writer.write(data)
+        self._writer.write(PNG_CHUNK_CRC.pack(zlib.crc32(data, zlib.crc32(chunk_type))))
+
+    def _write_idat(self, data: bytes, flush: bool = False):
+        self._idat += data
+        if len(self._idat) >= PNG_IDAT_CHUNK_SIZE or (flush and self._idat):
+            self._write_chunk(b"IDAT", self._idat)
+            self._idat = bytearray()
+
+    def write_rows(self, image: QImage):
+        """Append the rows of an image as wide as the PNG image"""
+        if image.width() != self._width:
+            raise ValueError(
+                f"Rows are {image.width()} pixels wide instead of {self._width}"
+            )
+        if self._num_rows + image.height() > self._height:
+            raise ValueError(f"More than {self._height} rows written")
+
+        # NOTE: PNG pixels are not premultiplied, and stored as R, G, B, A bytes
+        image = image.convertedTo(QImage.Format.Format_RGBA8888)
+        height = image.height()
+        bits = image.constBits()
+        bits.setsize(image.sizeInBytes())
+        pixels = np.frombuffer(bits, np.uint8).reshape(height, image.bytesPerLine())
+        pixels = pixels[:, : self._width * 4]
+
+        rows = np.empty((height, 1 + self._width * 4), np.uint8)
+        rows[:, 0] = PNG_FILTER_SUB
+        rows[:, 1:5] = pixels[:, :4]
+        np.subtract(pixels[:, 4:], pixels[:, :-4], out=rows[:, 5:])
+
+        self._write_idat(self._compressor.compress(rows))
+        self._num_rows += height
+
+    def close(self):
+        """Finish the PNG image, once all its rows are written"""
+        if self._num_rows != self._height:
+            raise ValueError(f"{self._num_rows} rows written out of {self._height}")
+
+        self._write_idat(self._compressor.flush(), flush=True)
+        self._write_chunk(b"IEND", b"")
@@ -0,0 +1,161 @@
+import mmap
+import traceback
+from typing import List, NamedTuple, Optional
+
+from PyQt6.QtCore import QThread, pyqtSignal
+from PyQt6.QtGui import QImage
+
+from .binary_io.read import BinaryReader
+from .file_format import (
+    AIEProject,
+    ChunkSources,
+    create_image_item,
+    LayerIndexEntry,
+    read_layer_index,
+    read_project_header,
+    read_version_0_layers,
+)
+from .model_view.items.image import AIEImageItem
+
+__all__ = ("AIEBaseLoader", "AIEProjectLoader")
+
+
+class LoadedLayer(NamedTuple):
+    name: str
+    x: float
+    y: float
+    # Only decoded upfront for version 0 files, indexed layers load their pixels when first needed
+    image: Optional[QImage]
+    # Only available for indexed (version >= 1) files
+    entry: Optional[LayerIndexEntry]
+
+
+class AIEBaseLoader(QThread):
+    """Loads a file into a new project in the background, layers are added to the project as soon as they are ready
+
+    Subclasses read the file in _load, from the loader thread, and pass what they read through their own signals.
+    NOTE: the loader object lives in the main thread, so signals connected to its methods are delivered (queued)
+    to the main thread, where graphics items can be safely created and added to the scene
+    """
+
+    # Number of loaded layers, total number of layers
+    progressChanged = pyqtSignal(int, int)
+    loadFailed = pyqtSignal(str)
+
+    def __init__(self, filepath: str):
+        super().__init__()
+        self._filepath = filepath
+        self._project = AIEProject()
+        self._is_cancelled = False
+        self.finished.connect(self._on_finished)
+
+    def get_project(self):
+        """The project being loaded, layers are added to it progressively"""
+        return self._project
+
+    def cancel(self):
+        self._is_cancelled = True
+
+    def is_cancelled(self):
+        return self._is_cancelled
+
+    def run(self):
+        try:
+            self._load()
+        except Exception:
+            self.loadFailed.emit(traceback.format_exc())
+
+    def _load(self):
+        """Read the file, called from the loader thread"""
+        raise NotImplementedError
+
+    def _on_finished(self):
+        """Called from the main thread once loading ended, whether it completed, failed or was cancelled"""
+
+
+class AIEProjectLoader(AIEBaseLoader):
+    """Loads a project file in the background, adding layers to the project as soon as they are read
+
+    Like AIEProject.load, layers of indexed files are lazy, their pixels are only decoded when first needed.
+    """
+
+    _layerLoaded = pyqtSignal(object)
+    _fileMapped = pyqtSignal(object, int)
+
+    def __init__(self, filepath: str):
+        super().__init__(filepath)
+        self._file_mapping: Optional[mmap.mmap] = None
+        self._num_layers = 0
+        self._items: List[AIEImageItem] = []
+        self._entries: List[LayerIndexEntry] = []
+        self._chunk_sources: ChunkSources = {}
+
+        self._layerLoaded.connect(self._add_layer)
+        self._fileMapped.connect(self._on_file_mapped)
+
+    def _load(self):
+        # NOTE: the mapping stays valid after the file is closed
+        with open(self._filepath, "rb") as file:
+            mapping = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        reader = BinaryReader(mapping)
+        version = read_project_header(reader)
+        if version == 0:
+            self._load_version_0_layers(reader)
+        else:
+            self._load_indexed_layers(mapping, version)
+
+    def _load_version_0_layers(self, reader: BinaryReader):
+        # NOTE: version 0 files have no index, so the number of layers is not known upfront
+        for layer_name, x, y, image in read_version_0_layers(reader):
+            if self._is_cancelled:
+                return
+            self._layerLoaded.emit(LoadedLayer(layer_name, x, y, image, None))
+
+    def _load_indexed_layers(self, mapping: mmap.mmap, version: int):
+        entries = read_layer_index(mapping, version)
+        self._fileMapped.emit(mapping, len(entries))
+
+        for entry in entries:
+            if self._is_cancelled:
+                return
+            self._layerLoaded.emit(
+                LoadedLayer(entry.name, entry.x, entry.y, None, entry)
+            )
+
+    def _on_file_mapped(self, mapping: mmap.mmap, num_layers: int):
+        self._file_mapping = mapping
+        self._num_layers = num_layers
+        self.progressChanged.emit(0, num_layers)
+
+    def _add_layer(self, layer: LoadedLayer):
+        if self._is_cancelled:
+            return
+
+        if layer.entry is None:
+            item = AIEImageItem(layer.image, layer.name)
+            item.setPos(layer.x, layer.y)
+        else:
+            item = create_image_item(
+                self._file_mapping, layer.entry, layer.image, self._chunk_sources
+            )
+        self._project.get_graphics_scene().addItem(item)
+
+        self._items.append(item)
+        self._entries.append(layer.entry)
+        self.progressChanged.emit(len(self._items), self._num_layers)
+
+    def _on_finished(self):
+        # NOTE: the loader does not keep the file mapped, only the project and its layers do
+        mapping, items, entries = self._file_mapping, self._items, self._entries
+        self._file_mapping = None
+        self._items = []
+        self._entries = []
+        self._chunk_sources = {}
+
+        # NOTE: a partially loaded project is not associated with its file,
+        # otherwise saving it would drop the layers that were not loaded
+        if self._is_cancelled or mapping is None or len(items) != self._num_layers:
+            return
+
+        self._project.set_saved_file(self._filepath, mapping, items, entries)
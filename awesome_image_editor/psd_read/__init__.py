@@ -1,46 +1,200 @@
+from contextlib import closing
+from typing import Generator, Iterator, List, Optional
+
+from PyQt6.QtGui import QImage
+from PyQt6.QtWidgets import QGraphicsItem
 from psd_tools import PSDImage
+from psd_tools.api.layers import PixelLayer
 
 from ..file_format import AIEProject
 from ..model_view.items.group import AIEGroupItem
-from .pixel import psd_pixel_layer_to_image_item
+from ..model_view.items.image import AIEImageItem
+from .cache import get_psd_layer_cache
+from .pixel import (
+    decode_psd_pixel_layers,
+    iter_psd_pixel_layers,
+    psd_pixel_layer_to_image_item,
+)
+from .profile import (
+    PSDImportProfiler,
+    profile_import,
+    profile_layer,
+    profile_stage,
+)
 from .shape import psd_shape_layer_to_shape_item
-from .text import psd_type_layer_to_text_item
+from .stream import DEFAULT_STREAM_MEMORY_BUDGET, MappedPSD
+from .text import TextFormatCache, psd_type_layer_to_text_item
 
 __all__ = ["load_psd_as_project"]
 
 
-def read_psd_layer(scene, layer, psd_width: int, psd_height: int):
+def read_psd_layer(
+    scene,
+    layer,
+    psd_width: int,
+    psd_height: int,
+    layer_images: Optional[Iterator[Optional[QImage]]] = None,
+    lazy: bool = False,
+    text_formats: Optional[TextFormatCache] = None,
+    profiler: Optional[PSDImportProfiler] = None,
+    mapped_psd: Optional[MappedPSD] = None,
+    parent_item: Optional[QGraphicsItem] = None,
+):
+    """Create the item of a layer (and of its children), and add it to the scene or to parent_item
+
+    NOTE: children are parented before their group is added to the scene, which adds them along with it,
+    the scene (and the layers model) only ever sees top level items being added
+    """
+    # NOTE: layer_images yields the decoded image of each pixel layer, in iter_psd_pixel_layers order,
+    # unless the layer is streamed from mapped_psd
     item = None
 
-    if layer.kind == "pixel":
-        item = psd_pixel_layer_to_image_item(layer)
+    with profile_layer(profiler, layer, "convert"):
+        if layer.kind == "pixel" and mapped_psd is not None:
+            item = mapped_psd.create_pixel_item(layer)
 
-    elif layer.kind == "shape":
-        item = psd_shape_layer_to_shape_item(layer, psd_width, psd_height)
+        elif layer.kind == "pixel":
+            image = next(layer_images) if layer_images is not None else None
+            item = psd_pixel_layer_to_image_item(layer, image, lazy)
 
-    elif layer.kind == "type":
-        item = psd_type_layer_to_text_item(layer)
+        elif layer.kind == "shape":
+            item = psd_shape_layer_to_shape_item(layer, psd_width, psd_height)
 
-    elif layer.kind == "group":
-        item = AIEGroupItem(layer.name)
+        elif layer.kind == "type":
+            item = psd_type_layer_to_text_item(layer, text_formats)
 
+        elif layer.kind == "group":
+            item = AIEGroupItem(layer.name)
+
+    if layer.kind == "group":
         for child_layer in layer:
-            child_item = read_psd_layer(scene, child_layer, psd_width, psd_height)
-            if child_item:
-                child_item.setParentItem(item)
+            read_psd_layer(
+                scene,
+                child_layer,
+                psd_width,
+                psd_height,
+                layer_images,
+                lazy,
+                text_formats,
+                profiler,
+                mapped_psd,
+                item,
+            )
 
     if item is not None:
-        scene.addItem(item)
+        if (
+            profiler is not None
+            and isinstance(item, AIEImageItem)
+            and item.is_image_loaded()
+        ):
+            profiler.record_image_bytes(layer, item.image.sizeInBytes())
+
+        with profile_layer(profiler, layer, "insert"):
+            if parent_item is None:
+                scene.addItem(item)
+            else:
+                item.setParentItem(parent_item)
         return item
 
 
-def load_psd_as_project(filepath):
-    psd = PSDImage.open(filepath)
+def open_psd_layer_images(
+    filepath,
+    pixel_layers: List[PixelLayer],
+    max_workers: Optional[int] = None,
+    use_layer_cache: bool = False,
+    lazy: bool = False,
+) -> Generator[Optional[QImage], None, None]:
+    """Yield the image of each pixel layer in order, from the layer cache or decoded (None for lazy layers)
+
+    NOTE: the generator must be exhausted for the decoded images to be added to the layer cache,
+    and closed to stop the worker processes early.
+    """
+    layer_cache = get_psd_layer_cache() if use_layer_cache else None
+    layer_cache_key = None
+    if layer_cache is not None:
+        layer_cache_key = layer_cache.get_key(filepath)
+        cached_images = layer_cache.load(layer_cache_key, len(pixel_layers))
+        if cached_images is not None:
+            yield from cached_images
+            return
+
+    if lazy:
+        # NOTE: lazily decoded layers are never all decoded at once, so they are not added to the layer cache
+        yield from (None for _ in pixel_layers)
+        return
+
+    # Pixels are decoded concurrently, while items are created in layer order as soon as their pixels are ready
+    layer_images = decode_psd_pixel_layers(pixel_layers, max_workers)
+    if layer_cache is not None:
+        layer_images = layer_cache.store(layer_cache_key, layer_images)
+    with closing(layer_images):
+        yield from layer_images
+
+
+def load_psd_as_project(
+    filepath,
+    max_workers: Optional[int] = None,
+    use_layer_cache: bool = False,
+    lazy: bool = False,
+    profiler: Optional[PSDImportProfiler] = None,
+    stream: bool = False,
+    memory_budget: int = DEFAULT_STREAM_MEMORY_BUDGET,
+):
+    """Load a PSD file, pixel layers are decoded by up to max_workers processes (number of CPUs by default)
+
+    With use_layer_cache, decoded pixel layers are kept in the PSD layer cache (see get_psd_layer_cache),
+    so opening the same file again maps them from the cache instead of decoding them. The cache writes
+    the decoded pixels of every imported file to disk, so it is opt-in.
+
+    With lazy, pixel layers that are not cached are only decoded when first painted (or otherwise accessed),
+    so hidden layers and layers out of view cost nothing until they are shown.
+
+    With stream, for files too large to hold in memory, the file is mapped and only its layer records are read.
+    Pixel layers are decoded whenever painted, and only kept in memory within memory_budget bytes (see MappedPSD).
+
+    With a profiler, the time and memory spent on each layer are recorded (see PSDImportProfiler).
+    """
+    with profile_import(profiler):
+        mapped_psd = None
+        with profile_stage(profiler, "open"):
+            if stream:
+                mapped_psd = MappedPSD(filepath, memory_budget)
+                psd = mapped_psd.psd
+            else:
+                psd = PSDImage.open(filepath)
 
-    project = AIEProject()
-    scene = project.get_graphics_scene()
+        project = AIEProject()
+        scene = project.get_graphics_scene()
 
-    for layer in psd:
-        read_psd_layer(scene, layer, psd.width, psd.height)
+        if mapped_psd is None:
+            layer_images = open_psd_layer_images(
+                filepath,
+                list(iter_psd_pixel_layers(psd)),
+                max_workers,
+                use_layer_cache,
+                lazy,
+            )
+        else:
+            # NOTE: streamed pixel layers are not decoded up front, nor added to the layer cache
+            layer_images = (image for image in ())
+        text_formats = TextFormatCache()
+        # NOTE: closing stops the worker processes right away if reading a layer fails
+        with closing(layer_images), profile_stage(profiler, "read-layers"):
+            with scene.inserting_items():
+                for layer in psd:
+                    read_psd_layer(
+                        scene,
+                        layer,
+                        psd.width,
+                        psd.height,
+                        layer_images,
+                        lazy,
+                        text_formats,
+                        profiler,
+                        mapped_psd,
+                    )
+            # NOTE: every image is read by now, finishing the iteration lets the layer cache add its entry
+            for _ in layer_images:
+                pass
 
     return project
@@ -0,0 +1,199 @@
+import hashlib
+import mmap
+import os
+import struct
+import tempfile
+from contextlib import suppress
+from pathlib import Path
+from typing import Iterable, Iterator, List, Optional
+
+from PyQt6.QtCore import QStandardPaths
+from PyQt6.QtGui import QImage
+
+from ..binary_io.read import BinaryReader
+from ..file_format import (
+    FORMAT_VERSION,
+    RAW_IMAGE_CHUNK_TYPE,
+    ChunkImageLoader,
+    ImageEncoding,
+    LayerIndexEntry,
+    encode_image_payload,
+    read_layer_index,
+    read_project_header,
+    write_chunk,
+    write_layer_index,
+    write_project_header,
+)
+
+__all__ = ("PSDLayerCache", "get_psd_layer_cache", "set_psd_layer_cache")
+
+DEFAULT_CACHE_MAX_SIZE = 8 * 1024 * 1024 * 1024
+
+# The content of PSD files is identified by hashing this many evenly spaced blocks of them,
+# hashing whole multi-gigabyte files would take about as long as decoding them
+CONTENT_HASH_NUM_SAMPLES = 16
+CONTENT_HASH_SAMPLE_SIZE = 64 * 1024
+
+# Identity of the PSD file a cache entry was created from: size, modification time
+FILE_IDENTITY = struct.Struct("<2Q")
+
+_psd_layer_cache: Optional["PSDLayerCache"] = None
+_is_psd_layer_cache_set = False
+
+
+class PSDLayerCache:
+    """Decoded pixel layers of recently opened PSD files, stored on disk as raw pixels that are used memory-mapped
+
+    Each entry is a project file (see file_format) with a raw image chunk for each pixel layer, in
+    iter_psd_pixel_layers order. Least recently used entries are evicted once the cache exceeds max_size bytes.
+    """
+
+    def __init__(self, directory: str, max_size: int = DEFAULT_CACHE_MAX_SIZE):
+        self._directory = Path(directory)
+        self._max_size = max_size
+
+    def get_directory(self):
+        return self._directory
+
+    def get_max_size(self):
+        return self._max_size
+
+    def get_key(self, filepath: str):
+        """Identify a PSD file by its path, size, modification time and a hash of samples of its content"""
+        stat = os.stat(filepath)
+        key = hashlib.blake2b(digest_size=16)
+        key.update(os.path.abspath(filepath).encode("utf-8"))
+        key.update(FILE_IDENTITY.pack(stat.st_size, stat.st_mtime_ns))
+
+        with open(filepath, "rb") as file:
+            step = max(stat.st_size // CONTENT_HASH_NUM_SAMPLES, 1)
+            for offset in range(0, stat.st_size, step):
+                file.seek(offset)
+                key.update(file.read(CONTENT_HASH_SAMPLE_SIZE))
+
+        return key.hexdigest()
+
+    def _get_entry_path(self, key: str):
+        return self._directory / f"{key}.aie"
+
+    def load(self, key: str, num_layers: int) -> Optional[List[Optional[QImage]]]:
+        """Return the cached images of the pixel layers of a PSD file, or None if they are not cached"""
+        entry_path = self._get_entry_path(key)
+        try:
+            with open(entry_path, "rb") as file:
+                mapping = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+            if read_project_header(BinaryReader(mapping)) != FORMAT_VERSION:
+                return None
+            entries = read_layer_index(mapping)
+            # Mark the entry as recently used
+            os.utime(entry_path)
+        except (OSError, ValueError, AssertionError, struct.error):
+            # Missing, from another format version, or truncated
+            return None
+
+        if len(entries) != num_layers:
+            return None
+
+        # NOTE: raw images are not copied, they read their pixels straight from the mapped file
+        return [
+            ChunkImageLoader(mapping, entry)() if entry.width > 0 else None
+            for entry in entries
+        ]
+
+    def store(
+        self, key: str, images: Iterable[Optional[QImage]]
+    ) -> Iterator[Optional[QImage]]:
+        """Yield images unchanged while writing them to the cache, the entry is added once all of them are written"""
+        try:
+            self._directory.mkdir(parents=True, exist_ok=True)
+            fd, temp_path = tempfile.mkstemp(suffix=".tmp", dir=self._directory)
+            file = os.fdopen(fd, "wb")
+            write_project_header(file)
+        except OSError:
+            # NOTE: caching is best effort, failing to write the cache never fails the import
+            yield from images
+            return
+
+        entries: List[LayerIndexEntry] = []
+        try:
+            for image in images:
+                if file is not None:
+                    try:
+                        entries.append(self._write_image(image, file))
+                    except OSError:
+                        file.close()
+                        file = None
+                yield image
+
+            if file is not None:
+                with suppress(OSError):
+                    write_layer_index(entries, file)
+                    file.close()
+                    os.replace(temp_path, self._get_entry_path(key))
+                    self.evict()
+        finally:
+            if file is not None:
+                file.close()
+            # NOTE: nothing to remove once the entry is added, or if writing it failed
+            with suppress(OSError):
+                os.remove(temp_path)
+
+    @staticmethod
+    def _write_image(image: Optional[QImage], file):
+        # Layers without pixels have an empty entry
+        if image is None or image.isNull():
+            return LayerIndexEntry(RAW_IMAGE_CHUNK_TYPE, "", 0, 0, 0, 0, 0, 0)
+
+        chunk_type, payload = encode_image_payload(image, ImageEncoding.RAW)
+        offset, length = write_chunk(chunk_type, payload, file)
+        return LayerIndexEntry(
+            chunk_type, "", 0, 0, image.width(), image.height(), offset, length
+        )
+
+    def evict(self):
+        """Remove the least recently used entries until the cache fits in its maximum size"""
+        entry_stats = []
+        for entry_path in self._directory.glob("*.aie"):
+            with suppress(OSError):
+                entry_stats.append((entry_path, entry_path.stat()))
+
+        size = sum(stat.st_size for _, stat in entry_stats)
+        entry_stats.sort(key=lambda entry_stat: entry_stat[1].st_mtime_ns)
+        for entry_path, stat in entry_stats:
+            if size <= self._max_size:
+                break
+            try:
+                # NOTE: entries still mapped by open projects stay readable on POSIX, removing them fails on Windows
+                entry_path.unlink()
+                size -= stat.st_size
+            except OSError:
+                pass
+
+    def clear(self):
+        for entry_path in self._directory.glob("*.aie"):
+            with suppress(OSError):
+                entry_path.unlink()
+
+
+def get_psd_layer_cache() -> Optional[PSDLayerCache]:
+    """Return the cache used when importing PSD files, by default in the user cache directory"""
+    if not _is_psd_layer_cache_set:
+        set_psd_layer_cache(
+            PSDLayerCache(
+                os.path.join(
+                    QStandardPaths.writableLocation(
+                        QStandardPaths.StandardLocation.GenericCacheLocation
+                    ),
+                    "awesome_image_editor",
+                    "psd_layers",
+                )
+            )
+        )
+    return _psd_layer_cache
+
+
+def set_psd_layer_cache(cache: Optional[PSDLayerCache]):
+    """Set the cache used when importing PSD files, None disables caching"""
+    global _psd_layer_cache, _is_psd_layer_cache_set
+    _psd_layer_cache = cache
+    _is_psd_layer_cache_set = True
@@ -0,0 +1,134 @@
+from collections import deque
+from contextlib import closing
+from typing import Deque, List, Optional, Tuple
+
+from PyQt6.QtCore import pyqtSignal
+from PyQt6.QtGui import QImage
+from psd_tools import PSDImage
+from psd_tools.api.layers import Layer
+
+from ..project_loader import AIEBaseLoader
+from . import open_psd_layer_images, read_psd_layer
+from .pixel import decode_psd_composite, iter_psd_pixel_layers
+from .text import TextFormatCache
+
+__all__ = ("AIEPSDLoader",)
+
+
+class AIEPSDLoader(AIEBaseLoader):
+    """Imports a PSD file in the background
+
+    The composite image embedded in the file is shown as the backdrop of the project view first,
+    then layers are added as soon as their pixels are decoded, and the backdrop is removed once all of them are.
+    Progress is the number of decoded pixel layers, out of the number of pixel layers.
+
+    With lazy, pixel layers that are not in the layer cache are not decoded by the loader, they are added right away
+    and decode their pixels when first painted (see load_psd_as_project).
+    """
+
+    _compositeLoaded = pyqtSignal(object)
+    _psdOpened = pyqtSignal(object, int)
+    _layerDecoded = pyqtSignal(object)
+
+    def __init__(
+        self,
+        filepath: str,
+        max_workers: Optional[int] = None,
+        use_layer_cache: bool = False,
+        lazy: bool = False,
+    ):
+        super().__init__(filepath)
+        self._max_workers = max_workers
+        self._use_layer_cache = use_layer_cache
+        self._lazy = lazy
+
+        self._psd: Optional[PSDImage] = None
+        self._num_pixel_layers = 0
+        self._num_decoded_layers = 0
+        # Top level layers not read yet, with their number of pixel layers
+        self._pending_layers: Deque[Tuple[Layer, int]] = deque()
+        # Decoded images of the pixel layers of pending layers, in order (None for lazy layers)
+        self._pending_images: Deque[Optional[QImage]] = deque()
+        self._text_formats = TextFormatCache()
+
+        self._compositeLoaded.connect(self._on_composite_loaded)
+        self._psdOpened.connect(self._on_psd_opened)
+        self._layerDecoded.connect(self._on_layer_decoded)
+
+    def _load(self):
+        psd = PSDImage.open(self._filepath)
+        composite = decode_psd_composite(psd)
+        if composite is not None:
+            self._compositeLoaded.emit(composite)
+
+        pixel_layers = list(iter_psd_pixel_layers(psd))
+        self._psdOpened.emit(psd, len(pixel_layers))
+
+        layer_images = open_psd_layer_images(
+            self._filepath,
+            pixel_layers,
+            self._max_workers,
+            self._use_layer_cache,
+            self._lazy,
+        )
+        with closing(layer_images):
+            for image in layer_images:
+                if self._is_cancelled:
+                    return
+                self._layerDecoded.emit(image)
+
+    def _on_composite_loaded(self, image: QImage):
+        if not self._is_cancelled:
+            self._project.get_graphics_view().set_backdrop(image)
+
+    def _on_psd_opened(self, psd: PSDImage, num_pixel_layers: int):
+        self._psd = psd
+        self._num_pixel_layers = num_pixel_layers
+        self._pending_layers.extend(
+            (layer, len(list(iter_psd_pixel_layers([layer])))) for layer in psd
+        )
+        self.progressChanged.emit(0, num_pixel_layers)
+        # Leading layers without pixels
+        self._read_pending_layers()
+
+    def _on_layer_decoded(self, image: Optional[QImage]):
+        if self._is_cancelled:
+            return
+
+        self._pending_images.append(image)
+        self._num_decoded_layers += 1
+        self._read_pending_layers()
+        self.progressChanged.emit(self._num_decoded_layers, self._num_pixel_layers)
+
+    def _read_pending_layers(self):
+        # NOTE: top level layers are read as a whole, once the pixels of all their pixel layers are decoded,
+        # so that items are added to the scene in the same order as load_psd_as_project
+        scene = self._project.get_graphics_scene()
+        if len(self._pending_layers) == 0 or self._pending_layers[0][1] > len(
+            self._pending_images
+        ):
+            return
+
+        with scene.inserting_items():
+            while len(self._pending_layers) > 0:
+                layer, num_pixel_layers = self._pending_layers[0]
+                if num_pixel_layers > len(self._pending_images):
+                    break
+
+                self._pending_layers.popleft()
+                layer_images: List[Optional[QImage]] = [
+                    self._pending_images.popleft() for i in range(num_pixel_layers)
+                ]
+                read_psd_layer(
+                    scene,
+                    layer,
+                    self._psd.width,
+                    self._psd.height,
+                    iter(layer_images),
+                    self._lazy,
+                    self._text_formats,
+                )
+
+    def _on_finished(self):
+        # NOTE: the backdrop is also removed if loading failed or was cancelled, it would hide missing layers
+        self._project.get_graphics_view().set_backdrop(None)
@@ -1,19 +1,373 @@
-from psd_tools.api.layers import PixelLayer
+import multiprocessing
+import os
+import sys
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
+from typing import Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional
+
+import numpy as np
+from PIL import Image
+from PyQt6.QtCore import QSize, Qt
+from PyQt6.QtGui import QImage
+from psd_tools import PSDImage
+from psd_tools.api.layers import Layer, PixelLayer
+from psd_tools.constants import ChannelID, ColorMode
+from psd_tools.psd.layer_and_mask import ChannelData
 
 from ..model_view.items.image import AIEImageItem
+from ..thread_pool import map_ordered
+from .psd_tools_compat import (
+    create_channel_image,
+    get_composite_transparency_index,
+    get_layer_channels,
+    get_layer_file_format,
+    merge_channel_images,
+    read_composite_channels,
+)
 
+# PSD files with less pixels than this in their pixel layers are decoded in-process,
+# as starting worker processes would take longer than decoding
+PARALLEL_DECODE_MIN_PIXELS = 4 * 1024 * 1024
 
-def psd_pixel_layer_to_image_item(layer: PixelLayer):
-    assert layer.kind == "pixel"
+# Index of the red, green, blue and alpha channels in the bytes of Format_ARGB32 pixels
+if sys.byteorder == "little":
+    ARGB32_CHANNEL_OFFSETS = {0: 2, 1: 1, 2: 0, ChannelID.TRANSPARENCY_MASK: 3}
+else:
+    ARGB32_CHANNEL_OFFSETS = {0: 1, 1: 2, 2: 3, ChannelID.TRANSPARENCY_MASK: 0}
+
+# PIL mode -> PIL raw mode and QImage format with the same memory layout, and bytes per pixel
+# NOTE: Pillow premultiplies alpha when packing to "BGRa", which on little-endian machines
+# is the layout of the format used everywhere else for layers
+if sys.byteorder == "little":
+    _RGBA_PACKING = ("BGRa", QImage.Format.Format_ARGB32_Premultiplied, 4)
+else:
+    _RGBA_PACKING = ("RGBA", QImage.Format.Format_RGBA8888, 4)
+PIL_MODE_PACKINGS = {
+    "RGBA": _RGBA_PACKING,
+    "RGB": ("RGBX", QImage.Format.Format_RGBX8888, 4),
+    "L": ("L", QImage.Format.Format_Grayscale8, 1),
+}
+
+# Size of the strips PIL images are copied by
+PIL_COPY_STRIP_SIZE = 4 * 1024 * 1024
+
+# Worker processes of decode_psd_pixel_layers, and their number, see get_decode_process_pool
+_decode_process_pool: Optional[ProcessPoolExecutor] = None
+_decode_process_pool_size = 0
+_decode_process_pool_lock = threading.Lock()
+
+
+class LayerPixels(NamedTuple):
+    """Decoded pixels of a layer, in a single buffer that a QImage can use in place"""
+
+    width: int
+    height: int
+    bytes_per_line: int
+    format: QImage.Format
+    data: bytearray
+
+    @classmethod
+    def from_qimage(cls, image: QImage):
+        # NOTE: copies the pixels, e.g. to send them to another process
+        bits = image.constBits()
+        bits.setsize(image.sizeInBytes())
+        return cls(
+            image.width(),
+            image.height(),
+            image.bytesPerLine(),
+            image.format(),
+            bytearray(bits),
+        )
+
+    def to_qimage(self):
+        # NOTE: no copy, PyQt keeps a reference to the buffer for as long as the image lives
+        return QImage(
+            self.data, self.width, self.height, self.bytes_per_line, self.format
+        )
+
+
+def rgb_channels_to_image(
+    width: int, height: int, read_channel: Callable[[int], Optional[bytes]]
+):
+    """Assemble 8-bit planar channels, read one at a time by ID, into a premultiplied ARGB32 image"""
+    image = QImage(width, height, QImage.Format.Format_ARGB32)
+    bits = image.bits()
+    bits.setsize(image.sizeInBytes())
+    pixels = np.frombuffer(bits, np.uint8).reshape(height, image.bytesPerLine())
+    pixels = pixels[:, : width * 4].reshape(height, width, 4)
+
+    for channel_id, offset in ARGB32_CHANNEL_OFFSETS.items():
+        channel = read_channel(channel_id)
+        if channel is None:
+            assert channel_id == ChannelID.TRANSPARENCY_MASK
+            pixels[:, :, offset] = 255
+        else:
+            pixels[:, :, offset] = np.frombuffer(channel, np.uint8).reshape(
+                height, width
+            )
+
+    # NOTE: converted in place, the image owns its pixels and they are not shared yet
+    del pixels, bits
+    image.convertTo(QImage.Format.Format_ARGB32_Premultiplied)
+    return image
+
+
+class PSDLayerChannels(NamedTuple):
+    """Compressed channels of a pixel layer, with what is needed to decode them without the rest of the PSD file
+
+    NOTE: sent to worker processes instead of psd_tools layers, which reference the whole file
+    """
+
+    width: int
+    height: int
+    depth: int
+    version: int
+    color_mode: ColorMode
+    # Channel ID -> compression and raw bytes of the color and transparency channels, in the order of the file
+    channels: Dict[int, ChannelData]
+
+    @classmethod
+    def from_layer(cls, layer: PixelLayer):
+        # NOTE: read from psd_tools internals, as topil would hold several copies of the layer
+        return cls(
+            layer.width,
+            layer.height,
+            *get_layer_file_format(layer),
+            {
+                channel_id: data
+                for channel_id, data in get_layer_channels(layer)
+                # Layer masks have their own size, and are not part of the layer image
+                if channel_id >= ChannelID.TRANSPARENCY_MASK
+            },
+        )
+
+    def has_channel(self, channel_id: int):
+        channel = self.channels.get(channel_id)
+        return channel is not None and len(channel.data) > 0
+
+    def read_channel(self, channel_id: int) -> Optional[bytes]:
+        if not self.has_channel(channel_id):
+            return None
+        channel = self.channels[channel_id]
+        return channel.get_data(self.width, self.height, self.depth, self.version)
+
+
+def channels_to_pil_image(channels: PSDLayerChannels) -> Optional[Image.Image]:
+    """Merge channels into a PIL image, as psd_tools topil does for layers"""
+    size = (channels.width, channels.height)
+    channel_images = []
+    for channel_id in channels.channels:
+        if channel_id < 0:
+            continue
+        data = channels.read_channel(channel_id)
+        if data is None:
+            return None
+        channel_images.append(create_channel_image(size, data, channels.depth))
+
+    alpha = channels.read_channel(ChannelID.TRANSPARENCY_MASK)
+    if alpha is not None:
+        alpha = create_channel_image(size, alpha, channels.depth)
+    return merge_channel_images(channel_images, alpha, channels.color_mode)
+
+
+def pil_image_to_pixels(pil_image: Image.Image):
+    """Copy the pixels of a PIL image once, into a buffer laid out as a QImage format"""
+    if pil_image.mode not in PIL_MODE_PACKINGS:
+        pil_image = pil_image.convert("RGBA")
+    raw_mode, image_format, pixel_size = PIL_MODE_PACKINGS[pil_image.mode]
+
+    width, height = pil_image.size
+    bytes_per_line = width * pixel_size
+    data = bytearray(bytes_per_line * height)
+
+    # NOTE: copy in strips, tobytes of the whole image would briefly hold two more copies of it
+    rows_per_strip = max(1, PIL_COPY_STRIP_SIZE // max(1, bytes_per_line))
+    for top in range(0, height, rows_per_strip):
+        bottom = min(top + rows_per_strip, height)
+        strip = pil_image.crop((0, top, width, bottom))
+        data[top * bytes_per_line : bottom * bytes_per_line] = strip.tobytes(
+            "raw", raw_mode
+        )
+
+    return LayerPixels(width, height, bytes_per_line, image_format, data)
+
+
+def decode_psd_layer_channels(channels: PSDLayerChannels) -> Optional[QImage]:
+    if channels.width == 0 or channels.height == 0:
+        return None
+
+    # 8-bit RGB layers are assembled straight from their channels, without intermediate PIL images
+    if channels.color_mode == ColorMode.RGB and channels.depth == 8:
+        if not all(channels.has_channel(i) for i in range(3)):
+            return None
+        return rgb_channels_to_image(
+            channels.width, channels.height, channels.read_channel
+        )
 
-    pil_image = layer.topil()
+    # Other color modes and depths go through PIL
+    pil_image = channels_to_pil_image(channels)
     if pil_image is None:
+        return None
+    return pil_image_to_pixels(pil_image).to_qimage()
+
+
+def decode_psd_pixel_layer(layer: PixelLayer) -> Optional[QImage]:
+    return decode_psd_layer_channels(PSDLayerChannels.from_layer(layer))
+
+
+def decode_psd_composite(psd: PSDImage) -> Optional[QImage]:
+    """Decode the flattened image embedded in a PSD file, without compositing its layers"""
+    # NOTE: files saved without "Maximize Compatibility" have no usable composite
+    if not psd.has_preview():
+        return None
+
+    if psd.color_mode != ColorMode.RGB or psd.depth != 8:
+        pil_image = psd.topil()
+        return None if pil_image is None else pil_image_to_pixels(pil_image).to_qimage()
+
+    channels = read_composite_channels(psd)
+    image = QImage(psd.width, psd.height, QImage.Format.Format_ARGB32_Premultiplied)
+    bits = image.bits()
+    bits.setsize(image.sizeInBytes())
+    pixels = np.frombuffer(bits, np.uint8).reshape(psd.height, image.bytesPerLine())
+    pixels = pixels[:, : psd.width * 4].reshape(psd.height, psd.width, 4)
+
+    alpha = None
+    transparency_index = get_composite_transparency_index(psd)
+    if transparency_index is not None:
+        alpha = np.frombuffer(channels[transparency_index], np.uint8)
+        alpha = alpha.reshape(psd.height, psd.width)
+    for channel_id, offset in ARGB32_CHANNEL_OFFSETS.items():
+        if channel_id == ChannelID.TRANSPARENCY_MASK:
+            pixels[:, :, offset] = 255 if alpha is None else alpha
+            continue
+
+        channel = np.frombuffer(channels[channel_id], np.uint8)
+        channel = channel.reshape(psd.height, psd.width)
+        if alpha is not None:
+            # Transparent composites are matted with white, removing it leaves premultiplied colors
+            channel = np.maximum(channel.astype(np.int16) + alpha - 255, 0)
+        pixels[:, :, offset] = channel
+
+    return image
+
+
+def iter_psd_pixel_layers(layers: Iterable[Layer]) -> Iterator[PixelLayer]:
+    """Yield pixel layers in the order they are read by read_psd_layer"""
+    for layer in layers:
+        if layer.kind == "pixel":
+            yield layer
+        elif layer.kind == "group":
+            yield from iter_psd_pixel_layers(layer)
+
+
+def decode_psd_layer_pixels(channels: PSDLayerChannels):
+    """Decode a pixel layer in a worker process, which only receives the channels of the layer"""
+    image = decode_psd_layer_channels(channels)
+    return None if image is None else LayerPixels.from_qimage(image)
+
+
+def get_decode_process_pool(max_workers: int) -> ProcessPoolExecutor:
+    """Return the worker processes that pixel layers are decoded in
+
+    They are started by the first import that needs them and reused by later ones, unless those need
+    a different number of workers.
+    """
+    global _decode_process_pool, _decode_process_pool_size
+    with _decode_process_pool_lock:
+        if _decode_process_pool is None or _decode_process_pool_size != max_workers:
+            if _decode_process_pool is not None:
+                _decode_process_pool.shutdown(wait=False, cancel_futures=True)
+            # NOTE: spawn worker processes instead of forking, Qt does not support being used across a fork
+            _decode_process_pool = ProcessPoolExecutor(
+                max_workers, mp_context=multiprocessing.get_context("spawn")
+            )
+            _decode_process_pool_size = max_workers
+        return _decode_process_pool
+
+
+def _discard_decode_process_pool(executor: ProcessPoolExecutor):
+    global _decode_process_pool
+    with _decode_process_pool_lock:
+        if _decode_process_pool is executor:
+            _decode_process_pool = None
+    executor.shutdown(wait=False, cancel_futures=True)
+
+
+def decode_psd_pixel_layers(
+    layers: List[PixelLayer], max_workers: Optional[int] = None
+) -> Iterator[Optional[QImage]]:
+    """Yield the image of each pixel layer in order, large files are decoded in parallel worker processes"""
+    if max_workers is None:
+        max_workers = os.cpu_count() or 1
+    max_workers = min(max_workers, len(layers))
+
+    num_pixels = sum(layer.width * layer.height for layer in layers)
+    if max_workers <= 1 or num_pixels < PARALLEL_DECODE_MIN_PIXELS:
+        for layer in layers:
+            yield decode_psd_pixel_layer(layer)
         return
 
-    image = pil_image.toqimage()
-    left, top = layer.offset
+    # NOTE: processes instead of the shared thread pool, psd_tools decodes RLE channels in pure Python under the GIL
+    executor = get_decode_process_pool(max_workers)
+    # NOTE: channels are extracted as tasks are submitted, only those of pending layers are held at once,
+    # and pending layers are not decoded if the generator is closed early
+    pixel_layers = map_ordered(
+        decode_psd_layer_pixels,
+        (PSDLayerChannels.from_layer(layer) for layer in layers),
+        executor,
+    )
+    try:
+        for pixels in pixel_layers:
+            yield None if pixels is None else pixels.to_qimage()
+    except BrokenProcessPool:
+        # A worker process died (e.g. out of memory), the next import starts new ones
+        _discard_decode_process_pool(executor)
+        raise
+    finally:
+        pixel_layers.close()
+
+
+def load_psd_pixel_layer(layer: PixelLayer):
+    """Decode a pixel layer for a lazy item, which always needs an image of the size it was created with"""
+    image = decode_psd_pixel_layer(layer)
+    if image is None:
+        image = QImage(
+            layer.width, layer.height, QImage.Format.Format_ARGB32_Premultiplied
+        )
+        image.fill(Qt.GlobalColor.transparent)
+    return image
+
+
+def psd_pixel_layer_to_image_item(
+    layer: PixelLayer, image: Optional[QImage] = None, lazy: bool = False
+):
+    """Create the item of a pixel layer, from its already decoded image if given
+
+    With lazy, the layer is only decoded when its image is first accessed (e.g. when it is painted),
+    the item keeps a reference to the psd_tools layer until then.
+    """
+    assert layer.kind == "pixel"
+
     image_name = layer.name
-    item = AIEImageItem(image, image_name)
+    if image is None and lazy:
+        if layer.width == 0 or layer.height == 0:
+            return
+        item = AIEImageItem.create_lazy(
+            QSize(layer.width, layer.height),
+            image_name,
+            partial(load_psd_pixel_layer, layer),
+        )
+    else:
+        if image is None:
+            image = decode_psd_pixel_layer(layer)
+        if image is None:
+            return
+        item = AIEImageItem(image, image_name)
+
+    left, top = layer.offset
     item.setPos(left, top)
     item.setVisible(layer.visible)
 
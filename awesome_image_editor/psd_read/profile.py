@@ -0,0 +1,222 @@
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+from typing import Dict, List, NamedTuple, Optional
+
+from psd_tools.api.layers import Layer
+
+__all__ = (
+    "LayerProfile",
+    "LayerKindProfile",
+    "PSDImportProfiler",
+    "format_profile_summary",
+)
+
+# Stages of reading a layer: creating its item (including decoding or waiting for its pixels), adding it to the scene
+LAYER_STAGES = ("convert", "insert")
+
+
+class LayerProfile(NamedTuple):
+    # Names of the groups containing the layer and of the layer, separated by "/"
+    path: str
+    kind: str
+    convert_seconds: float
+    insert_seconds: float
+    # Peak of memory allocated by Python (including numpy) while reading the layer,
+    # pixels allocated by Qt are counted in image_bytes instead
+    allocated_bytes: int
+    # Size of the pixels of image items
+    image_bytes: int
+
+    @property
+    def seconds(self):
+        return self.convert_seconds + self.insert_seconds
+
+
+class LayerKindProfile(NamedTuple):
+    count: int
+    convert_seconds: float
+    insert_seconds: float
+    allocated_bytes: int
+    image_bytes: int
+
+
+class PSDImportProfiler:
+    """Records the time and memory spent on each layer of a PSD import, see load_psd_as_project
+
+    Memory is traced with tracemalloc while profiling, which slows the import down.
+    """
+
+    def __init__(self, trace_memory: bool = True):
+        self._trace_memory = trace_memory
+        self._is_tracing_memory = False
+        # Time of stages of the whole import, e.g. opening the file
+        self._stage_seconds: Dict[str, float] = {}
+        # Per layer: path, kind, then per stage seconds and allocated bytes
+        self._layers: Dict[int, dict] = {}
+
+    def __enter__(self):
+        if self._trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._is_tracing_memory = True
+        return self
+
+    def __exit__(self, *exc_info):
+        if self._is_tracing_memory:
+            tracemalloc.stop()
+            self._is_tracing_memory = False
+
+    @contextmanager
+    def measure_stage(self, stage: str):
+        start_time = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._stage_seconds[stage] = self._stage_seconds.get(stage, 0) + (
+                time.perf_counter() - start_time
+            )
+
+    def _get_layer_record(self, layer: Layer):
+        record = self._layers.get(id(layer))
+        if record is None:
+            record = self._layers[id(layer)] = {
+                "path": _get_layer_path(layer),
+                "kind": layer.kind,
+                "allocated_bytes": 0,
+                "image_bytes": 0,
+            }
+        return record
+
+    def record_image_bytes(self, layer: Layer, image_bytes: int):
+        self._get_layer_record(layer)["image_bytes"] = image_bytes
+
+    @contextmanager
+    def measure_layer(self, layer: Layer, stage: str):
+        assert stage in LAYER_STAGES
+        record = self._get_layer_record(layer)
+
+        is_tracing_memory = tracemalloc.is_tracing()
+        if is_tracing_memory:
+            tracemalloc.reset_peak()
+            start_memory = tracemalloc.get_traced_memory()[0]
+        start_time = time.perf_counter()
+        try:
+            yield
+        finally:
+            record[stage] = record.get(stage, 0) + time.perf_counter() - start_time
+            if is_tracing_memory:
+                allocated_bytes = tracemalloc.get_traced_memory()[1] - start_memory
+                record["allocated_bytes"] = max(
+                    record["allocated_bytes"], allocated_bytes
+                )
+
+    def get_stage_seconds(self):
+        return dict(self._stage_seconds)
+
+    def get_layer_profiles(self) -> List[LayerProfile]:
+        """Profiles of all layers, in the order they were read"""
+        return [
+            LayerProfile(
+                record["path"],
+                record["kind"],
+                record.get("convert", 0),
+                record.get("insert", 0),
+                record["allocated_bytes"],
+                record["image_bytes"],
+            )
+            for record in self._layers.values()
+        ]
+
+    def get_kind_profiles(self) -> Dict[str, LayerKindProfile]:
+        """Totals of the profiles of layers of each kind (pixel, shape, type, group)"""
+        totals: Dict[str, List[float]] = {}
+        for profile in self.get_layer_profiles():
+            total = totals.setdefault(profile.kind, [0, 0, 0, 0, 0])
+            total[0] += 1
+            for i, value in enumerate(profile[2:], 1):
+                total[i] += value
+        return {kind: LayerKindProfile(*total) for kind, total in totals.items()}
+
+    def get_slowest_layers(self, count: int = 10):
+        profiles = self.get_layer_profiles()
+        return sorted(profiles, key=lambda profile: profile.seconds, reverse=True)[
+            :count
+        ]
+
+    def to_dict(self, num_slowest_layers: int = 10):
+        """The whole report as JSON compatible values"""
+        return {
+            "stages": self.get_stage_seconds(),
+            "kinds": {
+                kind: profile._asdict()
+                for kind, profile in self.get_kind_profiles().items()
+            },
+            "layers": [profile._asdict() for profile in self.get_layer_profiles()],
+            "slowest_layers": [
+                profile._asdict()
+                for profile in self.get_slowest_layers(num_slowest_layers)
+            ],
+        }
+
+    def format_summary(self, num_slowest_layers: int = 10):
+        return format_profile_summary(self.to_dict(num_slowest_layers))
+
+
+def profile_import(profiler: Optional[PSDImportProfiler]):
+    """Trace memory for the duration of an import, if profiling"""
+    if profiler is None:
+        return nullcontext()
+    return profiler
+
+
+def profile_layer(profiler: Optional[PSDImportProfiler], layer: Layer, stage: str):
+    """Measure a stage of reading a layer, if profiling"""
+    if profiler is None:
+        return nullcontext()
+    return profiler.measure_layer(layer, stage)
+
+
+def profile_stage(profiler: Optional[PSDImportProfiler], stage: str):
+    if profiler is None:
+        return nullcontext()
+    return profiler.measure_stage(stage)
+
+
+def format_profile_summary(report: dict):
+    """Format a report returned by PSDImportProfiler.to_dict, e.g. by another process"""
+    lines = []
+    for stage, seconds in report["stages"].items():
+        lines.append(f"  {stage:<12} {seconds:8.3f}s")
+
+    lines.append("  Per layer kind:")
+    for kind, profile in report["kinds"].items():
+        lines.append(
+            f"    {kind:<6} {profile['count']:6} layers"
+            f"  convert {profile['convert_seconds']:8.3f}s"
+            f"  insert {profile['insert_seconds']:8.3f}s"
+            f"  allocated {_format_bytes(profile['allocated_bytes'])}"
+            f"  pixels {_format_bytes(profile['image_bytes'])}"
+        )
+
+    lines.append("  Slowest layers:")
+    for profile in report["slowest_layers"]:
+        seconds = profile["convert_seconds"] + profile["insert_seconds"]
+        lines.append(
+            f"    {seconds:8.3f}s  {profile['kind']:<6}"
+            f"  allocated {_format_bytes(profile['allocated_bytes'])}  {profile['path']}"
+        )
+    return "\n".join(lines)
+
+
+def _get_layer_path(layer: Layer):
+    names = [layer.name]
+    parent = layer.parent
+    # NOTE: the parent of top level layers is the PSD image itself
+    while parent is not None and parent.kind == "group":
+        names.append(parent.name)
+        parent = parent.parent
+    return "/".join(reversed(names))
+
+
+def _format_bytes(num_bytes: float):
+    return f"{num_bytes / (1024 * 1024):8.1f} MB"
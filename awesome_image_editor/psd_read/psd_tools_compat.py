@@ -0,0 +1,91 @@
+"""The psd_tools internals PSD import relies on, in one place
+
+psd_tools does not expose the compressed channels of layers, nor the channels of the composite image,
+which PSD import decodes itself (in worker processes, or straight into QImages). Everything relying on
+psd_tools internals goes through this module, which warns if psd_tools is not a version it was written for.
+"""
+
+import warnings
+from typing import List, Optional, Sequence, Tuple
+
+from PIL import Image
+from psd_tools import PSDImage
+from psd_tools.api import numpy_io, pil_io
+from psd_tools.api.layers import Layer, PixelLayer
+from psd_tools.constants import ColorMode, Tag
+from psd_tools.psd.layer_and_mask import ChannelData, LayerRecord
+from psd_tools.psd.tagged_blocks import TaggedBlock
+from psd_tools.version import __version__ as PSD_TOOLS_VERSION
+
+__all__ = (
+    "PSD_TOOLS_VERSION",
+    "create_channel_image",
+    "get_composite_transparency_index",
+    "get_layer_channels",
+    "get_layer_file_format",
+    "get_layer_record",
+    "get_tagged_block_length_format",
+    "merge_channel_images",
+    "read_composite_channels",
+)
+
+# Versions of psd_tools whose internals match this module, see requirements.txt
+SUPPORTED_PSD_TOOLS_VERSIONS = ("1.9.",)
+
+if not PSD_TOOLS_VERSION.startswith(SUPPORTED_PSD_TOOLS_VERSIONS):
+    warnings.warn(
+        f"psd-tools {PSD_TOOLS_VERSION} is not supported (see requirements.txt), importing PSD files may fail",
+        RuntimeWarning,
+    )
+
+
+def get_layer_record(layer: Layer) -> LayerRecord:
+    return layer._record
+
+
+def get_layer_file_format(layer: Layer) -> Tuple[int, int, ColorMode]:
+    """Return the depth, version (PSD or PSB) and color mode of the file of a layer"""
+    psd = layer._psd
+    return psd.depth, psd.version, psd.color_mode
+
+
+def get_layer_channels(layer: PixelLayer) -> List[Tuple[int, ChannelData]]:
+    """Return the ID and compressed data of each channel of a layer, in the order of the file"""
+    return [
+        (info.id, data)
+        for info, data in zip(layer._record.channel_info, layer._channels)
+    ]
+
+
+def create_channel_image(size: Tuple[int, int], data: bytes, depth: int):
+    """Create a single channel PIL image from decompressed channel data"""
+    return pil_io._create_image(size, data, depth)
+
+
+def merge_channel_images(
+    channel_images: Sequence[Image.Image],
+    alpha: Optional[Image.Image],
+    color_mode: ColorMode,
+) -> Image.Image:
+    """Merge channel images into the PIL image of a layer, as topil does"""
+    image = Image.merge(
+        pil_io.get_pil_mode(color_mode),
+        pil_io._check_channels(list(channel_images), color_mode),
+    )
+    return pil_io.post_process(image, alpha, None)
+
+
+def read_composite_channels(psd: PSDImage) -> List[bytes]:
+    """Decompress the channels of the composite image of a PSD file"""
+    return psd._record.image_data.get_data(psd._record.header)
+
+
+def get_composite_transparency_index(psd: PSDImage) -> Optional[int]:
+    """Return the index of the transparency channel of the composite image, if it has one"""
+    if not numpy_io.has_transparency(psd):
+        return None
+    return numpy_io.get_transparency_index(psd)
+
+
+def get_tagged_block_length_format(key: Tag, version: int) -> str:
+    return TaggedBlock._length_format(key, version)
@@ -1,38 +1,139 @@
+from itertools import chain
+from typing import List
+
+import numpy as np
 from psd_tools.api.layers import ShapeLayer
-from psd_tools.api.shape import Subpath
-from psd_tools.psd.vector import Knot
+from PyQt6.QtCore import QByteArray, QDataStream, Qt
 from PyQt6.QtGui import QPainterPath
 
 from ..model_view.items.shape import AIEShapeItem
 
-
-def _connect_knots_cubic(
-    qpath: QPainterPath, k1: Knot, k2: Knot, psd_width: int, psd_height: int
+# Layout of paths in a QDataStream: number of elements, elements (type, x, y),
+# then index of the element starting the last subpath and fill rule
+PATH_STREAM_INT = np.dtype(">i4")
+PATH_STREAM_ELEMENT = np.dtype([("type", ">i4"), ("x", ">f8"), ("y", ">f8")])
+
+# Path elements of each knot: move to its anchor if it starts a subpath,
+# then the cubic curve to the next knot if it is connected to one
+KNOT_ELEMENT_TYPES = np.array(
+    [
+        QPainterPath.ElementType.MoveToElement.value,
+        QPainterPath.ElementType.CurveToElement.value,
+        QPainterPath.ElementType.CurveToDataElement.value,
+        QPainterPath.ElementType.CurveToDataElement.value,
+    ]
+)
+
+# Index of the control points of knots, in the points array built by psd_shape_layer_to_shape_item
+PRECEDING, ANCHOR, LEAVING = range(3)
+
+# How the shape components of a vector mask are combined (operation of their first subpath),
+# the other subpaths of a component have the operation PATH_CONTINUE
+PATH_EXCLUDE, PATH_UNION, PATH_SUBTRACT, PATH_INTERSECT = range(4)
+PATH_CONTINUE = -1
+
+
+def _create_path(
+    element_types: np.ndarray, element_points: np.ndarray, last_subpath_start: int
 ):
-    start_y, start_x = k1.anchor
-    start_x *= psd_width
-    start_y *= psd_height
-
-    end_y, end_x = k2.anchor
-    end_x *= psd_width
-    end_y *= psd_height
-
-    control_point_1_y, control_point_1_x = k1.leaving
-    control_point_1_x *= psd_width
-    control_point_1_y *= psd_height
-
-    control_point_2_y, control_point_2_x = k2.preceding
-    control_point_2_x *= psd_width
-    control_point_2_y *= psd_height
-
-    qpath.cubicTo(
-        control_point_1_x,
-        control_point_1_y,
-        control_point_2_x,
-        control_point_2_y,
-        end_x,
-        end_y,
+    """Create a path from all of its elements at once, instead of adding them one by one"""
+    elements = np.empty(len(element_types), PATH_STREAM_ELEMENT)
+    elements["type"] = element_types
+    elements["x"] = element_points[:, 0]
+    elements["y"] = element_points[:, 1]
+
+    # NOTE: PSD paths are filled with the even-odd rule
+    footer = np.array(
+        [last_subpath_start, Qt.FillRule.OddEvenFill.value], PATH_STREAM_INT
     )
+    data = (
+        np.array(len(elements), PATH_STREAM_INT).tobytes()
+        + elements.tobytes()
+        + footer.tobytes()
+    )
+
+    path = QPainterPath()
+    QDataStream(QByteArray(data)) >> path
+    return path
+
+
+def _create_even_odd_path():
+    path = QPainterPath()
+    path.setFillRule(Qt.FillRule.OddEvenFill)
+    return path
+
+
+def _apply_path_operation(
+    areas: List[QPainterPath], path: QPainterPath, operation: int
+) -> List[QPainterPath]:
+    """Combine the area of a shape component with the areas of the previous ones, as psd_tools composites them
+
+    Areas are kept apart, with disjoint bounding rects, so that only those the component overlaps go through
+    the (slow, curve flattening) boolean operations of QPainterPath.
+    """
+    rect = path.boundingRect()
+    overlapping = _create_even_odd_path()
+    others = []
+    for area in areas:
+        if area.boundingRect().intersects(rect):
+            overlapping.addPath(area)
+        else:
+            others.append(area)
+
+    if overlapping.isEmpty():
+        result = path if operation in (PATH_UNION, PATH_EXCLUDE) else None
+    elif operation == PATH_UNION:
+        result = overlapping.united(path)
+    elif operation == PATH_SUBTRACT:
+        result = overlapping.subtracted(path)
+    elif operation == PATH_INTERSECT:
+        result = overlapping.intersected(path)
+    else:
+        result = overlapping.united(path).subtracted(overlapping.intersected(path))
+
+    if operation == PATH_INTERSECT:
+        others = []
+    if result is None or result.isEmpty():
+        return others
+
+    # NOTE: areas apart from the component do not overlap the result, they are only merged with it
+    # if their bounding rects now intersect
+    while True:
+        result_rect = result.boundingRect()
+        touching = [
+            area for area in others if area.boundingRect().intersects(result_rect)
+        ]
+        if len(touching) == 0:
+            break
+        others = [
+            area for area in others if not area.boundingRect().intersects(result_rect)
+        ]
+        for area in touching:
+            result.addPath(area)
+    others.append(result)
+    return others
+
+
+def _combine_components(
+    paths: List[QPainterPath], operations: List[int], psd_width: int, psd_height: int
+):
+    if len(paths) == 1:
+        return paths[0]
+
+    # NOTE: the first component is combined with an empty mask, subtracting or intersecting
+    # applies to the whole canvas instead
+    areas = []
+    if operations[0] in (PATH_SUBTRACT, PATH_INTERSECT):
+        canvas = _create_even_odd_path()
+        canvas.addRect(0, 0, psd_width, psd_height)
+        areas.append(canvas)
+    for operation, path in zip(operations, paths):
+        areas = _apply_path_operation(areas, path, operation)
+
+    combined_path = _create_even_odd_path()
+    for area in areas:
+        combined_path.addPath(area)
+    return combined_path
 
 
 def psd_shape_layer_to_shape_item(layer: ShapeLayer, psd_width: int, psd_height: int):
@@ -44,29 +145,82 @@ def psd_shape_layer_to_shape_item(layer: ShapeLayer, psd_width: int, psd_height:
     if layer.vector_mask is None:
         return
 
-    left, top = layer.offset
-    layer_name = layer.name
-
-    subpath: Subpath
-    for subpath in layer.vector_mask.paths:
-        num_knots = len(subpath)
-        if num_knots == 0:
-            continue
+    subpaths = [subpath for subpath in layer.vector_mask.paths if len(subpath) > 0]
+    if len(subpaths) == 0:
+        return
 
-        qpath = QPainterPath()
-        qpath.moveTo(
-            subpath[0].anchor[1] * psd_width, subpath[0].anchor[0] * psd_height
+    # Control points of the knots of all subpaths, scaled all at once (knots hold relative (y, x) pairs)
+    num_knots = sum(len(subpath) for subpath in subpaths)
+    points = np.fromiter(
+        chain.from_iterable(
+            knot.preceding + knot.anchor + knot.leaving
+            for subpath in subpaths
+            for knot in subpath
+        ),
+        np.float64,
+        num_knots * 6,
+    ).reshape(num_knots, 3, 2)
+    points = points[:, :, ::-1] * (psd_width, psd_height)
+
+    # Each knot is connected to the next one of its subpath, the last knot of closed subpaths to the first one
+    subpath_sizes = np.array([len(subpath) for subpath in subpaths])
+    subpath_starts = np.cumsum(subpath_sizes) - subpath_sizes
+    subpath_ends = subpath_starts + subpath_sizes - 1
+    next_knots = np.arange(num_knots) + 1
+    next_knots[subpath_ends] = subpath_starts
+
+    is_subpath_start = np.zeros(num_knots, bool)
+    is_subpath_start[subpath_starts] = True
+    is_connected = np.ones(num_knots, bool)
+    is_connected[subpath_ends] = [subpath.is_closed() for subpath in subpaths]
+
+    # Candidate elements of each knot, only those that apply are kept
+    knot_element_points = np.stack(
+        (
+            points[:, ANCHOR],
+            points[:, LEAVING],
+            points[next_knots, PRECEDING],
+            points[next_knots, ANCHOR],
+        ),
+        axis=1,
+    )
+    is_element_kept = np.stack(
+        (is_subpath_start, is_connected, is_connected, is_connected), axis=1
+    )
+    element_types = np.broadcast_to(KNOT_ELEMENT_TYPES, is_element_kept.shape)[
+        is_element_kept
+    ]
+    element_points = knot_element_points[is_element_kept]
+
+    # Subpaths are grouped into shape components, each created as a single path
+    operations = [subpath.operation for subpath in subpaths]
+    if operations[0] == PATH_CONTINUE:
+        operations[0] = PATH_UNION
+    is_component_start = np.array(operations) != PATH_CONTINUE
+    subpath_components = np.cumsum(is_component_start) - 1
+    element_components = np.broadcast_to(
+        np.repeat(subpath_components, subpath_sizes)[:, np.newaxis],
+        is_element_kept.shape,
+    )[is_element_kept]
+    component_bounds = np.searchsorted(
+        element_components, np.arange(subpath_components[-1] + 2)
+    )
+    component_paths = []
+    for start, end in zip(component_bounds[:-1], component_bounds[1:]):
+        component_types = element_types[start:end]
+        last_subpath_start = int(
+            np.flatnonzero(component_types == KNOT_ELEMENT_TYPES[0])[-1]
+        )
+        component_paths.append(
+            _create_path(component_types, element_points[start:end], last_subpath_start)
         )
 
-        for i in range(num_knots - 1):
-            current_knot = subpath[i]
-            next_knot = subpath[i + 1]
-            _connect_knots_cubic(qpath, current_knot, next_knot, psd_width, psd_height)
-
-        if subpath.is_closed():
-            _connect_knots_cubic(qpath, subpath[-1], subpath[0], psd_width, psd_height)
+    component_operations = np.array(operations)[is_component_start].tolist()
+    qpath = _combine_components(
+        component_paths, component_operations, psd_width, psd_height
+    )
 
-        item = AIEShapeItem(qpath, layer_name)
-        item.setVisible(layer.visible)
+    item = AIEShapeItem(qpath, layer.name)
+    item.setVisible(layer.visible)
 
-        return item
+    return item
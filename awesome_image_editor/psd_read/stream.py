@@ -0,0 +1,210 @@
+import mmap
+from functools import partial
+from typing import Dict, Tuple, Type
+
+from PyQt6.QtCore import QSize
+from PyQt6.QtGui import QImage
+from psd_tools import PSDImage
+from psd_tools.api.layers import PixelLayer
+from psd_tools.constants import Compression, Tag
+from psd_tools.psd import PSD
+from psd_tools.psd.color_mode_data import ColorModeData
+from psd_tools.psd.header import FileHeader
+from psd_tools.psd.image_data import ImageData
+from psd_tools.psd.image_resources import ImageResources
+from psd_tools.psd.layer_and_mask import (
+    ChannelData,
+    ChannelDataList,
+    ChannelImageData,
+    GlobalLayerMaskInfo,
+    LayerAndMaskInformation,
+    LayerInfo,
+    LayerInfoBlock,
+    LayerRecord,
+    LayerRecords,
+)
+from psd_tools.psd.tagged_blocks import TaggedBlock, TaggedBlocks
+from psd_tools.utils import is_readable, read_fmt, read_padding
+
+from ..lru_cache import LRUCache
+from ..model_view.items.image import AIEImageItem
+from .pixel import load_psd_pixel_layer
+from .psd_tools_compat import get_layer_record, get_tagged_block_length_format
+
+__all__ = ("DEFAULT_STREAM_MEMORY_BUDGET", "MappedPSD")
+
+# Size of the decoded pixel layers kept in memory by streamed imports by default, see load_psd_as_project
+DEFAULT_STREAM_MEMORY_BUDGET = 1024 * 1024 * 1024
+
+# Tagged blocks holding the layers of 16 and 32-bit files, instead of the layer info section
+LAYER_INFO_TAGS = (Tag.LAYER_16.value, Tag.LAYER_32.value)
+
+
+class MappedPSD:
+    """A PSD (or PSB) file mapped in memory, whose layer records are read up front
+
+    The channel image data of layers and the composite image are not read, they reference the mapping
+    and are only paged in and decompressed when a layer is decoded.
+    Decoded layers are kept in a cache bounded by memory_budget bytes, and decoded again once evicted.
+    """
+
+    def __init__(
+        self,
+        filepath: str,
+        memory_budget: int = DEFAULT_STREAM_MEMORY_BUDGET,
+        encoding: str = "macroman",
+    ):
+        with open(filepath, "rb") as file:
+            # NOTE: the mapping stays valid after the file is closed
+            self._mapping = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._view = memoryview(self._mapping)
+        # Range of the channel image data of each layer in the file, by id of its layer record
+        self._channel_ranges: Dict[int, Tuple[int, int]] = {}
+        self._image_cache: LRUCache[QImage] = LRUCache(
+            memory_budget, lambda image: image.sizeInBytes()
+        )
+        self.psd = PSDImage(self._read_psd(encoding))
+
+    def get_image_cache(self):
+        return self._image_cache
+
+    def decode_pixel_layer(self, layer: PixelLayer) -> QImage:
+        image = load_psd_pixel_layer(layer)
+
+        # NOTE: the pages of the compressed channels are clean, dropping them from memory only means
+        # reading them from the file again if the layer is decoded again (madvise is not available on Windows)
+        channel_range = self._channel_ranges.get(id(get_layer_record(layer)))
+        can_drop_pages = hasattr(mmap, "MADV_DONTNEED") and hasattr(
+            self._mapping, "madvise"
+        )
+        if channel_range is not None and can_drop_pages:
+            start = channel_range[0] - channel_range[0] % mmap.PAGESIZE
+            if channel_range[1] > start:
+                self._mapping.madvise(
+                    mmap.MADV_DONTNEED, start, channel_range[1] - start
+                )
+
+        return image
+
+    def create_pixel_item(self, layer: PixelLayer):
+        """Create the item of a pixel layer, decoded whenever painted and cached within the memory budget"""
+        assert layer.kind == "pixel"
+        if layer.width == 0 or layer.height == 0:
+            return
+
+        item = AIEImageItem.create_lazy(
+            QSize(layer.width, layer.height),
+            layer.name,
+            partial(self.decode_pixel_layer, layer),
+            self._image_cache,
+        )
+        left, top = layer.offset
+        item.setPos(left, top)
+        item.setVisible(layer.visible)
+        return item
+
+    def _slice(self, offset: int, length: int):
+        return self._view[offset : offset + length]
+
+    def _read_psd(self, encoding: str):
+        # NOTE: the mapping is read as a file by psd_tools, except for channel and image data
+        fp = self._mapping
+        header = FileHeader.read(fp)
+        color_mode_data = ColorModeData.read(fp)
+        image_resources = ImageResources.read(fp, encoding)
+        layer_and_mask_information = self._read_layer_and_mask_information(
+            encoding, header.version
+        )
+        compression = Compression(read_fmt("H", fp)[0])
+        image_data = ImageData(compression, self._slice(fp.tell(), len(fp)))
+        return PSD(
+            header,
+            color_mode_data,
+            image_resources,
+            layer_and_mask_information,
+            image_data,
+        )
+
+    def _read_layer_and_mask_information(self, encoding: str, version: int):
+        # NOTE: mirrors LayerAndMaskInformation.read
+        fp = self._mapping
+        length = read_fmt(("I", "Q")[version - 1], fp)[0]
+        end_pos = fp.tell() + length
+        if length == 0:
+            return LayerAndMaskInformation()
+
+        layer_info = self._read_layer_info(encoding, version)
+
+        global_layer_mask_info = None
+        if is_readable(fp, 17) and fp.tell() < end_pos:
+            global_layer_mask_info = GlobalLayerMaskInfo.read(fp)
+
+        tagged_blocks = None
+        if is_readable(fp):
+            tagged_blocks = self._read_tagged_blocks(encoding, version, end_pos)
+
+        fp.seek(end_pos)
+        return LayerAndMaskInformation(
+            layer_info, global_layer_mask_info, tagged_blocks
+        )
+
+    def _read_layer_info(self, encoding: str, version: int):
+        # NOTE: mirrors LayerInfo.read
+        fp = self._mapping
+        length = read_fmt(("I", "Q")[version - 1], fp)[0]
+        end_pos = fp.tell() + length
+        if length == 0:
+            return LayerInfo()
+
+        layer_info = self._read_layer_info_body(LayerInfo, encoding, version)
+        fp.seek(end_pos)
+        return layer_info
+
+    def _read_layer_info_body(
+        self, layer_info_type: Type[LayerInfo], encoding: str, version: int
+    ):
+        fp = self._mapping
+        layer_count = read_fmt("h", fp)[0]
+        layer_records = LayerRecords.read(fp, layer_count, encoding, version)
+        channel_image_data = ChannelImageData(
+            [self._map_channels(record) for record in layer_records]
+        )
+        return layer_info_type(layer_count, layer_records, channel_image_data)
+
+    def _map_channels(self, record: LayerRecord):
+        # NOTE: mirrors ChannelDataList.read, without reading the data
+        fp = self._mapping
+        start = fp.tell()
+        channels = []
+        for channel_info in record.channel_info:
+            compression = Compression(read_fmt("H", fp)[0])
+            length = max(0, channel_info.length - 2)
+            channels.append(ChannelData(compression, self._slice(fp.tell(), length)))
+            fp.seek(length, 1)
+
+        self._channel_ranges[id(record)] = (start, fp.tell())
+        return ChannelDataList(channels)
+
+    def _read_tagged_blocks(self, encoding: str, version: int, end_pos: int):
+        # NOTE: mirrors TaggedBlocks.read, 16 and 32-bit layers are mapped like the layer info section
+        fp = self._mapping
+        items = []
+        while is_readable(fp, 8) and fp.tell() < end_pos:
+            signature, key = read_fmt("4s4s", fp)
+            if key not in LAYER_INFO_TAGS:
+                fp.seek(-8, 1)
+                block = TaggedBlock.read(fp, version, 4)
+                if block is None:
+                    break
+            else:
+                key = Tag(key)
+                length = read_fmt(get_tagged_block_length_format(key, version), fp)[0]
+                block_end_pos = fp.tell() + length
+                layer_info = self._read_layer_info_body(
+                    LayerInfoBlock, encoding, version
+                )
+                fp.seek(block_end_pos)
+                read_padding(fp, length, 4)
+                block = TaggedBlock(signature, key, layer_info)
+            items.append((block.key, block))
+        return TaggedBlocks(items)
@@ -1,3 +1,5 @@
+from typing import Dict, Optional, Tuple
+
 from psd_tools.api.layers import TypeLayer
 from PyQt6.QtCore import Qt
 from PyQt6.QtGui import QColor, QFont, QTextBlockFormat, QTextCharFormat, QTextCursor
@@ -12,8 +14,69 @@ PSD_PARAGRAPH_JUSTIFICATION_QT_ALIGNMENT_MAP = {
     2: Qt.AlignmentFlag.AlignCenter,
 }
 
+# Font family, font size, fill color (ARGB floats)
+CharFormatKey = Tuple[str, float, Tuple[float, ...]]
+
+
+class TextFormatCache:
+    """Fonts, colors and character formats shared by all style runs of the text layers of an import"""
+
+    def __init__(self):
+        self._fonts: Dict[Tuple[str, float], QFont] = {}
+        self._colors: Dict[Tuple[float, ...], QColor] = {}
+        self._char_formats: Dict[CharFormatKey, QTextCharFormat] = {}
+
+    def get_font(self, font_family: str, font_size: float):
+        key = (font_family, font_size)
+        qfont = self._fonts.get(key)
+        if qfont is None:
+            qfont = self._fonts[key] = QFont()
+            # NOTE: pixel sizes are integers, PSD font sizes are usually not,
+            # and Qt ignores sizes below 1 (e.g. of text scaled down to less than a pixel)
+            qfont.setPixelSize(max(round(font_size), 1))
+            qfont.setFamily(font_family)
+        return qfont
+
+    def get_color(self, fill_color_argb_float: Tuple[float, ...]):
+        color = self._colors.get(fill_color_argb_float)
+        if color is None:
+            fill_color_rgba_float = (
+                *fill_color_argb_float[1:],
+                fill_color_argb_float[0],
+            )
+            fill_color_rgba_uchar = tuple(
+                map(lambda x: int(x * 255), fill_color_rgba_float)
+            )
+            color = self._colors[fill_color_argb_float] = QColor(*fill_color_rgba_uchar)
+        return color
+
+    def get_char_format(self, key: CharFormatKey):
+        char_format = self._char_formats.get(key)
+        if char_format is None:
+            font_family, font_size, fill_color_argb_float = key
+            char_format = self._char_formats[key] = QTextCharFormat()
+            char_format.setFont(self.get_font(font_family, font_size))
+            char_format.setForeground(self.get_color(fill_color_argb_float))
+        return char_format
+
+
+def _get_char_format_key(stylesheet: dict, fontset: list) -> CharFormatKey:
+    font = fontset[stylesheet["Font"]]
+    fill_color_data = stylesheet.get("FillColor", DEFAULT_PSD_TEXT_FILL_COLOR_DATA)
+    return (
+        str(font["Name"]),
+        float(stylesheet["FontSize"]),
+        tuple(float(value) for value in fill_color_data["Values"]),
+    )
+
+
+def psd_type_layer_to_text_item(
+    layer: TypeLayer, text_formats: Optional[TextFormatCache] = None
+):
+    """Create the item of a type layer, formats are shared through text_formats when importing several layers"""
+    if text_formats is None:
+        text_formats = TextFormatCache()
 
-def psd_type_layer_to_text_item(layer: TypeLayer):
     item = AIETextItem("", layer.name)
     item.setPos(layer.offset[0], layer.offset[1])
     item.setVisible(layer.visible)
@@ -21,6 +84,9 @@ def psd_type_layer_to_text_item(layer: TypeLayer):
     document = item.document()
     document.setUseDesignMetrics(True)
     cursor = QTextCursor(document)
+    # NOTE: the document is laid out (and the item resized) once at the end of the edit block,
+    # instead of after every inserted run
+    cursor.beginEditBlock()
 
     text = layer.engine_dict["Editor"]["Text"].value
     fontset = layer.resource_dict["FontSet"]
@@ -28,33 +94,23 @@ def psd_type_layer_to_text_item(layer: TypeLayer):
     rundata = layer.engine_dict["StyleRun"]["RunArray"]
     assert len(rundata) == len(runlength)
 
+    # Consecutive runs with the same format are inserted at once
     index = 0
+    run_start = 0
+    run_key: Optional[CharFormatKey] = None
     for length, style in zip(runlength, rundata):
-        substring: str = text[index : index + length]
-
-        stylesheet = style["StyleSheet"]["StyleSheetData"]
-        font = fontset[stylesheet["Font"]]
+        key = _get_char_format_key(style["StyleSheet"]["StyleSheetData"], fontset)
+        if key != run_key:
+            if run_key is not None:
+                cursor.insertText(
+                    text[run_start:index], text_formats.get_char_format(run_key)
+                )
+            run_start = index
+            run_key = key
         index += length
 
-        fill_color_data = stylesheet.get("FillColor", DEFAULT_PSD_TEXT_FILL_COLOR_DATA)
-        fill_color_argb_float = fill_color_data["Values"]
-        fill_color_rgba_float = (*fill_color_argb_float[1:], fill_color_argb_float[0])
-        fill_color_rgba_uchar = tuple(
-            map(lambda x: int(x * 255), fill_color_rgba_float)
-        )
-
-        font_family = str(font["Name"])
-        font_size = stylesheet["FontSize"]
-
-        qfont = QFont()
-        qfont.setPixelSize(font_size)
-        qfont.setFamily(font_family)
-
-        char_format = QTextCharFormat()
-        char_format.setFont(qfont)
-        char_format.setForeground(QColor(*fill_color_rgba_uchar))
-
-        cursor.insertText(substring, char_format)
+    if run_key is not None:
+        cursor.insertText(text[run_start:index], text_formats.get_char_format(run_key))
 
     paragraph_rundata = layer.engine_dict["ParagraphRun"]["RunArray"]
     # paragraph_runlength = layer.engine_dict['ParagraphRun']['RunLengthArray']
@@ -74,4 +130,6 @@ def psd_type_layer_to_text_item(layer: TypeLayer):
 
         cursor.movePosition(QTextCursor.MoveOperation.NextBlock)
 
+    cursor.endEditBlock()
+
     return item
@@ -0,0 +1,393 @@
+import math
+import threading
+from concurrent.futures import Executor, ThreadPoolExecutor
+from contextlib import contextmanager
+from functools import partial
+from typing import List, NamedTuple, Optional
+
+from PyQt6 import sip
+from PyQt6.QtCore import QPoint, QRect, QRectF, QSize, QSizeF, Qt
+from PyQt6.QtGui import QImage, QPainter, QTransform
+from PyQt6.QtWidgets import (
+    QGraphicsItem,
+    QGraphicsScene,
+    QStyle,
+    QStyleOptionGraphicsItem,
+)
+
+from .model_view.items.group import AIEGroupItem
+from .model_view.items.image import AIEImageItem
+from .model_view.items.shape import AIEShapeItem
+from .thread_pool import get_thread_pool
+
+__all__ = (
+    "DEFAULT_RENDER_STRIP_HEIGHT",
+    "DEFAULT_RENDER_TILE_SIZE",
+    "get_render_size",
+    "get_unscaled_render_source",
+    "iter_render_scene_strips",
+    "render_scene",
+)
+
+# Width and height of the tiles rendered concurrently, in pixels of the rendered image
+DEFAULT_RENDER_TILE_SIZE = 1024
+
+# Rows of the strips rendered one after the other by iter_render_scene_strips
+DEFAULT_RENDER_STRIP_HEIGHT = 256
+
+# Items that can be painted by several threads at once, as they only read their own state while painting
+# NOTE: other items (e.g. text items, whose documents are laid out lazily while drawn) are painted one at a time
+CONCURRENT_PAINT_ITEM_TYPES = (AIEImageItem, AIEShapeItem, AIEGroupItem)
+
+# Flags of items that QGraphicsScene.render handles but render_scene does not, scenes with them are rendered serially
+SERIAL_RENDER_ITEM_FLAGS = (
+    QGraphicsItem.GraphicsItemFlag.ItemClipsToShape
+    | QGraphicsItem.GraphicsItemFlag.ItemClipsChildrenToShape
+    | QGraphicsItem.GraphicsItemFlag.ItemIgnoresTransformations
+)
+
+
+class ItemPaint(NamedTuple):
+    """What painting an item needs, gathered from the scene before painting starts"""
+
+    item: QGraphicsItem
+    # Item to rendered image coordinates
+    transform: QTransform
+    opacity: float
+    state: QStyle.StateFlag
+    bounding_rect: QRectF
+    # Bounding rect in rendered image coordinates
+    image_rect: QRect
+    uses_extended_style_option: bool
+    is_concurrent: bool
+
+
+def get_render_size(
+    source: QRectF, scale: Optional[float] = None, max_size: Optional[int] = None
+):
+    """Return the size of the image to render source into, scaled by scale then fitted in max_size pixels if given"""
+    size = QSizeF(source.size())
+    if scale is not None:
+        size *= scale
+    if max_size is not None and max(size.width(), size.height()) > max_size:
+        size = size.scaled(
+            QSizeF(max_size, max_size), Qt.AspectRatioMode.KeepAspectRatio
+        )
+
+    render_size = size.toSize()
+    if (scale is not None or max_size is not None) and not source.isEmpty():
+        # NOTE: sources scaled down to less than a pixel are still rendered
+        render_size = render_size.expandedTo(QSize(1, 1))
+    return render_size
+
+
+def get_unscaled_render_source(source: QRectF):
+    """Return the part of source that renders at exactly 1:1 into an image of get_render_size(source) pixels
+
+    NOTE: rendering the source itself would scale it by a fraction of a pixel to fit in the image whenever
+    it is not a whole number of pixels wide and high, e.g. for layers at fractional positions,
+    and scaled sources are not rendered in tiles.
+    """
+    return QRectF(source.topLeft(), QSizeF(get_render_size(source)))
+
+
+def _get_scene_transform(size: QSize, source: QRectF):
+    # NOTE: same as QGraphicsScene.render with the whole image as target and Qt.AspectRatioMode.KeepAspectRatio
+    ratio = min(size.width() / source.width(), size.height() / source.height())
+    return QTransform().scale(ratio, ratio).translate(-source.left(), -source.top())
+
+
+def _snap_to_pixel(coordinate: float):
+    pixel = math.floor(coordinate)
+    fraction = coordinate - pixel
+    if fraction < 0.5:
+        return pixel
+    # NOTE: as qRound, which rounds halves away from zero, so negative halves are left to it
+    if fraction == 0.5 and coordinate > 0:
+        return pixel + 1
+    return coordinate
+
+
+def _snap_image_transform(transform: QTransform):
+    # NOTE: QPainter draws images from their rounded position, but skips those positioned less than half a pixel
+    # past the right or bottom of the clip, whose first column or row is then missing from the tile they end in.
+    # Image items only draw images at whole pixels of the item, so rounding their position down beforehand
+    # rounds every image they draw to the same pixels, in every tile or strip of a render.
+    if transform.type().value > QTransform.TransformationType.TxTranslate.value:
+        return transform
+    return QTransform.fromTranslate(
+        _snap_to_pixel(transform.dx()), _snap_to_pixel(transform.dy())
+    )
+
+
+def _can_render_in_tiles(
+    scene: QGraphicsScene, items: List[QGraphicsItem], item_paints: List[ItemPaint]
+):
+    if scene.backgroundBrush().style() != Qt.BrushStyle.NoBrush:
+        return False
+    if any(
+        item.graphicsEffect() is not None or item.flags() & SERIAL_RENDER_ITEM_FLAGS
+        for item in items
+    ):
+        return False
+    # NOTE: scaled images are blitted by stepping through their pixels from where the clip starts,
+    # so they would be sampled slightly differently in each tile
+    return all(
+        item_paint.transform.type().value
+        <= QTransform.TransformationType.TxTranslate.value
+        for item_paint in item_paints
+    )
+
+
+def _get_item_paints(items: List[QGraphicsItem], scene_transform: QTransform):
+    item_paints = []
+    for item in items:
+        opacity = item.effectiveOpacity()
+        if not item.isVisible() or opacity == 0:
+            continue
+
+        # NOTE: as QGraphicsItemPrivate.initStyleOption
+        state = QStyle.StateFlag.State_None
+        if item.isSelected():
+            state |= QStyle.StateFlag.State_Selected
+        if item.isEnabled():
+            state |= QStyle.StateFlag.State_Enabled
+        if item.hasFocus():
+            state |= QStyle.StateFlag.State_HasFocus
+
+        transform = item.deviceTransform(scene_transform)
+        if isinstance(item, AIEImageItem):
+            transform = _snap_image_transform(transform)
+        bounding_rect = item.boundingRect()
+        item_paints.append(
+            ItemPaint(
+                item,
+                transform,
+                opacity,
+                state,
+                bounding_rect,
+                transform.mapRect(bounding_rect).toAlignedRect(),
+                bool(
+                    item.flags()
+                    & QGraphicsItem.GraphicsItemFlag.ItemUsesExtendedStyleOption
+                ),
+                isinstance(item, CONCURRENT_PAINT_ITEM_TYPES),
+            )
+        )
+    return item_paints
+
+
+def _render_tile(
+    image: QImage,
+    bits: int,
+    origin: QPoint,
+    tile_rect: QRect,
+    item_paints: List[ItemPaint],
+    serial_paint_lock: threading.Lock,
+    smooth: bool,
+):
+    # NOTE: each thread paints its own view of the rendered image, clipped to its tile.
+    # Items keep the coordinates they have in a serial render of the whole image, only offset by the origin
+    # of the painted part of it by whole pixels, so they are rasterized to the exact same pixels
+    view = QImage(
+        sip.voidptr(bits),
+        image.width(),
+        image.height(),
+        image.bytesPerLine(),
+        image.format(),
+    )
+    offset = QTransform.fromTranslate(-origin.x(), -origin.y())
+
+    painter = QPainter(view)
+    painter.setRenderHint(QPainter.RenderHint.SmoothPixmapTransform, smooth)
+    painter.setClipRect(tile_rect.translated(-origin))
+    for item_paint in item_paints:
+        if not item_paint.image_rect.intersects(tile_rect):
+            continue
+
+        option = QStyleOptionGraphicsItem()
+        option.state = item_paint.state
+        option.rect = item_paint.bounding_rect.toRect()
+        option.exposedRect = item_paint.bounding_rect
+        if item_paint.uses_extended_style_option:
+            option.exposedRect = (
+                item_paint.transform.inverted()[0]
+                .mapRect(QRectF(tile_rect))
+                .intersected(item_paint.bounding_rect)
+            )
+
+        painter.save()
+        painter.setWorldTransform(item_paint.transform * offset)
+        painter.setOpacity(item_paint.opacity)
+        if item_paint.is_concurrent:
+            item_paint.item.paint(painter, option, None)
+        else:
+            with serial_paint_lock:
+                item_paint.item.paint(painter, option, None)
+        painter.restore()
+    painter.end()
+
+
+def _render_tiles(
+    image: QImage,
+    origin: QPoint,
+    item_paints: List[ItemPaint],
+    tile_size: int,
+    max_workers: Optional[int],
+    smooth: bool,
+):
+    # NOTE: image holds the part of the rendered image starting at origin
+    # NOTE: detach the image once, before painting views of it from several threads
+    bits = int(image.bits())
+
+    image_rect = QRect(origin, image.size())
+    tile_rects = [
+        QRect(left, top, tile_size, tile_size).intersected(image_rect)
+        for top in range(image_rect.top(), image_rect.bottom() + 1, tile_size)
+        for left in range(image_rect.left(), image_rect.right() + 1, tile_size)
+    ]
+    render_tile = partial(
+        _render_tile,
+        image,
+        bits,
+        origin,
+        item_paints=item_paints,
+        serial_paint_lock=threading.Lock(),
+        smooth=smooth,
+    )
+    if len(tile_rects) == 1 or max_workers == 1:
+        for tile_rect in tile_rects:
+            render_tile(tile_rect)
+        return
+
+    executor: Executor = get_thread_pool()
+    if max_workers is not None:
+        executor = ThreadPoolExecutor(max_workers, thread_name_prefix="AIERender")
+    try:
+        futures = [executor.submit(render_tile, tile_rect) for tile_rect in tile_rects]
+        for future in futures:
+            future.result()
+    finally:
+        if max_workers is not None:
+            executor.shutdown()
+
+
+def _render_foreground(
+    image: QImage,
+    origin: QPoint,
+    scene: QGraphicsScene,
+    scene_transform: QTransform,
+    source: QRectF,
+):
+    # NOTE: the foreground is drawn over the items, as by QGraphicsScene.render (e.g. the selection box)
+    painter = QPainter(image)
+    painter.setClipRect(QRectF(image.rect()))
+    painter.setWorldTransform(
+        scene_transform * QTransform.fromTranslate(-origin.x(), -origin.y())
+    )
+    scene.drawForeground(painter, source)
+    painter.end()
+
+
+@contextmanager
+def _uncached_items(items: List[QGraphicsItem]):
+    # NOTE: QGraphicsScene.render would paint items from the rasters that views cache (see CACHE_MODE of items),
+    # which are composited slightly differently than the items painted directly, and drawn at another scale.
+    # Views cache the items again the next time they paint them.
+    cache_modes = [(item, item.cacheMode()) for item in items]
+    for item, cache_mode in cache_modes:
+        if cache_mode != QGraphicsItem.CacheMode.NoCache:
+            item.setCacheMode(QGraphicsItem.CacheMode.NoCache)
+    try:
+        yield
+    finally:
+        for item, cache_mode in cache_modes:
+            if cache_mode != QGraphicsItem.CacheMode.NoCache:
+                item.setCacheMode(cache_mode)
+
+
+def _get_scene_item_paints(scene: QGraphicsScene, source: QRectF, size: QSize):
+    items = scene.items(
+        source,
+        Qt.ItemSelectionMode.IntersectsItemBoundingRect,
+        Qt.SortOrder.AscendingOrder,
+    )
+    scene_transform = _get_scene_transform(size, source)
+    item_paints = _get_item_paints(items, scene_transform)
+    return scene_transform, item_paints, _can_render_in_tiles(scene, items, item_paints)
+
+
+def render_scene(
+    scene: QGraphicsScene,
+    image: QImage,
+    source: QRectF,
+    tile_size: int = DEFAULT_RENDER_TILE_SIZE,
+    max_workers: Optional[int] = None,
+    smooth: bool = False,
+):
+    """Render the source rect of a scene into a whole image, the same way as QGraphicsScene.render
+
+    Only items in the source rect are painted. With smooth, images are resampled smoothly if the source is scaled.
+    The image is split in tiles painted concurrently by up to max_workers threads (the shared thread pool by default).
+    Scenes using features painted by Qt only (e.g. graphics effects), or rendered scaled,
+    are rendered by QGraphicsScene.render.
+    """
+    scene_transform, item_paints, can_render_in_tiles = _get_scene_item_paints(
+        scene, source, image.size()
+    )
+    is_single_tile = image.width() <= tile_size and image.height() <= tile_size
+    if is_single_tile or max_workers == 1 or not can_render_in_tiles:
+        painter = QPainter(image)
+        painter.setRenderHint(QPainter.RenderHint.SmoothPixmapTransform, smooth)
+        with _uncached_items(scene.items(source)):
+            scene.render(painter, QRectF(), source)
+        # NOTE: End painter explicitly to fix "QPaintDevice: Cannot destroy paint device that is being painted"
+        painter.end()
+        return
+
+    _render_tiles(image, QPoint(), item_paints, tile_size, max_workers, smooth)
+    _render_foreground(image, QPoint(), scene, scene_transform, source)
+
+
+def iter_render_scene_strips(
+    scene: QGraphicsScene,
+    source: QRectF,
+    size: QSize,
+    strip_height: int = DEFAULT_RENDER_STRIP_HEIGHT,
+    tile_size: int = DEFAULT_RENDER_TILE_SIZE,
+    max_workers: Optional[int] = None,
+):
+    """Render the source rect of a scene into an image of the given size, and yield it strip by strip from the top
+
+    Strips are strip_height rows tall (except the last one) and only painted once the previous one is consumed,
+    so that images too large for memory can be written as they are rendered.
+    Strips have the same pixels as the image rendered by render_scene, except for thin strokes (e.g. of shape
+    layers, the selection box) crossing from a strip to the next: Qt clips lines to the image they are drawn in,
+    which moves the pixels of lines clipped to a strip, and rendering strips in an image of the whole size
+    would take as much memory as rendering the whole image.
+    Scenes that render_scene renders with QGraphicsScene.render are rendered whole, then yielded strip by strip.
+    """
+    scene_transform, item_paints, can_render_in_tiles = _get_scene_item_paints(
+        scene, source, size
+    )
+    if not can_render_in_tiles:
+        image = QImage(size, QImage.Format.Format_ARGB32_Premultiplied)
+        image.fill(Qt.GlobalColor.transparent)
+        render_scene(scene, image, source, tile_size, max_workers)
+        for top in range(0, size.height(), strip_height):
+            yield image.copy(
+                0, top, size.width(), min(strip_height, size.height() - top)
+            )
+        return
+
+    for top in range(0, size.height(), strip_height):
+        strip = QImage(
+            size.width(),
+            min(strip_height, size.height() - top),
+            QImage.Format.Format_ARGB32_Premultiplied,
+        )
+        strip.fill(Qt.GlobalColor.transparent)
+        origin = QPoint(0, top)
+        _render_tiles(strip, origin, item_paints, tile_size, max_workers, False)
+        _render_foreground(strip, origin, scene, scene_transform, source)
+        yield strip
@@ -0,0 +1,49 @@
+import os
+from collections import deque
+from concurrent.futures import Executor, Future, ThreadPoolExecutor
+from typing import Callable, Deque, Iterable, Iterator, Optional, TypeVar
+
+__all__ = ("get_thread_pool", "map_ordered")
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+_thread_pool: Optional[ThreadPoolExecutor] = None
+
+
+def get_thread_pool() -> Executor:
+    """Return the pool shared by work that releases the GIL, e.g. image encoding and decoding through Qt or zlib"""
+    global _thread_pool
+    if _thread_pool is None:
+        _thread_pool = ThreadPoolExecutor(
+            max_workers=os.cpu_count(), thread_name_prefix="AIEWorker"
+        )
+    return _thread_pool
+
+
+def map_ordered(
+    function: Callable[[T], R],
+    iterable: Iterable[T],
+    executor: Optional[Executor] = None,
+    max_pending: Optional[int] = None,
+) -> Iterator[R]:
+    """Like Executor.map, but with at most max_pending tasks in flight, so finished results do not pile up in memory"""
+    if executor is None:
+        executor = get_thread_pool()
+
+    if max_pending is None:
+        max_pending = 2 * (os.cpu_count() or 1)
+
+    pending: Deque[Future] = deque()
+    try:
+        for value in iterable:
+            pending.append(executor.submit(function, value))
+            if len(pending) >= max_pending:
+                yield pending.popleft().result()
+
+        while len(pending) > 0:
+            yield pending.popleft().result()
+    finally:
+        # NOTE: tasks that did not start are cancelled if the results are not all consumed
+        for future in pending:
+            future.cancel()
@@ -0,0 +1,41 @@
+"""Compare two benchmark results written by benchmarks.run
+
+Usage: python -m benchmarks.compare BASELINE.json RESULTS.json
+"""
+
+import json
+import sys
+from typing import List, Optional
+
+
+def main(argv: Optional[List[str]] = None):
+    argv = sys.argv[1:] if argv is None else argv
+    if len(argv) != 2:
+        print(__doc__.splitlines()[-1], file=sys.stderr)
+        return 2
+
+    with open(argv[0]) as file:
+        baseline = json.load(file)
+    with open(argv[1]) as file:
+        results = json.load(file)
+
+    print(f"baseline {baseline.get('commit')}  vs  {results.get('commit')}")
+    for case_name, case in results["cases"].items():
+        baseline_case = baseline["cases"].get(case_name)
+        if baseline_case is None:
+            continue
+
+        print(case_name)
+        for stage_name, stage in case["stages"].items():
+            baseline_stage = baseline_case["stages"].get(stage_name)
+            if baseline_stage is None:
+                continue
+            ratio = stage["seconds"] / max(baseline_stage["seconds"], 1e-9)
+            print(
+                f"  {stage_name:<20} {baseline_stage['seconds']:8.3f}s -> {stage['seconds']:8.3f}s  ({ratio:5.2f}x)"
+            )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,344 @@
+"""Synthetic projects and PSD files for benchmarks, generated locally"""
+
+import struct
+from types import SimpleNamespace
+from typing import List, Optional
+
+import numpy as np
+from PyQt6.QtCore import QPointF, Qt
+from PyQt6.QtGui import QColor, QImage, QPainter, QPainterPath
+from psd_tools.psd.engine_data import Float
+from psd_tools.psd.vector import ClosedKnotLinked, ClosedPath, OpenKnotLinked, OpenPath
+
+from awesome_image_editor.file_format import AIEProject
+from awesome_image_editor.model_view.items.group import AIEGroupItem
+from awesome_image_editor.model_view.items.image import AIEImageItem
+from awesome_image_editor.model_view.items.shape import AIEShapeItem
+from awesome_image_editor.model_view.items.text import AIETextItem
+from awesome_image_editor.psd_read.shape import PATH_CONTINUE, PATH_UNION
+
+
+def create_synthetic_image(width: int, height: int, seed: int):
+    """An image with some structure, so that compression is neither trivial nor hopeless"""
+    rng = np.random.default_rng(seed)
+    image = QImage(width, height, QImage.Format.Format_ARGB32_Premultiplied)
+    image.fill(Qt.GlobalColor.transparent)
+
+    painter = QPainter(image)
+    painter.setRenderHint(QPainter.RenderHint.Antialiasing, True)
+    for i in range(32):
+        color = QColor(*(int(value) for value in rng.integers(0, 256, 4)))
+        painter.setBrush(color)
+        painter.setPen(Qt.PenStyle.NoPen)
+        x, y = rng.integers(0, max(width, 1)), rng.integers(0, max(height, 1))
+        painter.drawEllipse(QPointF(x, y), width / 6, height / 6)
+    painter.end()
+
+    return image
+
+
+def create_synthetic_project(
+    num_layers: int,
+    layer_size: int,
+    num_groups: int = 0,
+    num_text_layers: int = 0,
+    num_shape_layers: int = 0,
+    num_unique_images: int = 0,
+):
+    """Create a project, with num_unique_images > 0 image layers repeat that many distinct images"""
+    project = AIEProject()
+    scene = project.get_graphics_scene()
+
+    groups = [AIEGroupItem(f"Group {i}") for i in range(num_groups)]
+
+    images = {}
+    for i in range(num_layers):
+        seed = i % num_unique_images if num_unique_images > 0 else i
+        if seed not in images:
+            images[seed] = create_synthetic_image(layer_size, layer_size, seed)
+        item = AIEImageItem(QImage(images[seed]), f"Layer {i}")
+        item.setPos((i * 37) % (layer_size + 1), (i * 53) % (layer_size + 1))
+        if len(groups) > 0:
+            item.setParentItem(groups[i % len(groups)])
+        else:
+            scene.addItem(item)
+
+    for group in groups:
+        scene.addItem(group)
+
+    for i in range(num_text_layers):
+        item = AIETextItem(f"Text layer {i} " * 4, f"Text {i}")
+        item.setPos(i * 11, i * 17)
+        scene.addItem(item)
+
+    for i in range(num_shape_layers):
+        path = QPainterPath()
+        path.moveTo(0, 0)
+        for k in range(64):
+            path.cubicTo(k * 3, k * 5, k * 7, k * 2, k * 4, k * 6)
+        item = AIEShapeItem(path, f"Shape {i}")
+        item.setPos(i * 13, i * 7)
+        scene.addItem(item)
+
+    return project
+
+
+def create_synthetic_shape_layer(num_subpaths: int, num_knots: int, seed: int):
+    """A stand-in for a psd_tools shape layer, with the vector mask read by psd_shape_layer_to_shape_item
+
+    Subpaths are small jagged rings spread over the canvas, every other one is open. They form a single
+    compound shape component, as they would in a PSD file. Coordinates are relative (y, x) pairs as in PSD files.
+    """
+    rng = np.random.default_rng(seed)
+    angles = np.linspace(0, 2 * np.pi, num_knots, endpoint=False)
+    directions = np.stack((np.sin(angles), np.cos(angles)), axis=1)
+    tangents = np.stack((np.cos(angles), -np.sin(angles)), axis=1)
+
+    subpaths = []
+    for i in range(num_subpaths):
+        center = 0.1 + rng.random(2) * 0.8
+        radii = 0.05 * (0.8 + 0.4 * rng.random((num_knots, 1)))
+        anchors = center + directions * radii
+        handles = tangents * (0.2 * radii * 2 * np.pi / num_knots)
+        control_points = np.stack((anchors - handles, anchors, anchors + handles), 1)
+
+        subpath_type, knot_type = (
+            (ClosedPath, ClosedKnotLinked) if i % 2 == 0 else (OpenPath, OpenKnotLinked)
+        )
+        knots = [
+            knot_type(*(tuple(point) for point in knot_points))
+            for knot_points in control_points.tolist()
+        ]
+        operation = PATH_UNION if i == 0 else PATH_CONTINUE
+        subpaths.append(subpath_type(items=knots, operation=operation))
+
+    return SimpleNamespace(
+        name=f"Shape {seed}",
+        visible=True,
+        offset=(0, 0),
+        vector_mask=SimpleNamespace(paths=subpaths),
+    )
+
+
+def create_synthetic_type_layer(
+    num_runs: int, num_paragraphs: int, num_formats: int, seed: int
+):
+    """A stand-in for a psd_tools type layer, with the engine data read by psd_type_layer_to_text_item
+
+    Style runs cycle through num_formats combinations of font, size and color.
+    """
+    rng = np.random.default_rng(seed)
+    paragraphs = [f"Paragraph {i} " * 8 + "\r" for i in range(num_paragraphs)]
+    text = "".join(paragraphs)
+
+    run_lengths = np.diff(np.linspace(0, len(text), num_runs + 1).astype(int)).tolist()
+    colors = rng.random((num_formats, 3)).tolist()
+    runs = [
+        {
+            "StyleSheet": {
+                "StyleSheetData": {
+                    "Font": i % num_formats % 2,
+                    "FontSize": Float(12.0 + i % num_formats),
+                    "FillColor": {"Type": 1, "Values": [1.0, *colors[i % num_formats]]},
+                }
+            }
+        }
+        for i in range(num_runs)
+    ]
+
+    return SimpleNamespace(
+        name=f"Text {seed}",
+        visible=True,
+        offset=(0, 0),
+        engine_dict={
+            "Editor": {"Text": SimpleNamespace(value=text)},
+            "StyleRun": {"RunLengthArray": run_lengths, "RunArray": runs},
+            "ParagraphRun": {
+                "RunArray": [
+                    {"ParagraphSheet": {"Properties": {"Justification": i % 2 * 2}}}
+                    for i in range(num_paragraphs)
+                ]
+            },
+        },
+        resource_dict={"FontSet": [{"Name": "Sans Serif"}, {"Name": "Serif"}]},
+    )
+
+
+PSD_COMPRESSION_RAW = 0
+PSD_COMPRESSION_RLE = 1
+
+# Layer record flags
+PSD_LAYER_FLAG_HIDDEN = 0x02
+
+
+class _PSDWriter:
+    """Writes big-endian PSD (version 1) or PSB (version 2) structures"""
+
+    def __init__(self, version: int):
+        self.version = version
+        self.data = bytearray()
+
+    def write(self, fmt: str, *values):
+        self.data += struct.pack(">" + fmt, *values)
+
+    def write_length(self, value: int):
+        # NOTE: some lengths are 8 bytes in PSB files
+        self.write("Q" if self.version == 2 else "I", value)
+
+
+def _create_synthetic_layer_channels(
+    width: int, height: int, seed: int, transparent: bool = False
+):
+    rng = np.random.default_rng(seed)
+    # Smooth gradients with noise, in planar R, G, B, A order
+    y, x = np.mgrid[0:height, 0:width]
+    if transparent:
+        alpha = ((x + y) * 255 // max(width + height - 2, 1)).astype(np.uint8)
+    else:
+        alpha = np.full((height, width), 255, np.uint8)
+    channels = [
+        ((x * (k + 1) + y * (3 - k)) % 256).astype(np.uint8) for k in range(3)
+    ] + [alpha]
+    noise = rng.integers(0, 16, (height, width), dtype=np.uint8)
+    return [channel ^ noise for channel in channels]
+
+
+def _encode_rle_channel(channel: np.ndarray, version: int):
+    """PackBits (RLE) encoding with literal packets only, valid for readers while fast to write with numpy"""
+    height, width = channel.shape
+    packets = []
+    for start in range(0, width, 128):
+        run = channel[:, start : start + 128]
+        packets.append(np.full((height, 1), run.shape[1] - 1, np.uint8))
+        packets.append(run)
+    rows = np.concatenate(packets, axis=1)
+    byte_counts = np.full(height, rows.shape[1], ">u4" if version == 2 else ">u2")
+    return byte_counts.tobytes() + rows.tobytes()
+
+
+def write_synthetic_psd(
+    filepath: str,
+    num_layers: int,
+    layer_size: int,
+    num_groups: int = 0,
+    width: Optional[int] = None,
+    height: Optional[int] = None,
+    version: int = 1,
+    compression: int = PSD_COMPRESSION_RAW,
+    num_hidden_layers: int = 0,
+    transparent: bool = False,
+):
+    """Write an RGB 8-bit PSD (or PSB with version=2) of pixel layers, optionally in groups
+
+    The first num_hidden_layers layers are hidden, layers and the merged image fade out from their top left corner
+    if transparent.
+    """
+    width = width or layer_size * 2
+    height = height or layer_size * 2
+
+    # (name, top, left, channels, section divider type, flags), ordered bottom to top as in the file
+    records: List[tuple] = []
+    layers_per_group = [[] for i in range(max(num_groups, 1))]
+    for i in range(num_layers):
+        top = (i * 53) % max(height - layer_size, 1)
+        left = (i * 37) % max(width - layer_size, 1)
+        channels = _create_synthetic_layer_channels(
+            layer_size, layer_size, seed=i, transparent=transparent
+        )
+        layers_per_group[i % len(layers_per_group)].append(
+            (
+                f"Layer {i}",
+                top,
+                left,
+                channels,
+                None,
+                PSD_LAYER_FLAG_HIDDEN if i < num_hidden_layers else 0,
+            )
+        )
+
+    for group_index, layers in enumerate(layers_per_group):
+        if num_groups > 0:
+            # Groups are closed by a divider record placed below their children
+            records.append(("</Layer group>", 0, 0, None, 3, 0))
+        records.extend(reversed(layers))
+        if num_groups > 0:
+            records.append((f"Group {group_index}", 0, 0, None, 1, 0))
+
+    writer = _PSDWriter(version)
+    writer.data += b"8BPS"
+    writer.write("H6sHIIHH", version, b"", 4, height, width, 8, 3)
+    writer.write("I", 0)  # Color mode data
+    writer.write("I", 0)  # Image resources
+
+    layer_info = _PSDWriter(version)
+    layer_info.write(
+        "h", -len(records)
+    )  # Negative: first alpha channel is the merged image transparency
+    channel_data = _PSDWriter(version)
+
+    for name, top, left, channels, divider_type, flags in records:
+        if channels is None:
+            bottom, right = top, left
+            channels = [np.zeros((0, 0), np.uint8)] * 4
+        else:
+            bottom, right = top + channels[0].shape[0], left + channels[0].shape[1]
+
+        layer_info.write("iiiiH", top, left, bottom, right, 4)
+        for channel_id, channel in zip((0, 1, 2, -1), channels):
+            if compression == PSD_COMPRESSION_RLE and channel.size > 0:
+                data = _encode_rle_channel(channel, version)
+                channel_compression = PSD_COMPRESSION_RLE
+            else:
+                data = channel.tobytes()
+                channel_compression = PSD_COMPRESSION_RAW
+            layer_info.write("h", channel_id)
+            layer_info.write_length(2 + len(data))
+            channel_data.write("H", channel_compression)
+            channel_data.data += data
+
+        layer_info.data += b"8BIMnorm"
+        layer_info.write("BBBB", 255, 0, flags, 0)
+
+        extra_data = _PSDWriter(version)
+        extra_data.write("I", 0)  # Layer mask data
+        extra_data.write("I", 0)  # Layer blending ranges
+        encoded_name = name.encode("latin-1")[:255]
+        pascal_name = bytes([len(encoded_name)]) + encoded_name
+        extra_data.data += pascal_name + bytes(-len(pascal_name) % 4)
+        if divider_type is not None:
+            extra_data.data += b"8BIMlsct"
+            extra_data.write("II", 4, divider_type)
+        layer_info.write("I", len(extra_data.data))
+        layer_info.data += extra_data.data
+
+    layer_info.data += channel_data.data
+    layer_info.data += bytes(-len(layer_info.data) % 4)
+
+    layer_and_mask = _PSDWriter(version)
+    layer_and_mask.write_length(len(layer_info.data))
+    layer_and_mask.data += layer_info.data
+    layer_and_mask.write("I", 0)  # Global layer mask info
+
+    writer.write_length(len(layer_and_mask.data))
+    writer.data += layer_and_mask.data
+
+    writer.write("H", 0)
+    if transparent:
+        # Merged image data, matted with white as Photoshop does for transparent images
+        *colors, alpha = _create_synthetic_layer_channels(
+            width, height, seed=num_layers, transparent=True
+        )
+        alpha = alpha.astype(np.int32)
+        for color in colors:
+            writer.data += (
+                (color * alpha // 255 + 255 - alpha).astype(np.uint8).tobytes()
+            )
+        writer.data += alpha.astype(np.uint8).tobytes()
+    else:
+        # Merged image data, a flat mid gray
+        writer.data += bytes([128]) * (width * height * 3) + bytes([255]) * (
+            width * height
+        )
+
+    with open(filepath, "wb") as file:
+        file.write(writer.data)
@@ -0,0 +1,549 @@
+"""Benchmark project I/O, PSD import and rendering on synthetic inputs, without a display or network
+
+Usage: python -m benchmarks.run [--quick] [--case NAME]... [--repeat N] [--output results.json]
+
+Each case runs in a fresh process so that its memory use is not inflated by previous cases,
+and the peak RSS of each stage is recorded (per stage on Linux, cumulative elsewhere).
+"""
+
+import argparse
+import gc
+import json
+import multiprocessing
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from typing import Dict, List, NamedTuple, Optional
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+_app = None
+
+# Memory kept for decoded layers by streamed PSD imports, see _run_psd_case
+STREAM_MEMORY_BUDGET = 64 * 1024 * 1024
+
+
+class BenchmarkCase(NamedTuple):
+    name: str
+    # "project" (.aie save/load/render), "psd" (PSD import/render),
+    # "shapes" or "text" (PSD shape or type layer import),
+    # "scene" (adding layers to a project shown in its layers view),
+    # "view" (panning the graphics view of a project)
+    kind: str
+    num_layers: int
+    layer_size: int
+    num_groups: int = 0
+    num_text_layers: int = 0
+    num_shape_layers: int = 0
+    # Image layers repeat this many distinct images, 0 for all distinct
+    num_unique_images: int = 0
+    # PSD channel compression, see benchmarks.fixtures
+    psd_compression: int = 0
+    # Hidden PSD layers, which lazy imports do not decode
+    num_hidden_layers: int = 0
+    # 1 for PSD, 2 for PSB
+    psd_version: int = 1
+    # Vector mask of each shape layer ("shapes" cases)
+    num_subpaths: int = 0
+    num_knots: int = 0
+    # Style runs of each type layer ("text" cases)
+    num_text_runs: int = 0
+
+
+CASES = (
+    BenchmarkCase("project-many-small", "project", 200, 128),
+    BenchmarkCase("project-few-large", "project", 4, 2048),
+    BenchmarkCase("project-tiled", "project", 1, 4096),
+    BenchmarkCase("project-mixed", "project", 40, 512, 4, 20, 20),
+    BenchmarkCase("project-duplicates", "project", 100, 512, num_unique_images=4),
+    BenchmarkCase("psd-many-small", "psd", 200, 128),
+    BenchmarkCase("psd-few-large", "psd", 4, 2048),
+    BenchmarkCase("psd-groups", "psd", 60, 256, 6),
+    BenchmarkCase("psd-rle", "psd", 64, 512, 4, psd_compression=1),
+    BenchmarkCase("psd-hidden", "psd", 64, 512, 4, num_hidden_layers=48),
+    BenchmarkCase("psb-large", "psd", 8, 4096, psd_compression=1, psd_version=2),
+    BenchmarkCase(
+        "psd-shapes",
+        "shapes",
+        0,
+        4096,
+        num_shape_layers=20,
+        num_subpaths=50,
+        num_knots=500,
+    ),
+    BenchmarkCase("psd-text", "text", 0, 0, num_text_layers=40, num_text_runs=1000),
+    BenchmarkCase("scene-many-layers", "scene", 5000, 4),
+    BenchmarkCase("view-text-shapes", "view", 0, 0, 0, 200, 200),
+    BenchmarkCase("view-large-images", "view", 8, 4096),
+)
+
+QUICK_CASES = (
+    BenchmarkCase("project-many-small", "project", 20, 64),
+    BenchmarkCase("project-few-large", "project", 2, 512),
+    BenchmarkCase("project-mixed", "project", 8, 128, 2, 4, 4),
+    BenchmarkCase("project-duplicates", "project", 20, 128, num_unique_images=2),
+    BenchmarkCase("psd-many-small", "psd", 20, 64),
+    BenchmarkCase("psd-groups", "psd", 12, 64, 3),
+    BenchmarkCase("psd-rle", "psd", 16, 256, 2, psd_compression=1),
+    BenchmarkCase("psd-hidden", "psd", 16, 256, 2, num_hidden_layers=12),
+    BenchmarkCase("psb-large", "psd", 8, 1024, psd_compression=1, psd_version=2),
+    BenchmarkCase(
+        "psd-shapes",
+        "shapes",
+        0,
+        1024,
+        num_shape_layers=10,
+        num_subpaths=10,
+        num_knots=200,
+    ),
+    BenchmarkCase("psd-text", "text", 0, 0, num_text_layers=10, num_text_runs=200),
+    BenchmarkCase("scene-many-layers", "scene", 500, 4),
+    BenchmarkCase("view-text-shapes", "view", 0, 0, 0, 40, 40),
+    BenchmarkCase("view-large-images", "view", 4, 1024),
+)
+
+# Repaints of the graphics view while panning, see _run_view_case
+NUM_PAN_FRAMES = 60
+
+
+def _read_proc_status_mb(field: str) -> Optional[float]:
+    try:
+        with open("/proc/self/status") as file:
+            for line in file:
+                if line.startswith(field + ":"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+def reset_peak_rss():
+    """Reset the peak RSS of this process to its current RSS, only supported on Linux"""
+    try:
+        with open("/proc/self/clear_refs", "w") as file:
+            file.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def get_rss_mb() -> Optional[float]:
+    return _read_proc_status_mb("VmRSS")
+
+
+def _get_rusage_peak_rss_mb(who: int) -> Optional[float]:
+    if resource is None:
+        return None
+    peak_rss = resource.getrusage(who).ru_maxrss
+    # NOTE: bytes on macOS, kilobytes elsewhere
+    return peak_rss / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+
+def get_peak_rss_mb() -> Optional[float]:
+    peak_rss = _read_proc_status_mb("VmHWM")
+    if peak_rss is None and resource is not None:
+        peak_rss = _get_rusage_peak_rss_mb(resource.RUSAGE_SELF)
+    return peak_rss
+
+
+class StageRecorder:
+    def __init__(self):
+        self.stages: Dict[str, dict] = {}
+
+    @contextmanager
+    def stage(self, name: str):
+        # NOTE: without a reset (e.g. not on Linux), the peak is the peak of the whole process so far
+        is_peak_reset = reset_peak_rss()
+        start_rss = get_rss_mb()
+        start_time = time.perf_counter()
+        yield
+        stage = self.stages[name] = {
+            "seconds": time.perf_counter() - start_time,
+            "peak_rss_mb": get_peak_rss_mb(),
+        }
+        if is_peak_reset and start_rss is not None:
+            # Memory used by the stage on top of what was already in use
+            stage["peak_rss_increase_mb"] = stage["peak_rss_mb"] - start_rss
+
+        # Largest (terminated) worker process, e.g. PSD layer decoding processes
+        if resource is not None:
+            children_peak_rss = _get_rusage_peak_rss_mb(resource.RUSAGE_CHILDREN)
+            if children_peak_rss:
+                stage["children_peak_rss_mb"] = children_peak_rss
+
+
+def _init_worker():
+    global _app
+
+    # NOTE: Qt must be imported after the platform is selected
+    os.environ["QT_QPA_PLATFORM"] = "offscreen"
+    from PyQt6.QtWidgets import QApplication
+
+    if QApplication.instance() is None:
+        _app = QApplication([sys.argv[0]])
+
+
+def _run_project_case(case: BenchmarkCase, recorder: StageRecorder, temp_dir: str):
+    from awesome_image_editor.file_format import AIEProject, ImageEncoding
+
+    from .fixtures import create_synthetic_project
+
+    with recorder.stage("create"):
+        project = create_synthetic_project(
+            case.num_layers,
+            case.layer_size,
+            case.num_groups,
+            case.num_text_layers,
+            case.num_shape_layers,
+            case.num_unique_images,
+        )
+
+    for encoding in (ImageEncoding.PNG, ImageEncoding.RAW):
+        filepath = os.path.join(temp_dir, f"{encoding.name.lower()}.aie")
+        with recorder.stage(f"serialize-{encoding.name.lower()}"):
+            with open(filepath, "wb") as file:
+                project.serialize(file, encoding)
+        recorder.stages[f"serialize-{encoding.name.lower()}"]["bytes"] = (
+            os.path.getsize(filepath)
+        )
+
+    with recorder.stage("render"):
+        project.render()
+    # Without tiles rendered concurrently
+    with recorder.stage("render-serial"):
+        project.render(max_workers=1)
+    with recorder.stage("render-preview"):
+        project.render(max_size=512)
+    # Rendered and written strip by strip
+    export_path = os.path.join(temp_dir, "export.png")
+    with recorder.stage("export-png"):
+        project.export_png(export_path)
+    recorder.stages["export-png"]["bytes"] = os.path.getsize(export_path)
+
+    for lazy in (False, True):
+        stage_name = f"deserialize-{'lazy' if lazy else 'eager'}"
+        with recorder.stage(stage_name):
+            with open(os.path.join(temp_dir, "png.aie"), "rb") as file:
+                loaded_project = AIEProject.deserialize(file, lazy=lazy)
+
+    with recorder.stage("render-loaded"):
+        loaded_project.render()
+
+
+def _run_psd_case(case: BenchmarkCase, recorder: StageRecorder, temp_dir: str):
+    from awesome_image_editor.psd_read import load_psd_as_project
+    from awesome_image_editor.psd_read.cache import (
+        PSDLayerCache,
+        set_psd_layer_cache,
+    )
+    from awesome_image_editor.psd_read.pixel import (
+        decode_psd_composite,
+        decode_psd_pixel_layer,
+        iter_psd_pixel_layers,
+    )
+    from psd_tools import PSDImage
+
+    from .fixtures import write_synthetic_psd
+
+    filepath = os.path.join(temp_dir, "synthetic.psd")
+    with recorder.stage("write-fixture"):
+        write_synthetic_psd(
+            filepath,
+            case.num_layers,
+            case.layer_size,
+            case.num_groups,
+            version=case.psd_version,
+            compression=case.psd_compression,
+            num_hidden_layers=case.num_hidden_layers,
+        )
+    recorder.stages["write-fixture"]["bytes"] = os.path.getsize(filepath)
+
+    # Parsing and pixel decoding on their own, decoded layers are kept as they would be by an import
+    with recorder.stage("open-psd"):
+        psd = PSDImage.open(filepath)
+    # What is shown first when importing in the background
+    with recorder.stage("decode-composite"):
+        composite = decode_psd_composite(psd)
+    del composite
+    with recorder.stage("decode-layers"):
+        images = [decode_psd_pixel_layer(layer) for layer in iter_psd_pixel_layers(psd)]
+    del psd, images
+
+    # NOTE: a cache of its own, so that results do not depend on what was imported before
+    set_psd_layer_cache(PSDLayerCache(os.path.join(temp_dir, "layer-cache")))
+    with recorder.stage("load-psd"):
+        project = load_psd_as_project(filepath, use_layer_cache=True)
+    del project
+    with recorder.stage("load-psd-cached"):
+        project = load_psd_as_project(filepath, use_layer_cache=True)
+
+    with recorder.stage("render"):
+        project.render()
+    del project
+
+    # Lazy import, the first render decodes the visible layers
+    with recorder.stage("load-psd-lazy"):
+        project = load_psd_as_project(filepath, lazy=True)
+    with recorder.stage("render-lazy"):
+        project.render()
+    del project
+
+    # Streamed import, layers are decoded as they are rendered and do not all stay in memory
+    with recorder.stage("load-psd-streamed"):
+        project = load_psd_as_project(
+            filepath, stream=True, memory_budget=STREAM_MEMORY_BUDGET
+        )
+    with recorder.stage("render-streamed"):
+        project.render()
+
+
+def _run_shapes_case(case: BenchmarkCase, recorder: StageRecorder):
+    from awesome_image_editor.file_format import AIEProject
+    from awesome_image_editor.psd_read.shape import psd_shape_layer_to_shape_item
+
+    from .fixtures import create_synthetic_shape_layer
+
+    with recorder.stage("create"):
+        layers = [
+            create_synthetic_shape_layer(case.num_subpaths, case.num_knots, seed=i)
+            for i in range(case.num_shape_layers)
+        ]
+
+    # The PSD canvas is layer_size pixels wide and high
+    with recorder.stage("import-shapes"):
+        items = [
+            psd_shape_layer_to_shape_item(layer, case.layer_size, case.layer_size)
+            for layer in layers
+        ]
+
+    # NOTE: not rendered, stroking paths takes much longer than importing them and does not depend on it
+    project = AIEProject()
+    with recorder.stage("add-to-scene"):
+        for item in items:
+            project.get_graphics_scene().addItem(item)
+
+
+def _run_text_case(case: BenchmarkCase, recorder: StageRecorder):
+    from awesome_image_editor.psd_read.text import (
+        TextFormatCache,
+        psd_type_layer_to_text_item,
+    )
+
+    from .fixtures import create_synthetic_type_layer
+
+    with recorder.stage("create"):
+        layers = [
+            create_synthetic_type_layer(case.num_text_runs, 20, 8, seed=i)
+            for i in range(case.num_text_layers)
+        ]
+
+    with recorder.stage("import-text"):
+        text_formats = TextFormatCache()
+        items = [psd_type_layer_to_text_item(layer, text_formats) for layer in layers]
+    del items
+
+
+def _run_scene_case(case: BenchmarkCase, recorder: StageRecorder):
+    from PyQt6.QtGui import QImage
+    from PyQt6.QtWidgets import QApplication
+
+    from awesome_image_editor.file_format import AIEProject
+    from awesome_image_editor.model_view.items.image import AIEImageItem
+
+    image = QImage(
+        case.layer_size, case.layer_size, QImage.Format.Format_ARGB32_Premultiplied
+    )
+    image.fill(0)
+
+    for stage_name, is_batched in (("add-items", False), ("insert-items", True)):
+        project = AIEProject()
+        project.get_layers_widget().show()
+        with recorder.stage(stage_name):
+            scene = project.get_graphics_scene()
+            items = (AIEImageItem(image, f"Layer {i}") for i in range(case.num_layers))
+            if is_batched:
+                with scene.inserting_items():
+                    for item in items:
+                        scene.addItem(item)
+            else:
+                for item in items:
+                    scene.addItem(item)
+            # NOTE: the layers view is laid out when events are processed
+            QApplication.processEvents()
+        # NOTE: a project left alive (it is kept by reference cycles) slows down the layout of the next one
+        project.get_layers_widget().hide()
+        del project, scene, items
+        gc.collect()
+
+
+def _run_view_case(case: BenchmarkCase, recorder: StageRecorder):
+    from PyQt6.QtWidgets import QApplication, QGraphicsItem
+
+    from awesome_image_editor.model_view.graphics_view import (
+        DEFAULT_ITEM_CACHE_BUDGET,
+        set_item_cache_budget,
+    )
+
+    from .fixtures import create_synthetic_project
+
+    set_item_cache_budget(DEFAULT_ITEM_CACHE_BUDGET)
+    project = create_synthetic_project(
+        case.num_layers,
+        case.layer_size,
+        case.num_groups,
+        case.num_text_layers,
+        case.num_shape_layers,
+    )
+    view = project.get_graphics_view()
+    view.resize(1024, 768)
+    view.show()
+    # NOTE: the view is only painted once it is exposed
+    QApplication.processEvents()
+
+    def pan():
+        for i in range(NUM_PAN_FRAMES):
+            view.horizontalScrollBar().setValue(i * 7)
+            view.verticalScrollBar().setValue(i * 5)
+            view.viewport().repaint()
+
+    # Text and shape layers are cached by default (see CACHE_MODE of items)
+    with recorder.stage("pan-cached"):
+        pan()
+    for item in project.get_graphics_scene().items():
+        item.setCacheMode(QGraphicsItem.CacheMode.NoCache)
+    with recorder.stage("pan-uncached"):
+        pan()
+    # Image layers are painted from their mip levels (see AIEImageItem._get_mip_level)
+    view.scale(1 / 16, 1 / 16)
+    with recorder.stage("pan-zoomed-out"):
+        pan()
+    view.hide()
+
+
+def run_case(case: BenchmarkCase):
+    _init_worker()
+    recorder = StageRecorder()
+    with tempfile.TemporaryDirectory(prefix="aie-benchmark-") as temp_dir:
+        if case.kind == "project":
+            _run_project_case(case, recorder, temp_dir)
+        elif case.kind == "shapes":
+            _run_shapes_case(case, recorder)
+        elif case.kind == "text":
+            _run_text_case(case, recorder)
+        elif case.kind == "scene":
+            _run_scene_case(case, recorder)
+        elif case.kind == "view":
+            _run_view_case(case, recorder)
+        else:
+            _run_psd_case(case, recorder, temp_dir)
+    return recorder.stages
+
+
+def run_case_in_new_process(case: BenchmarkCase):
+    # NOTE: spawn instead of fork, Qt does not support being used across a fork
+    with ProcessPoolExecutor(
+        1, mp_context=multiprocessing.get_context("spawn")
+    ) as executor:
+        return executor.submit(run_case, case).result()
+
+
+def merge_repeats(repeats: List[Dict[str, dict]]):
+    """Keep the fastest time and the largest memory use of each stage over repeated runs"""
+    stages = {}
+    for stage_name in repeats[0]:
+        results = [repeat[stage_name] for repeat in repeats]
+        stage = stages[stage_name] = dict(results[0])
+        stage["seconds"] = min(result["seconds"] for result in results)
+        for key, value in stage.items():
+            if key.endswith("_mb") and value is not None:
+                stage[key] = max(result[key] for result in results)
+    return stages
+
+
+def get_git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def parse_args(argv: List[str]):
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks.run", description=__doc__.splitlines()[0]
+    )
+    parser.add_argument(
+        "--quick", action="store_true", help="run smaller cases, e.g. for CI"
+    )
+    parser.add_argument(
+        "--case",
+        action="append",
+        dest="cases",
+        metavar="NAME",
+        help="only run the named case (can be repeated)",
+    )
+    parser.add_argument(
+        "--repeat",
+        type=int,
+        default=1,
+        help="number of runs of each case, the fastest is kept",
+    )
+    parser.add_argument("-o", "--output", help="write JSON results to this file")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None):
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+
+    cases = QUICK_CASES if args.quick else CASES
+    if args.cases:
+        unknown_cases = set(args.cases) - {case.name for case in cases}
+        if unknown_cases:
+            print(f"Unknown cases: {', '.join(sorted(unknown_cases))}", file=sys.stderr)
+            return 1
+        cases = [case for case in cases if case.name in args.cases]
+
+    results = {
+        "commit": get_git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "quick": args.quick,
+        "cases": {},
+    }
+    for case in cases:
+        stages = merge_repeats(
+            [run_case_in_new_process(case) for i in range(max(1, args.repeat))]
+        )
+        results["cases"][case.name] = {"parameters": case._asdict(), "stages": stages}
+
+        print(case.name)
+        for stage_name, stage in stages.items():
+            memory = ""
+            if stage["peak_rss_mb"] is not None:
+                memory = f"peak {stage['peak_rss_mb']:8.1f} MB"
+            if "peak_rss_increase_mb" in stage:
+                memory += f" (+{stage['peak_rss_increase_mb']:.1f} MB)"
+            print(f"  {stage_name:<20} {stage['seconds']:8.3f}s  {memory}")
+
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
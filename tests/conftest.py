@@ -0,0 +1,17 @@
+import os
+
+import pytest
+
+# NOTE: set before Qt is imported, so tests run without a display
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PyQt6.QtWidgets import QApplication  # noqa: E402
+
+
+@pytest.fixture(scope="session", autouse=True)
+def qapp():
+    # NOTE: projects own widgets, which require an application
+    app = QApplication.instance()
+    if app is None:
+        app = QApplication([])
+    yield app
@@ -0,0 +1,67 @@
+import os
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from awesome_image_editor import cli
+from awesome_image_editor.cli import get_output_paths, main
+from awesome_image_editor.file_format import ImageEncoding
+
+from .test_file_format import create_image, create_project
+
+
+def test_output_paths_of_same_name_inputs():
+    input_paths = [
+        "a/cover.aie",
+        "b/cover.aie",
+        "cover.psd",
+        "Cover.PSD",
+        "poster.aie",
+        "a/cover_aie.aie",
+    ]
+
+    output_paths = get_output_paths(input_paths, "out", "png")
+
+    assert [os.path.basename(path) for path in output_paths] == [
+        "cover_aie.png",
+        "cover_aie_2.png",
+        "cover_psd.png",
+        "Cover_PSD_2.png",
+        "poster.png",
+        "cover_aie_3.png",
+    ]
+
+
+def test_render_same_name_inputs(tmp_path):
+    input_paths = []
+    for i in range(2):
+        os.makedirs(tmp_path / str(i))
+        input_path = str(tmp_path / str(i) / "project.aie")
+        create_project([create_image(16, 8 + i, i)]).save(input_path, ImageEncoding.RAW)
+        input_paths.append(input_path)
+    output_dir = tmp_path / "out"
+
+    assert main([*input_paths, "--output-dir", str(output_dir), "--jobs", "1"]) == 0
+
+    assert len(os.listdir(output_dir)) == 2
+
+
+class BrokenProcessPoolExecutor(ThreadPoolExecutor):
+    """Fails every file, like a process pool whose worker died"""
+
+    def __init__(self, max_workers, mp_context, initializer):
+        super().__init__(max_workers)
+
+    def submit(self, function, *args, **kwargs):
+        future = Future()
+        future.set_exception(BrokenProcessPool("A worker process died"))
+        return future
+
+
+def test_render_files_reports_crashed_workers(tmp_path, monkeypatch):
+    monkeypatch.setattr(cli, "ProcessPoolExecutor", BrokenProcessPoolExecutor)
+    input_paths = [str(tmp_path / "a.aie"), str(tmp_path / "b.aie")]
+
+    results = list(cli.render_files(input_paths, str(tmp_path), "png", 2))
+
+    assert sorted(result.input_path for result in results) == input_paths
+    assert all("BrokenProcessPool" in result.error for result in results)
@@ -0,0 +1,478 @@
+import io
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from PyQt6.QtCore import Qt
+from PyQt6.QtGui import QColor, QImage, QPainter
+
+from awesome_image_editor.binary_io.read import BinaryReader
+from awesome_image_editor.binary_io.write import (
+    write_float_le,
+    write_pascal_string,
+    write_uint32_le,
+    write_uint64_le,
+    write_unicode_string,
+)
+from awesome_image_editor.file_format import (
+    FORMAT_VERSION,
+    IMAGE_CHUNK_TYPE,
+    IMAGE_DIGEST_SIZE,
+    INDEX_CHUNK_TYPE,
+    INDEX_ENTRY_RECORD,
+    INDEX_FOOTER_MAGIC,
+    INDEX_FOOTER_SIZE,
+    LAYERS_CHUNK_TYPE,
+    MAGIC_BYTES,
+    RAW_IMAGE_FORMAT,
+    VERSION_CHUNK_TYPE,
+    AIEProject,
+    ImageEncoding,
+    decode_image_payload,
+    encode_image_payload,
+    read_project_header,
+    write_chunk,
+)
+from awesome_image_editor.model_view.items.image import AIEImageItem
+
+
+def create_image(width: int, height: int, seed: int):
+    """An opaque image with a pattern depending on seed, and a fully transparent corner
+
+    NOTE: other transparent pixels would not survive PNG encoding exactly, as PNG pixels are not premultiplied
+    """
+    image = QImage(width, height, RAW_IMAGE_FORMAT)
+    image.fill(QColor((seed * 67) % 256, (seed * 131) % 256, (seed * 29) % 256))
+    painter = QPainter(image)
+    painter.setPen(QColor(255 - seed % 256, seed % 256, 128))
+    for x in range(0, width + height, 5 + seed % 7):
+        painter.drawLine(x, 0, x - height, height)
+    painter.setCompositionMode(QPainter.CompositionMode.CompositionMode_Source)
+    painter.fillRect(0, 0, width // 4, height // 4, Qt.GlobalColor.transparent)
+    painter.end()
+    return image
+
+
+def assert_images_equal(image: QImage, expected: QImage):
+    assert image.convertedTo(RAW_IMAGE_FORMAT) == expected.convertedTo(RAW_IMAGE_FORMAT)
+
+
+def create_project(images):
+    project = AIEProject()
+    for i, image in enumerate(images):
+        project.add_image_layer(image, f"Layer {i}")
+    for i, item in enumerate(get_image_items(project)):
+        item.setPos(i * 10.5, -i * 3)
+    return project
+
+
+def get_image_items(project: AIEProject):
+    # NOTE: in the order layers are saved, back to front
+    return [
+        item
+        for item in project.get_graphics_scene().items(Qt.SortOrder.AscendingOrder)
+        if isinstance(item, AIEImageItem)
+    ]
+
+
+def assert_projects_equal(project: AIEProject, expected: AIEProject):
+    items = get_image_items(project)
+    expected_items = get_image_items(expected)
+    assert len(items) == len(expected_items)
+    for item, expected_item in zip(items, expected_items):
+        assert item.name == expected_item.name
+        assert item.pos() == expected_item.pos()
+        assert_images_equal(item.image, expected_item.image)
+
+
+@pytest.mark.parametrize("encoding", list(ImageEncoding))
+def test_parallel_serialize_is_deterministic(encoding: ImageEncoding):
+    # NOTE: some layers have the same pixels, only the first of them is encoded
+    project = create_project(
+        [create_image(90 + 10 * (i % 5), 70, i % 5) for i in range(12)]
+    )
+
+    outputs = []
+    for max_workers in (1, 8):
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            writer = io.BytesIO()
+            project.serialize(writer, encoding, executor=executor)
+        outputs.append(writer.getvalue())
+
+    assert outputs[0] == outputs[1]
+
+
+@pytest.mark.parametrize("encoding", list(ImageEncoding))
+def test_chunk_encodings_round_trip(encoding: ImageEncoding):
+    # NOTE: not a multiple of the tile size, so tiled images have partial tiles
+    image = create_image(300, 70, 1)
+
+    chunk_type, payload = encode_image_payload(image, encoding)
+    decoded = decode_image_payload(
+        chunk_type, b"".join(bytes(part) for part in payload)
+    )
+
+    assert_images_equal(decoded, image)
+
+
+@pytest.mark.parametrize("encoding", list(ImageEncoding))
+@pytest.mark.parametrize("lazy", [False, True])
+def test_project_round_trip(tmp_path, encoding: ImageEncoding, lazy: bool):
+    # NOTE: the last layer has the same pixels as the first one, and shares its chunk
+    project = create_project(
+        [create_image(40, 30, 1), create_image(17, 9, 2), create_image(40, 30, 1)]
+    )
+    filepath = str(tmp_path / "project.aie")
+    project.save(filepath, encoding)
+
+    loaded = AIEProject.load(filepath, lazy=lazy)
+
+    assert_projects_equal(loaded, project)
+
+
+@pytest.mark.parametrize("lazy", [False, True])
+def test_deserialize_in_memory_project(lazy: bool):
+    project = create_project([create_image(40, 30, 1), create_image(17, 9, 2)])
+    writer = io.BytesIO()
+    project.serialize(writer, ImageEncoding.RAW)
+
+    loaded = AIEProject.deserialize(io.BytesIO(writer.getvalue()), lazy=lazy)
+
+    assert loaded.get_filepath() is None
+    assert_projects_equal(loaded, project)
+
+
+def write_version_0_project(writer, layers):
+    """Write layers (name, x, y, image) the way version 0 projects were written"""
+    writer.write(MAGIC_BYTES)
+    write_pascal_string(LAYERS_CHUNK_TYPE, writer)
+    write_uint32_le(len(layers), writer)
+    for name, x, y, image in layers:
+        chunk_type, (png_data,) = encode_image_payload(image, ImageEncoding.PNG)
+        write_pascal_string(IMAGE_CHUNK_TYPE, writer)
+        write_unicode_string(name, writer)
+        write_float_le(x, writer)
+        write_float_le(y, writer)
+        write_uint32_le(len(png_data), writer)
+        writer.write(png_data)
+
+
+def write_version_1_project(writer, layers):
+    """Write layers (name, x, y, image) the way version 1 projects were written, without digests in the index"""
+    writer.write(MAGIC_BYTES)
+    write_pascal_string(VERSION_CHUNK_TYPE, writer)
+    write_uint32_le(1, writer)
+
+    entries = []
+    for name, x, y, image in layers:
+        chunk_type, payload = encode_image_payload(image, ImageEncoding.RAW)
+        offset, length = write_chunk(chunk_type, payload, writer)
+        entries.append((chunk_type, name, x, y, image, offset, length))
+
+    index_offset = writer.tell()
+    write_pascal_string(INDEX_CHUNK_TYPE, writer)
+    write_uint32_le(len(entries), writer)
+    for chunk_type, name, x, y, image, offset, length in entries:
+        write_pascal_string(chunk_type, writer)
+        write_unicode_string(name, writer)
+        writer.write(
+            INDEX_ENTRY_RECORD.pack(x, y, image.width(), image.height(), offset, length)
+        )
+    write_uint64_le(index_offset, writer)
+    writer.write(INDEX_FOOTER_MAGIC)
+
+
+LEGACY_LAYERS = [
+    ("Background", 0.0, 0.0, create_image(40, 30, 3)),
+    ("Top", 12.5, -4.0, create_image(8, 20, 4)),
+]
+
+
+@pytest.mark.parametrize(
+    "write_project", [write_version_0_project, write_version_1_project]
+)
+def test_load_legacy_versions(tmp_path, write_project):
+    filepath = str(tmp_path / "legacy.aie")
+    with open(filepath, "wb") as file:
+        write_project(file, LEGACY_LAYERS)
+
+    loaded = AIEProject.load(filepath)
+
+    items = get_image_items(loaded)
+    assert [item.name for item in items] == [layer[0] for layer in LEGACY_LAYERS]
+    for item, (name, x, y, image) in zip(items, LEGACY_LAYERS):
+        assert (item.pos().x(), item.pos().y()) == (x, y)
+        assert_images_equal(item.image, image)
+
+
+def test_save_rewrites_legacy_version(tmp_path):
+    filepath = str(tmp_path / "legacy.aie")
+    with open(filepath, "wb") as file:
+        write_version_1_project(file, LEGACY_LAYERS)
+    project = AIEProject.load(filepath)
+
+    project.save(filepath, ImageEncoding.RAW)
+
+    with open(filepath, "rb") as file:
+        assert read_project_header(BinaryReader(file.read())) == FORMAT_VERSION
+    assert_projects_equal(AIEProject.load(filepath), project)
+
+
+def test_identical_layers_are_stored_once(tmp_path):
+    image = create_image(64, 64, 1)
+    project = create_project([image, create_image(16, 16, 2), QImage(image)])
+    filepath = str(tmp_path / "project.aie")
+    project.save(filepath, ImageEncoding.RAW)
+
+    assert os.path.getsize(filepath) < 2 * image.sizeInBytes()
+    entries = list(project._saved_entries.values())
+    assert entries[0].offset == entries[2].offset
+    assert entries[0].digest == entries[2].digest != entries[1].digest
+    assert_projects_equal(AIEProject.load(filepath), project)
+
+
+def save_project(tmp_path):
+    filepath = str(tmp_path / "project.aie")
+    create_project([create_image(32, 32, 1), create_image(8, 8, 2)]).save(
+        filepath, ImageEncoding.RAW
+    )
+    with open(filepath, "rb") as file:
+        return filepath, bytearray(file.read())
+
+
+def test_reject_truncated_footer(tmp_path):
+    filepath, data = save_project(tmp_path)
+    with open(filepath, "wb") as file:
+        file.write(data[:-3])
+
+    with pytest.raises(ValueError):
+        AIEProject.load(filepath)
+
+
+@pytest.mark.parametrize("index_offset", [0, 5, 2**40])
+def test_reject_corrupt_footer(tmp_path, index_offset: int):
+    filepath, data = save_project(tmp_path)
+    data[-INDEX_FOOTER_SIZE : -len(INDEX_FOOTER_MAGIC)] = index_offset.to_bytes(
+        8, "little"
+    )
+    with open(filepath, "wb") as file:
+        file.write(data)
+
+    with pytest.raises(ValueError):
+        AIEProject.load(filepath)
+
+
+def test_reject_layer_out_of_file(tmp_path):
+    filepath, data = save_project(tmp_path)
+    # NOTE: the file ends with the length of the last layer, its digest, then the footer
+    length_offset = len(data) - INDEX_FOOTER_SIZE - (4 + IMAGE_DIGEST_SIZE) - 8
+    data[length_offset : length_offset + 8] = (2**40).to_bytes(8, "little")
+    with open(filepath, "wb") as file:
+        file.write(data)
+
+    with pytest.raises(ValueError):
+        AIEProject.load(filepath)
+
+
+def test_tiled_layer_round_trip(tmp_path):
+    image = create_image(600, 300, 7)
+    project = create_project([image])
+    filepath = str(tmp_path / "project.aie")
+    project.save(filepath, ImageEncoding.TILED)
+
+    loaded = AIEProject.load(filepath)
+
+    # NOTE: tiled layers only decode the tiles they paint, until their whole image is accessed
+    assert not get_image_items(loaded)[0].is_image_loaded()
+    assert_projects_equal(loaded, project)
+
+
+def test_incremental_save(tmp_path):
+    project = create_project([create_image(64, 64, i) for i in range(4)])
+    filepath = str(tmp_path / "project.aie")
+    project.save(filepath, ImageEncoding.RAW)
+    with open(filepath, "rb") as file:
+        saved_data = file.read()
+
+    # A small change appends the changed layer and a new index, the rest of the file is left as is
+    items = get_image_items(project)
+    items[1].image = create_image(64, 64, 10)
+    items[2].setPos(100, 200)
+    items[3].name = "Renamed"
+    project.save(filepath, ImageEncoding.RAW)
+
+    with open(filepath, "rb") as file:
+        data = file.read()
+    assert (
+        data[: len(saved_data) - INDEX_FOOTER_SIZE] == saved_data[:-INDEX_FOOTER_SIZE]
+    )
+    assert len(data) < 2 * len(saved_data)
+    assert_projects_equal(AIEProject.load(filepath), project)
+    assert_projects_equal(AIEProject.load(filepath, lazy=False), project)
+
+
+def test_incremental_save_of_loaded_project(tmp_path):
+    filepath = str(tmp_path / "project.aie")
+    create_project([create_image(64, 64, i) for i in range(3)]).save(
+        filepath, ImageEncoding.RAW
+    )
+    project = AIEProject.load(filepath)
+    file_size = os.path.getsize(filepath)
+
+    project.add_image_layer(create_image(16, 16, 5), "New layer")
+    project.save(filepath, ImageEncoding.RAW)
+
+    assert os.path.getsize(filepath) > file_size
+    assert_projects_equal(AIEProject.load(filepath), project)
+
+
+def test_compaction(tmp_path):
+    project = create_project([create_image(64, 64, 1), create_image(16, 16, 2)])
+    filepath = str(tmp_path / "project.aie")
+    project.save(filepath, ImageEncoding.RAW)
+    compact_size = os.path.getsize(filepath)
+
+    # Each save appends the large layer again, until unreferenced chunks make up most of the file
+    item = get_image_items(project)[0]
+    item.image = create_image(64, 64, 3)
+    project.save(filepath, ImageEncoding.RAW)
+    assert os.path.getsize(filepath) > compact_size
+    item.image = create_image(64, 64, 4)
+    project.save(filepath, ImageEncoding.RAW)
+
+    assert os.path.getsize(filepath) == compact_size
+    assert_projects_equal(AIEProject.load(filepath), project)
+
+
+def test_non_incremental_save(tmp_path):
+    project = create_project([create_image(64, 64, 1)])
+    filepath = str(tmp_path / "project.aie")
+    project.save(filepath, ImageEncoding.RAW)
+    file_size = os.path.getsize(filepath)
+
+    get_image_items(project)[0].image = create_image(64, 64, 2)
+    project.save(filepath, ImageEncoding.RAW, incremental=False)
+
+    assert os.path.getsize(filepath) == file_size
+    assert_projects_equal(AIEProject.load(filepath), project)
+
+
+def test_save_with_other_encoding_rewrites_file(tmp_path, monkeypatch):
+    project = create_project([create_image(64, 64, i) for i in range(3)])
+    filepath = str(tmp_path / "project.aie")
+    project.save(filepath, ImageEncoding.PNG)
+
+    # NOTE: no chunk can be reused, appending all layers then compacting would write them twice
+    def fail_to_append(*args, **kwargs):
+        raise AssertionError("Appended to the project file")
+
+    monkeypatch.setattr(AIEProject, "_append_to_saved_file", fail_to_append)
+    project.save(filepath, ImageEncoding.RAW)
+
+    writer = io.BytesIO()
+    project.serialize(writer, ImageEncoding.RAW)
+    assert os.path.getsize(filepath) == len(writer.getvalue())
+    assert_projects_equal(AIEProject.load(filepath), project)
+
+
+@pytest.mark.parametrize("lazy", [False, True])
+def test_full_save_unmaps_previous_file(tmp_path, monkeypatch, lazy: bool):
+    # NOTE: raw images and tiles read their pixels straight from the mapped file, the last layer is tiled
+    filepath = str(tmp_path / "project.aie")
+    create_project(
+        [create_image(64, 64, 1), create_image(64, 64, 1), create_image(4096, 2, 2)]
+    ).save(filepath, ImageEncoding.RAW)
+    project = AIEProject.load(filepath, lazy=lazy)
+    previous_mapping = project._file_mapping
+    project.render()
+
+    # Like Windows, refuse to replace a file that is still mapped
+    replace = os.replace
+
+    def replace_unmapped(source, destination):
+        with pytest.raises(ValueError):
+            previous_mapping[:1]
+        replace(source, destination)
+
+    monkeypatch.setattr(os, "replace", replace_unmapped)
+    project.save(filepath, ImageEncoding.RAW, incremental=False)
+
+    assert [item.is_image_loaded() for item in get_image_items(project)] == [
+        not lazy,
+        not lazy,
+        False,
+    ]
+    assert_projects_equal(project, AIEProject.load(filepath))
+
+
+def test_failed_incremental_save_keeps_previous_index(tmp_path, monkeypatch):
+    filepath = str(tmp_path / "project.aie")
+    create_project([create_image(64, 64, i) for i in range(3)]).save(
+        filepath, ImageEncoding.RAW
+    )
+    project = AIEProject.load(filepath)
+    saved_project = AIEProject.load(filepath)
+
+    def fail_to_encode(*args, **kwargs):
+        raise RuntimeError("Encoding failed")
+
+    items = get_image_items(project)
+    items[0].image = create_image(64, 64, 10)
+    items[1].image = create_image(64, 64, 11)
+    with monkeypatch.context() as context:
+        context.setattr(
+            "awesome_image_editor.file_format.encode_image_payload", fail_to_encode
+        )
+        with pytest.raises(RuntimeError):
+            project.save(filepath, ImageEncoding.RAW)
+
+    # NOTE: layers of projects loaded from the file still read it, it was only appended to
+    assert_projects_equal(AIEProject.load(filepath), saved_project)
+    file_size = os.path.getsize(filepath)
+
+    project.save(filepath, ImageEncoding.RAW)
+
+    assert os.path.getsize(filepath) > file_size
+    assert_projects_equal(AIEProject.load(filepath), project)
+
+
+def test_compaction_with_shared_chunks(tmp_path):
+    # NOTE: the small layers share a chunk, which only takes up space in the file once
+    project = create_project(
+        [create_image(32, 32, 1) for i in range(10)] + [create_image(64, 64, 2)]
+    )
+    filepath = str(tmp_path / "project.aie")
+    project.save(filepath, ImageEncoding.RAW)
+    compact_size = os.path.getsize(filepath)
+
+    item = get_image_items(project)[-1]
+    item.image = create_image(64, 64, 3)
+    project.save(filepath, ImageEncoding.RAW)
+    assert os.path.getsize(filepath) > compact_size
+    item.image = create_image(64, 64, 4)
+    project.save(filepath, ImageEncoding.RAW)
+
+    assert os.path.getsize(filepath) == compact_size
+    assert_projects_equal(AIEProject.load(filepath), project)
+
+
+def test_save_after_removing_layer(tmp_path):
+    project = create_project([create_image(64, 64, i) for i in range(3)])
+    filepath = str(tmp_path / "project.aie")
+    project.save(filepath, ImageEncoding.RAW)
+    file_size = os.path.getsize(filepath)
+
+    scene = project.get_graphics_scene()
+    removed_item = get_image_items(project)[1]
+    scene.removeItem(removed_item)
+    project.save(filepath, ImageEncoding.RAW)
+
+    assert removed_item not in project._saved_entries
+    assert_projects_equal(AIEProject.load(filepath), project)
+
+    # The pixels of removed layers are still reused while their chunk is in the file
+    project.add_image_layer(create_image(64, 64, 1), "Layer 1")
+    project.save(filepath, ImageEncoding.RAW)
+
+    assert os.path.getsize(filepath) - file_size < 64 * 64
+    assert_projects_equal(AIEProject.load(filepath), project)
@@ -0,0 +1,19 @@
+from PyQt6.QtGui import QPixmapCache
+
+from awesome_image_editor.model_view.graphics_view import (
+    DEFAULT_ITEM_CACHE_BUDGET,
+    set_item_cache_budget,
+)
+
+
+def test_set_item_cache_budget():
+    cache_limit = QPixmapCache.cacheLimit()
+    try:
+        set_item_cache_budget(DEFAULT_ITEM_CACHE_BUDGET)
+        # NOTE: the limit of QPixmapCache is in kilobytes
+        assert QPixmapCache.cacheLimit() * 1024 == DEFAULT_ITEM_CACHE_BUDGET
+
+        set_item_cache_budget(3 * 1024 * 1024 + 100)
+        assert QPixmapCache.cacheLimit() == 3 * 1024
+    finally:
+        QPixmapCache.setCacheLimit(cache_limit)
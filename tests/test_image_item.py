@@ -0,0 +1,146 @@
+import pytest
+from PyQt6.QtCore import QSize, Qt
+from PyQt6.QtGui import QImage, QPainter
+from PyQt6.QtWidgets import QStyleOptionGraphicsItem
+
+from awesome_image_editor.lru_cache import LRUCache
+from awesome_image_editor.model_view.items.image import THUMBNAIL_SIZE, AIEImageItem
+
+from .test_file_format import assert_images_equal, create_image
+
+
+class CountingLoader:
+    def __init__(self, image: QImage):
+        self.image = image
+        self.num_loads = 0
+
+    def __call__(self):
+        self.num_loads += 1
+        return self.image.copy()
+
+
+def test_lazy_item_does_not_keep_its_image():
+    image = create_image(64, 32, 1)
+    loader = CountingLoader(image)
+    image_cache = LRUCache(image.sizeInBytes(), lambda image: image.sizeInBytes())
+    item = AIEImageItem.create_lazy(image.size(), "Layer", loader, image_cache)
+
+    assert_images_equal(item.image, image)
+    assert_images_equal(item.image, image)
+    assert loader.num_loads == 1
+    assert not item.is_image_loaded()
+
+    # Once evicted, the image is loaded again
+    image_cache.put("other", QImage(image))
+    assert_images_equal(item.image, image)
+    assert loader.num_loads == 2
+
+    # Set images are kept by the item
+    edited_image = create_image(64, 32, 2)
+    item.image = edited_image
+    image_cache.clear()
+    assert item.is_image_loaded()
+    assert_images_equal(item.image, edited_image)
+    assert loader.num_loads == 2
+
+
+def test_lazy_item_mip_levels_are_cached():
+    image = create_image(512, 512, 3)
+    loader = CountingLoader(image)
+    image_cache = LRUCache(2 * image.sizeInBytes(), lambda image: image.sizeInBytes())
+    item = AIEImageItem.create_lazy(QSize(512, 512), "Layer", loader, image_cache)
+
+    target = QImage(64, 64, QImage.Format.Format_ARGB32_Premultiplied)
+    painter = QPainter(target)
+    painter.scale(1 / 8, 1 / 8)
+    item.paint(painter, QStyleOptionGraphicsItem())
+    painter.end()
+    assert loader.num_loads == 1
+
+    # The scaled down levels are enough to paint the item again, without the image
+    image_cache.discard(loader)
+    painter = QPainter(target)
+    painter.scale(1 / 8, 1 / 8)
+    item.paint(painter, QStyleOptionGraphicsItem())
+    painter.end()
+    assert loader.num_loads == 1
+
+
+def test_lazy_item_keeps_its_thumbnail():
+    image = create_image(128, 64, 4)
+    loader = CountingLoader(image)
+    image_cache = LRUCache(image.sizeInBytes(), lambda image: image.sizeInBytes())
+    item = AIEImageItem.create_lazy(image.size(), "Layer", loader, image_cache)
+
+    thumbnail = item.get_thumbnail()
+    image_cache.clear()
+
+    assert item.get_thumbnail() is thumbnail
+    assert item.get_cached_thumbnail() is thumbnail
+    assert loader.num_loads == 1
+
+    # The thumbnail is made again once an image is set
+    item.image = create_image(128, 64, 5)
+    assert item.get_cached_thumbnail() is None
+    assert item.get_thumbnail() is not thumbnail
+
+
+@pytest.mark.parametrize(
+    "level_of_detail, expected_size",
+    [
+        (2.0, QSize(512, 128)),
+        (1.0, QSize(512, 128)),
+        (0.5, QSize(256, 64)),
+        # Levels are at least as detailed as painted
+        (0.3, QSize(256, 64)),
+        (0.25, QSize(128, 32)),
+        # Images are not scaled down past MIN_MIP_LEVEL_SIZE pixels
+        (0.001, QSize(64, 16)),
+    ],
+)
+def test_mip_levels(level_of_detail: float, expected_size: QSize):
+    image = create_image(512, 128, 6)
+    item = AIEImageItem(image, "Layer")
+
+    mip_level = item._get_mip_level(level_of_detail)
+
+    assert mip_level.size() == expected_size
+    if level_of_detail >= 1:
+        assert mip_level is item.image
+    assert item._get_mip_level(level_of_detail) is mip_level
+
+
+def paint_item(item: AIEImageItem, level_of_detail: float):
+    target = QImage(64, 64, QImage.Format.Format_ARGB32_Premultiplied)
+    painter = QPainter(target)
+    painter.scale(level_of_detail, level_of_detail)
+    item.paint(painter, QStyleOptionGraphicsItem())
+    painter.end()
+
+
+@pytest.mark.parametrize(
+    "size, level_of_detail, is_thumbnail_painted",
+    [
+        # The 32x16 thumbnail is as detailed as the layer painted at 1/16
+        (QSize(512, 256), 1 / 16, True),
+        (QSize(512, 256), 1 / 8, False),
+        # Thumbnails of layers that fit in them are scaled up
+        (QSize(16, 16), 1 / 16, False),
+        (QSize(32, 8), 1 / 16, False),
+    ],
+)
+def test_lazy_item_paints_its_thumbnail_when_small_enough(
+    size: QSize, level_of_detail: float, is_thumbnail_painted: bool
+):
+    image = create_image(size.width(), size.height(), 7)
+    loader = CountingLoader(image)
+    image_cache = LRUCache(image.sizeInBytes(), lambda image: image.sizeInBytes())
+    item = AIEImageItem.create_lazy(size, "Layer", loader, image_cache)
+    assert item.get_thumbnail().size() == size.scaled(
+        THUMBNAIL_SIZE, Qt.AspectRatioMode.KeepAspectRatio
+    )
+    image_cache.clear()
+
+    paint_item(item, level_of_detail)
+
+    assert loader.num_loads == (1 if is_thumbnail_painted else 2)
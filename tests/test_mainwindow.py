@@ -0,0 +1,55 @@
+from PyQt6.QtCore import QCoreApplication, QEvent
+from PyQt6.QtWidgets import QProgressDialog
+
+from awesome_image_editor.file_format import ImageEncoding
+from awesome_image_editor.mainwindow import MainWindow
+from awesome_image_editor.psd_read.loader import AIEPSDLoader
+from benchmarks.fixtures import write_synthetic_psd
+
+from .test_file_format import create_image, create_project
+
+
+def test_close_stops_project_loader(tmp_path):
+    filepath = str(tmp_path / "project.aie")
+    create_project([create_image(64, 64, i) for i in range(20)]).save(
+        filepath, ImageEncoding.RAW
+    )
+    window = MainWindow()
+
+    window.load_project(filepath)
+    loader = window._project_loader
+    window.close()
+
+    assert loader.is_cancelled()
+    assert loader.isFinished()
+
+
+def test_close_stops_psd_loader(tmp_path):
+    filepath = str(tmp_path / "layers.psd")
+    write_synthetic_psd(filepath, 20, 32)
+    window = MainWindow()
+
+    window._start_loader(AIEPSDLoader(filepath), "Importing PSD...")
+    loader = window._project_loader
+    window.close()
+
+    assert loader.is_cancelled()
+    assert loader.isFinished()
+
+
+def test_finished_loaders_delete_their_progress_dialog(tmp_path):
+    filepath = str(tmp_path / "project.aie")
+    create_project([create_image(64, 64, i) for i in range(20)]).save(
+        filepath, ImageEncoding.RAW
+    )
+    window = MainWindow()
+
+    # NOTE: loading a project cancels the previous loader
+    window.load_project(filepath)
+    window.load_project(filepath)
+    window._project_loader.wait()
+    QCoreApplication.sendPostedEvents()
+    QCoreApplication.sendPostedEvents(None, QEvent.Type.DeferredDelete)
+
+    assert window.findChildren(QProgressDialog) == []
+    window.close()
@@ -0,0 +1,31 @@
+from PyQt6.QtCore import QCoreApplication
+
+from awesome_image_editor.file_format import ImageEncoding
+from awesome_image_editor.project_loader import AIEProjectLoader
+
+from .test_file_format import (
+    assert_projects_equal,
+    create_image,
+    create_project,
+    get_image_items,
+)
+
+
+def test_project_loader_creates_lazy_layers(tmp_path):
+    filepath = str(tmp_path / "project.aie")
+    project = create_project([create_image(64, 48, i) for i in range(5)])
+    project.save(filepath, ImageEncoding.PNG)
+    loader = AIEProjectLoader(filepath)
+    progress = []
+    loader.progressChanged.connect(lambda *args: progress.append(args))
+
+    loader.start()
+    loader.wait()
+    # NOTE: layers are added by queued signals, delivered by the event loop of the main thread
+    QCoreApplication.sendPostedEvents()
+
+    loaded = loader.get_project()
+    assert progress[-1] == (5, 5)
+    assert not any(item.is_image_loaded() for item in get_image_items(loaded))
+    assert_projects_equal(loaded, project)
+    assert loaded.get_filepath() == filepath
@@ -0,0 +1,125 @@
+import os
+import shutil
+
+import pytest
+
+from awesome_image_editor import psd_read
+from awesome_image_editor.psd_read import cache, load_psd_as_project
+from awesome_image_editor.psd_read.cache import (
+    PSDLayerCache,
+    get_psd_layer_cache,
+    set_psd_layer_cache,
+)
+from benchmarks.fixtures import write_synthetic_psd
+
+from .test_file_format import assert_images_equal, create_image
+
+
+@pytest.fixture
+def layer_cache(tmp_path, monkeypatch):
+    # NOTE: the cache is global, it is restored after each test
+    monkeypatch.setattr(cache, "_psd_layer_cache", None)
+    monkeypatch.setattr(cache, "_is_psd_layer_cache_set", False)
+    layer_cache = PSDLayerCache(str(tmp_path / "cache"))
+    set_psd_layer_cache(layer_cache)
+    return layer_cache
+
+
+def list_entries(layer_cache: PSDLayerCache):
+    return sorted(path.name for path in layer_cache.get_directory().glob("*.aie"))
+
+
+def fail_decode(*args, **kwargs):
+    raise AssertionError("cached layers should not be decoded")
+
+
+def test_load_psd_maps_cached_layers(tmp_path, layer_cache, monkeypatch):
+    filepath = str(tmp_path / "layers.psd")
+    write_synthetic_psd(filepath, 4, 16)
+
+    image = load_psd_as_project(filepath, max_workers=1, use_layer_cache=True).render()
+    assert len(list_entries(layer_cache)) == 1
+
+    monkeypatch.setattr(psd_read, "decode_psd_pixel_layers", fail_decode)
+    cached_image = load_psd_as_project(
+        filepath, max_workers=1, use_layer_cache=True
+    ).render()
+
+    assert_images_equal(cached_image, image)
+
+
+def test_layer_cache_is_opt_in(tmp_path, layer_cache):
+    filepath = str(tmp_path / "layers.psd")
+    write_synthetic_psd(filepath, 2, 16)
+
+    load_psd_as_project(filepath, max_workers=1)
+
+    assert get_psd_layer_cache() is layer_cache
+    assert list_entries(layer_cache) == []
+
+
+def test_key_identifies_file_content_and_path(tmp_path, layer_cache):
+    filepath = str(tmp_path / "layers.psd")
+    write_synthetic_psd(filepath, 2, 16)
+    key = layer_cache.get_key(filepath)
+
+    assert layer_cache.get_key(filepath) == key
+
+    copy_path = str(tmp_path / "copy.psd")
+    shutil.copy2(filepath, copy_path)
+    assert layer_cache.get_key(copy_path) != key
+
+    stat = os.stat(filepath)
+    os.utime(filepath, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1000))
+    assert layer_cache.get_key(filepath) != key
+
+    # Same size and modification time, different content
+    with open(filepath, "r+b") as file:
+        file.seek(-1, os.SEEK_END)
+        value = file.read(1)[0]
+        file.seek(-1, os.SEEK_END)
+        file.write(bytes([value ^ 0xFF]))
+    os.utime(filepath, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    assert os.path.getsize(filepath) == stat.st_size
+    assert layer_cache.get_key(filepath) != key
+
+
+def test_load_misses_other_number_of_layers(layer_cache):
+    images = [create_image(16, 8, 0), None]
+    for _ in layer_cache.store("key", images):
+        pass
+
+    assert layer_cache.load("missing", 2) is None
+    assert layer_cache.load("key", 3) is None
+    cached_images = layer_cache.load("key", 2)
+    assert_images_equal(cached_images[0], images[0])
+    assert cached_images[1] is None
+
+
+def test_store_adds_entry_once_all_images_are_written(layer_cache):
+    images = layer_cache.store("key", [create_image(16, 8, i) for i in range(2)])
+    next(images)
+    images.close()
+
+    assert list_entries(layer_cache) == []
+    assert list(layer_cache.get_directory().iterdir()) == []
+
+
+def test_evict_least_recently_used_entries(tmp_path):
+    layer_cache = PSDLayerCache(str(tmp_path / "cache"))
+    for i in range(3):
+        for _ in layer_cache.store(str(i), [create_image(32, 32, i)]):
+            pass
+    entry_size = os.path.getsize(layer_cache.get_directory() / "0.aie")
+    layer_cache = PSDLayerCache(layer_cache.get_directory(), max_size=2 * entry_size)
+    for i, key in enumerate(("1", "0", "2")):
+        os.utime(layer_cache.get_directory() / f"{key}.aie", ns=(i, i))
+    # Loading an entry marks it as recently used
+    assert layer_cache.load("1", 1) is not None
+
+    layer_cache.evict()
+
+    assert list_entries(layer_cache) == ["1.aie", "2.aie"]
+
+    layer_cache.clear()
+    assert list_entries(layer_cache) == []
@@ -0,0 +1,29 @@
+from PyQt6.QtCore import QCoreApplication
+
+from awesome_image_editor.psd_read.loader import AIEPSDLoader
+from benchmarks.fixtures import write_synthetic_psd
+
+from .test_file_format import assert_images_equal, get_image_items
+
+
+def load_psd(loader: AIEPSDLoader):
+    progress = []
+    loader.progressChanged.connect(lambda *args: progress.append(args))
+    loader.start()
+    loader.wait()
+    # NOTE: layers are added by queued signals, delivered by the event loop of the main thread
+    QCoreApplication.sendPostedEvents()
+    return loader.get_project(), progress
+
+
+def test_lazy_psd_loader_renders_like_eager_loader(tmp_path):
+    filepath = str(tmp_path / "layers.psd")
+    write_synthetic_psd(filepath, 6, 32, num_groups=2, num_hidden_layers=2)
+
+    eager, eager_progress = load_psd(AIEPSDLoader(filepath, max_workers=1))
+    lazy, lazy_progress = load_psd(AIEPSDLoader(filepath, max_workers=1, lazy=True))
+
+    assert eager_progress[-1] == lazy_progress[-1] == (6, 6)
+    assert len(get_image_items(lazy)) == len(get_image_items(eager)) == 6
+    assert not any(item.is_image_loaded() for item in get_image_items(lazy))
+    assert_images_equal(lazy.render(), eager.render())
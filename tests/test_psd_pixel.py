@@ -0,0 +1,75 @@
+import numpy as np
+import pytest
+from PIL import Image
+from PyQt6.QtGui import QImage
+from psd_tools import PSDImage
+
+from awesome_image_editor.psd_read import pixel
+from awesome_image_editor.psd_read.pixel import (
+    decode_psd_composite,
+    decode_psd_pixel_layers,
+    iter_psd_pixel_layers,
+)
+from benchmarks.fixtures import (
+    PSD_COMPRESSION_RAW,
+    PSD_COMPRESSION_RLE,
+    write_synthetic_psd,
+)
+
+from .test_file_format import assert_images_equal
+
+
+def pil_image_to_qimage(pil_image: Image.Image):
+    pil_image = pil_image.convert("RGBA")
+    width, height = pil_image.size
+    return QImage(
+        pil_image.tobytes(), width, height, width * 4, QImage.Format.Format_RGBA8888
+    ).copy()
+
+
+@pytest.mark.parametrize("compression", [PSD_COMPRESSION_RAW, PSD_COMPRESSION_RLE])
+def test_parallel_decode_matches_topil(tmp_path, monkeypatch, compression: int):
+    filepath = str(tmp_path / "layers.psd")
+    write_synthetic_psd(filepath, 6, 40, compression=compression, transparent=True)
+    layers = list(iter_psd_pixel_layers(PSDImage.open(filepath)))
+    # NOTE: small files are decoded in-process otherwise
+    monkeypatch.setattr(pixel, "PARALLEL_DECODE_MIN_PIXELS", 0)
+
+    images = list(decode_psd_pixel_layers(layers, max_workers=2))
+    executor = pixel._decode_process_pool
+
+    assert executor is not None
+    assert len(images) == len(layers)
+    for layer, image in zip(layers, images):
+        assert_images_equal(image, pil_image_to_qimage(layer.topil()))
+
+    # Later imports reuse the worker processes
+    list(decode_psd_pixel_layers(layers, max_workers=2))
+    assert pixel._decode_process_pool is executor
+
+
+def get_premultiplied_pixels(image: QImage):
+    """RGBA pixels of an image, premultiplied"""
+    image = image.convertedTo(QImage.Format.Format_RGBA8888_Premultiplied)
+    bits = image.constBits()
+    bits.setsize(image.sizeInBytes())
+    pixels = np.frombuffer(bits, np.uint8).reshape(image.height(), -1)
+    # NOTE: copied, the pixels are freed with the converted image
+    return (
+        pixels[:, : image.width() * 4].reshape(image.height(), image.width(), 4).copy()
+    )
+
+
+def test_decode_composite_matches_psd_tools(tmp_path):
+    filepath = str(tmp_path / "composite.psd")
+    write_synthetic_psd(filepath, 2, 16, width=48, height=40, transparent=True)
+    psd = PSDImage.open(filepath)
+
+    pixels = get_premultiplied_pixels(decode_psd_composite(psd))
+
+    # NOTE: psd_tools removes the white matte into unpremultiplied colors, in floating point
+    expected = psd.numpy()
+    expected[:, :, :3] *= expected[:, :, 3:]
+    expected = np.rint(expected * 255).astype(np.uint8)
+    assert expected[:, :, 3].min() < 255
+    assert np.array_equal(pixels, expected)
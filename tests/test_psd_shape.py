@@ -0,0 +1,114 @@
+from types import SimpleNamespace
+
+import pytest
+from psd_tools.psd.vector import ClosedKnotLinked, ClosedPath
+from PyQt6.QtCore import QPointF, Qt
+from PyQt6.QtGui import QPainterPath
+
+from awesome_image_editor.psd_read.shape import (
+    PATH_CONTINUE,
+    PATH_EXCLUDE,
+    PATH_INTERSECT,
+    PATH_SUBTRACT,
+    PATH_UNION,
+    psd_shape_layer_to_shape_item,
+)
+from benchmarks.fixtures import create_synthetic_shape_layer
+
+PSD_WIDTH = 200
+PSD_HEIGHT = 100
+
+
+def create_path_with_calls(subpaths):
+    """Build the path of subpaths knot by knot, as the path of each subpath is described by psd_tools"""
+    path = QPainterPath()
+    path.setFillRule(Qt.FillRule.OddEvenFill)
+
+    def to_point(y, x):
+        return QPointF(x * PSD_WIDTH, y * PSD_HEIGHT)
+
+    for subpath in subpaths:
+        path.moveTo(to_point(*subpath[0].anchor))
+        knots = list(subpath) + ([subpath[0]] if subpath.is_closed() else [])
+        for knot, next_knot in zip(knots, knots[1:]):
+            path.cubicTo(
+                to_point(*knot.leaving),
+                to_point(*next_knot.preceding),
+                to_point(*next_knot.anchor),
+            )
+    return path
+
+
+def get_elements(path: QPainterPath):
+    return [
+        (element.type, element.x, element.y)
+        for element in map(path.elementAt, range(path.elementCount()))
+    ]
+
+
+def test_shape_path_matches_path_calls():
+    # NOTE: a single compound component, every other subpath is open
+    layer = create_synthetic_shape_layer(5, 7, seed=0)
+
+    path = psd_shape_layer_to_shape_item(layer, PSD_WIDTH, PSD_HEIGHT).path
+
+    expected = create_path_with_calls(layer.vector_mask.paths)
+    assert path.fillRule() == expected.fillRule()
+    assert get_elements(path) == pytest.approx(get_elements(expected))
+
+
+def create_rect_subpath(left, top, right, bottom, operation):
+    """A closed subpath of straight lines around a rect, in relative coordinates"""
+    corners = [(top, left), (top, right), (bottom, right), (bottom, left)]
+    knots = [ClosedKnotLinked(corner, corner, corner) for corner in corners]
+    return ClosedPath(items=knots, operation=operation)
+
+
+def create_two_rects_path(first_operation, second_operation):
+    layer = SimpleNamespace(
+        name="Shape",
+        visible=True,
+        vector_mask=SimpleNamespace(
+            paths=[
+                create_rect_subpath(0.1, 0.1, 0.5, 0.5, first_operation),
+                create_rect_subpath(0.3, 0.3, 0.7, 0.7, second_operation),
+            ]
+        ),
+    )
+    return psd_shape_layer_to_shape_item(layer, PSD_WIDTH, PSD_HEIGHT).path
+
+
+# Points in the first rect only, in both rects, in the second rect only, and in neither
+POINTS = [QPointF(40, 20), QPointF(80, 40), QPointF(120, 60), QPointF(180, 90)]
+
+
+@pytest.mark.parametrize(
+    "first_operation, second_operation, expected",
+    [
+        (PATH_UNION, PATH_UNION, [True, True, True, False]),
+        (PATH_UNION, PATH_SUBTRACT, [True, False, False, False]),
+        (PATH_UNION, PATH_INTERSECT, [False, True, False, False]),
+        (PATH_UNION, PATH_EXCLUDE, [True, False, True, False]),
+        # Subpaths of the same component are filled with the even-odd rule
+        (PATH_UNION, PATH_CONTINUE, [True, False, True, False]),
+        # The first component subtracts from the whole canvas
+        (PATH_SUBTRACT, PATH_UNION, [False, True, True, True]),
+    ],
+)
+def test_shape_path_operations(first_operation, second_operation, expected):
+    path = create_two_rects_path(first_operation, second_operation)
+
+    assert [path.contains(point) for point in POINTS] == expected
+
+
+def test_disjoint_components_keep_their_curves():
+    layer = create_synthetic_shape_layer(2, 16, seed=0)
+    first, second = layer.vector_mask.paths
+    second.operation = PATH_UNION
+    expected = create_path_with_calls([first, second])
+    first_rect = create_path_with_calls([first]).boundingRect()
+    assert not first_rect.intersects(create_path_with_calls([second]).boundingRect())
+
+    path = psd_shape_layer_to_shape_item(layer, PSD_WIDTH, PSD_HEIGHT).path
+
+    assert get_elements(path) == pytest.approx(get_elements(expected))
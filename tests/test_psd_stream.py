@@ -0,0 +1,39 @@
+import pytest
+from psd_tools import PSDImage
+
+from awesome_image_editor.psd_read.pixel import iter_psd_pixel_layers
+from awesome_image_editor.psd_read.stream import MappedPSD
+from benchmarks.fixtures import PSD_COMPRESSION_RLE, write_synthetic_psd
+
+from .test_file_format import assert_images_equal
+from .test_psd_pixel import pil_image_to_qimage
+
+
+@pytest.mark.parametrize("version", [1, 2])
+def test_streamed_layers_match_psd_tools(tmp_path, version: int):
+    # NOTE: version 2 is the large document format (PSB), with longer channel lengths
+    filepath = str(tmp_path / ("layers.psd" if version == 1 else "layers.psb"))
+    write_synthetic_psd(
+        filepath,
+        5,
+        24,
+        num_groups=2,
+        version=version,
+        compression=PSD_COMPRESSION_RLE,
+        transparent=True,
+    )
+    layers = list(iter_psd_pixel_layers(PSDImage.open(filepath)))
+
+    mapped_psd = MappedPSD(filepath)
+    streamed_layers = list(iter_psd_pixel_layers(mapped_psd.psd))
+
+    assert len(streamed_layers) == len(layers) == 5
+    for layer, streamed_layer in zip(layers, streamed_layers):
+        assert streamed_layer.name == layer.name
+        assert streamed_layer.offset == layer.offset
+        # Decoded twice, the second time from pages dropped from memory after the first one
+        for _ in range(2):
+            assert_images_equal(
+                mapped_psd.decode_pixel_layer(streamed_layer),
+                pil_image_to_qimage(layer.topil()),
+            )
@@ -0,0 +1,98 @@
+from PyQt6.QtGui import QColor
+
+from awesome_image_editor.psd_read.text import (
+    TextFormatCache,
+    psd_type_layer_to_text_item,
+)
+from benchmarks.fixtures import create_synthetic_type_layer
+
+
+def test_text_format_cache_shares_formats():
+    text_formats = TextFormatCache()
+    key = ("Serif", 12.4, (1.0, 1.0, 0.5, 0.0))
+
+    char_format = text_formats.get_char_format(key)
+
+    assert text_formats.get_char_format(key) is char_format
+    assert text_formats.get_font("Serif", 12.4) is text_formats.get_font("Serif", 12.4)
+    assert char_format.font().family() == "Serif"
+    assert char_format.font().pixelSize() == 12
+    assert char_format.foreground().color() == QColor(255, 127, 0, 255)
+    assert text_formats.get_char_format(("Serif", 12.4, (1.0, 0.0, 0.0, 0.0))) != (
+        char_format
+    )
+
+
+def test_text_format_cache_clamps_small_font_sizes():
+    text_formats = TextFormatCache()
+
+    assert text_formats.get_font("Serif", 0.3).pixelSize() == 1
+    assert text_formats.get_font("Serif", 0.6).pixelSize() == 1
+
+
+def get_fragments(item):
+    """Text and format (family, pixel size, color) of each fragment of the document of a text item"""
+    fragments = []
+    block = item.document().begin()
+    while block.isValid():
+        iterator = block.begin()
+        while not iterator.atEnd():
+            fragment = iterator.fragment()
+            char_format = fragment.charFormat()
+            fragments.append(
+                (
+                    fragment.text(),
+                    char_format.font().family(),
+                    char_format.font().pixelSize(),
+                    char_format.foreground().color().name(),
+                )
+            )
+            iterator += 1
+        block = block.next()
+    return fragments
+
+
+def get_expected_fragments(layer):
+    """Fragments of the text of a type layer, with the format of its runs, split into paragraphs"""
+    text = layer.engine_dict["Editor"]["Text"].value
+    style_run = layer.engine_dict["StyleRun"]
+    fontset = layer.resource_dict["FontSet"]
+    fragments = []
+    index = 0
+    is_block_start = True
+    for length, style in zip(style_run["RunLengthArray"], style_run["RunArray"]):
+        stylesheet = style["StyleSheet"]["StyleSheetData"]
+        color = QColor(
+            *(int(value * 255) for value in stylesheet["FillColor"]["Values"][1:])
+        )
+        char_format = (
+            fontset[stylesheet["Font"]]["Name"],
+            round(float(stylesheet["FontSize"])),
+            color.name(),
+        )
+        # NOTE: paragraphs end with \r in PSD files, and are blocks in Qt
+        for paragraph_index, paragraph in enumerate(
+            text[index : index + length].split("\r")
+        ):
+            is_block_start = is_block_start or paragraph_index > 0
+            if len(paragraph) == 0:
+                continue
+            if not is_block_start and fragments[-1][1:] == char_format:
+                fragments[-1] = (fragments[-1][0] + paragraph, *char_format)
+            else:
+                fragments.append((paragraph, *char_format))
+            is_block_start = False
+        index += length
+    return fragments
+
+
+def test_runs_with_the_same_format_are_merged():
+    layer = create_synthetic_type_layer(12, 3, 3, seed=0)
+    runs = layer.engine_dict["StyleRun"]["RunArray"]
+    # NOTE: pairs of consecutive runs share their format
+    runs[:] = [runs[i // 2 % 3] for i in range(len(runs))]
+
+    item = psd_type_layer_to_text_item(layer)
+
+    assert item.document().blockCount() == 4
+    assert get_fragments(item) == get_expected_fragments(layer)
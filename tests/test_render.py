@@ -0,0 +1,158 @@
+import os
+
+import pytest
+from PyQt6.QtCore import QCoreApplication, QRectF, Qt
+from PyQt6.QtGui import QFont, QImage, QPainter, QPainterPath
+from PyQt6.QtWidgets import QGraphicsItem
+
+from awesome_image_editor import render
+from awesome_image_editor.render import get_unscaled_render_source
+from awesome_image_editor.model_view.items.shape import AIEShapeItem
+from awesome_image_editor.png_stream import PNGStreamWriter
+from awesome_image_editor.model_view.items.text import AIETextItem
+
+from .test_file_format import (
+    assert_images_equal,
+    create_image,
+    create_project,
+    get_image_items,
+)
+
+
+def create_render_project():
+    """Image layers at fractional positions with opacity, under a text and a shape layer"""
+    project = create_project(
+        [create_image(90 + i * 7, 70 + i * 5, i) for i in range(5)]
+    )
+    for i, item in enumerate(get_image_items(project)):
+        item.setPos(i * 37.3 + 0.25, i * 21.6 - 0.4)
+        item.setOpacity(1 - i * 0.15)
+
+    scene = project.get_graphics_scene()
+    text_item = AIETextItem("Rendered in tiles", "Text")
+    font = QFont()
+    font.setPixelSize(18)
+    text_item.setFont(font)
+    text_item.setPos(20.4, 60.7)
+    text_item.setOpacity(0.8)
+    scene.addItem(text_item)
+
+    path = QPainterPath()
+    path.addEllipse(QRectF(50.5, 30.2, 80.3, 40.7))
+    shape_item = AIEShapeItem(path, "Shape")
+    shape_item.setOpacity(0.6)
+    scene.addItem(shape_item)
+    return project
+
+
+def render_with_scene(project):
+    """Render a project with QGraphicsScene.render, painting items directly rather than from view caches"""
+    scene = project.get_graphics_scene()
+    for item in scene.items():
+        item.setCacheMode(QGraphicsItem.CacheMode.NoCache)
+    source = get_unscaled_render_source(scene.itemsBoundingRect())
+
+    image = QImage(source.size().toSize(), QImage.Format.Format_ARGB32_Premultiplied)
+    image.fill(Qt.GlobalColor.transparent)
+    painter = QPainter(image)
+    scene.render(painter, QRectF(), source)
+    painter.end()
+    return image
+
+
+def test_tiled_render_matches_serial_render(monkeypatch):
+    project = create_render_project()
+    tile_rects = []
+    render_tile = render._render_tile
+
+    def record_render_tile(*args, **kwargs):
+        tile_rects.append(args[3])
+        render_tile(*args, **kwargs)
+
+    monkeypatch.setattr(render, "_render_tile", record_render_tile)
+
+    serial_image = project.render(max_workers=1)
+    assert len(tile_rects) == 0
+    tiled_image = project.render(tile_size=64, max_workers=4)
+    assert len(tile_rects) > 4
+
+    assert_images_equal(tiled_image, serial_image)
+    assert_images_equal(serial_image, render_with_scene(project))
+
+
+def load_png(filepath: str):
+    image = QImage(filepath)
+    assert not image.isNull()
+    return image
+
+
+def assert_unpremultiplied_images_equal(image: QImage, expected: QImage):
+    # NOTE: as PNG pixels are not premultiplied, the pixels saved from a rendered image are compared
+    assert image.convertedTo(QImage.Format.Format_ARGB32) == expected.convertedTo(
+        QImage.Format.Format_ARGB32
+    )
+
+
+@pytest.mark.parametrize("strip_height", [7, 64, 1000])
+def test_export_png_matches_render(tmp_path, strip_height: int):
+    filepath = str(tmp_path / "export.png")
+    project = create_render_project()
+    # NOTE: thin strokes crossing strips are rasterized differently, see iter_render_scene_strips
+    if strip_height < 1000:
+        for item in project.get_graphics_scene().items():
+            if isinstance(item, AIEShapeItem):
+                item.setVisible(False)
+
+    project.export_png(filepath, strip_height=strip_height, tile_size=64)
+
+    image = project.render()
+    assert load_png(filepath).size() == image.size()
+    assert_unpremultiplied_images_equal(load_png(filepath), image)
+
+
+def test_failed_export_png_keeps_previous_file(tmp_path, monkeypatch):
+    filepath = str(tmp_path / "export.png")
+    project = create_render_project()
+    project.export_png(filepath)
+    previous_content = (tmp_path / "export.png").read_bytes()
+
+    def fail_write_rows(self, image):
+        raise OSError("No space left on device")
+
+    monkeypatch.setattr(PNGStreamWriter, "write_rows", fail_write_rows)
+    with pytest.raises(OSError):
+        project.export_png(filepath)
+
+    assert os.listdir(tmp_path) == ["export.png"]
+    assert (tmp_path / "export.png").read_bytes() == previous_content
+
+
+# NOTE: QGraphicsScene.render paints items from the rasters cached by views when rendering at about 1:1
+@pytest.mark.parametrize("scale", [None, 0.999])
+def test_render_and_export_paint_cached_items_directly(tmp_path, scale):
+    filepath = str(tmp_path / "export.png")
+    project = create_render_project()
+    scene = project.get_graphics_scene()
+    cached_items = [
+        item
+        for item in scene.items()
+        if item.cacheMode() == QGraphicsItem.CacheMode.DeviceCoordinateCache
+    ]
+    # Text and shape layers are cached by views (see CACHE_MODE of items)
+    assert len(cached_items) == 2
+    view = project.get_graphics_view()
+    view.resize(300, 200)
+    view.show()
+    QCoreApplication.processEvents()
+
+    image = project.render(max_workers=1, scale=scale)
+    project.export_png(filepath)
+
+    assert [item.cacheMode() for item in cached_items] == [
+        item.CACHE_MODE for item in cached_items
+    ]
+    view.close()
+    for item in cached_items:
+        item.setCacheMode(QGraphicsItem.CacheMode.NoCache)
+    assert_images_equal(image, project.render(max_workers=1, scale=scale))
+    assert_unpremultiplied_images_equal(load_png(filepath), project.render())
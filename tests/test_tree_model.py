@@ -0,0 +1,48 @@
+import pytest
+from PyQt6.QtCore import QModelIndex
+from psd_tools import PSDImage
+
+from awesome_image_editor.model_view.graphics_scene import AIEGraphicsScene
+from awesome_image_editor.model_view.items.group import AIEGroupItem
+from awesome_image_editor.model_view.items.image import AIEImageItem
+from awesome_image_editor.model_view.tree_model import TreeModel
+from awesome_image_editor.psd_read import read_psd_layer
+from benchmarks.fixtures import write_synthetic_psd
+
+from .test_file_format import create_image
+
+
+def get_top_level_items(model: TreeModel):
+    return [
+        model.getItem(model.index(row, 0, QModelIndex()))
+        for row in range(model.rowCount())
+    ]
+
+
+def test_psd_groups_are_added_with_their_children(tmp_path):
+    filepath = str(tmp_path / "groups.psd")
+    write_synthetic_psd(filepath, 6, 8, num_groups=2)
+    psd = PSDImage.open(filepath)
+    scene = AIEGraphicsScene()
+    model = TreeModel(scene)
+    # NOTE: listed before the layers are added, so the model has top level items cached
+    assert get_top_level_items(model) == []
+
+    # NOTE: not batched, the model is notified of each top level item
+    for layer in psd:
+        read_psd_layer(scene, layer, psd.width, psd.height)
+
+    top_level_items = get_top_level_items(model)
+    assert [item.name for item in top_level_items] == ["Group 1", "Group 0"]
+    assert all(isinstance(item, AIEGroupItem) for item in top_level_items)
+    assert [len(item.childItems()) for item in top_level_items] == [3, 3]
+
+
+def test_add_child_item_outside_batch():
+    scene = AIEGraphicsScene()
+    group = AIEGroupItem("Group")
+    item = AIEImageItem(create_image(8, 8, 1), "Layer")
+    item.setParentItem(group)
+
+    with pytest.raises(AssertionError):
+        scene.addItem(item)